@@ -0,0 +1,73 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Throughput of AMRFinderPlus per batch size. The assemblies are analysed in batches of every size with
+bin/amrfinderplus_batch.py (the database is loaded once per batch) and the wall time per assembly is reported.
+Batch size 1 runs amrfinder once per assembly, like the pipeline does without --amrfinderplus_batch_size.
+Needs amrfinder on the PATH (activate envs/amrfinderplus.yaml) and a downloaded database.
+Example: python3 benchmarks/bench_amrfinderplus_batch.py -d /mnt/db/juno-amr/amrfinderplusdb/2022-12-19.1 \
+             -a assemblies/*.fasta --batch_sizes 1 5 10 25 50
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.joinpath("bin")))
+from amrfinderplus_batch import make_batches, run_batch
+
+
+def measure(assemblies, batch_size, database, threads, tmp_dir=None):
+    """Wall time in seconds to analyse all assemblies in batches of batch_size"""
+    assemblies = {Path(assembly).stem: assembly for assembly in assemblies}
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as output_dir:
+        start = time.perf_counter()
+        for batch_samples in make_batches(assemblies, batch_size).values():
+            run_batch(
+                [assemblies[sample] for sample in batch_samples],
+                [Path(output_dir, sample) for sample in batch_samples],
+                database,
+                threads,
+                tmp_dir,
+            )
+        return time.perf_counter() - start
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument("-a", "--assemblies", nargs="+", required=True)
+    argument_parser.add_argument("-d", "--database", required=True)
+    argument_parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    argument_parser.add_argument("--threads", type=int, default=1)
+    argument_parser.add_argument("--dir", type=Path, default=None, help="Directory for the temporary files")
+    argument_parser.add_argument("-o", "--output", type=Path, default=None, help="Json file for the results")
+    args = argument_parser.parse_args()
+
+    results = []
+    print("batch size\tseconds\tseconds per assembly\tassemblies per hour")
+    for batch_size in args.batch_sizes:
+        seconds = measure(args.assemblies, batch_size, args.database, args.threads, args.dir)
+        per_assembly = seconds / len(args.assemblies)
+        results.append(
+            {
+                "batch_size": batch_size,
+                "assemblies": len(args.assemblies),
+                "threads": args.threads,
+                "seconds": round(seconds, 3),
+                "seconds_per_assembly": round(per_assembly, 3),
+            }
+        )
+        print(f"{batch_size}\t{seconds:.1f}\t{per_assembly:.2f}\t{3600 / per_assembly:.0f}", flush=True)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as output_file:
+            json.dump({"database": args.database, "results": results}, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
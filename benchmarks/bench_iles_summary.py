@@ -0,0 +1,62 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Times the iles summary on synthetic runs of different sizes. Use --make_summary to time
+another version of make_summary.py, for example from an older checkout, on the same synthetic data.
+Example: python3 benchmarks/bench_iles_summary.py -n 1000 10000
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic_results import generate_run
+
+MAKE_SUMMARY = Path(__file__).parent.parent.joinpath("bin", "make_summary.py")
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__)
+    argument_parser.add_argument("-n", "--samples", type=int, nargs="+", default=[1000, 10000])
+    argument_parser.add_argument("--repeats", type=int, default=3)
+    argument_parser.add_argument("--species", type=str, default="escherichia_coli")
+    argument_parser.add_argument(
+        "--make_summary",
+        type=Path,
+        nargs="+",
+        default=[MAKE_SUMMARY],
+        help="One or more make_summary.py scripts to compare.",
+    )
+    args = argument_parser.parse_args()
+
+    print("samples\tscript\tseconds")
+    for number_of_samples in args.samples:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            run_dir = Path(tmp_dir)
+            sample_dirs = generate_run(run_dir, number_of_samples)
+            run_dir.joinpath("config").mkdir()
+            run_dir.joinpath("config", "user_parameters.yaml").write_text(
+                f"out: {run_dir}\nspecies: {args.species}\n"
+            )
+            for make_summary in args.make_summary:
+                command = [
+                    sys.executable,
+                    str(make_summary.resolve()),
+                    "-st", "iles",
+                    "-si", str(run_dir.joinpath("summary_iles.csv")),
+                    "-i", *sample_dirs["resfinder"],
+                ]
+                timings = []
+                for _ in range(args.repeats):
+                    start = time.perf_counter()
+                    subprocess.run(command, cwd=run_dir, check=True, stdout=subprocess.DEVNULL)
+                    timings.append(time.perf_counter() - start)
+                print(f"{number_of_samples}\t{make_summary}\t{min(timings):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Builds a presence matrix (bin/presence_matrix.py) of synthetic samples with profiles like those of
+juno-amr (a few common genes and mutations, many rare ones) and times the build, opening the memory mapped matrix,
+and nearest profile queries. The queries are checked against, and timed with, the Jaccard distance to every sample
+computed from the python sets of the profiles.
+Example: python3 benchmarks/bench_presence_matrix.py --samples 300000 --features 3000 --queries 100
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPOSITORY = Path(__file__).parent.parent
+sys.path.insert(0, str(REPOSITORY.joinpath("bin")))
+from presence_matrix import PresenceMatrix, update_matrix
+
+TOOLS = ["resfinder", "pointfinder", "amrfinderplus", "virulencefinder"]
+
+
+def synthetic_profiles(samples, features, mean_features, seed):
+    """Profiles with feature frequencies that fall off like a power law"""
+    generator = np.random.default_rng(seed)
+    names = [f"{TOOLS[number % len(TOOLS)]}:gene{number}" for number in range(features)]
+    weights = 1 / np.arange(1, features + 1) ** 1.1
+    weights /= weights.sum()
+    sizes = generator.poisson(mean_features, samples)
+    drawn = generator.choice(features, size=sizes.sum(), p=weights)
+    starts = np.concatenate([[0], np.cumsum(sizes)])
+    return {
+        f"sample{number:07d}": {names[feature] for feature in drawn[starts[number] : starts[number + 1]]}
+        for number in range(samples)
+    }
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument("--samples", type=int, default=300000)
+    argument_parser.add_argument("--features", type=int, default=3000, help="Number of different genes and mutations")
+    argument_parser.add_argument("--mean_features", type=float, default=12, help="Mean number of features of a sample")
+    argument_parser.add_argument("--queries", type=int, default=100)
+    argument_parser.add_argument("-k", type=int, default=10)
+    argument_parser.add_argument("--seed", type=int, default=1)
+    argument_parser.add_argument("--dir", type=Path, default=None, help="Directory for the matrix")
+    argument_parser.add_argument("-o", "--output", type=Path, default=None, help="Json file for the results")
+    args = argument_parser.parse_args()
+
+    profiles = synthetic_profiles(args.samples, args.features, args.mean_features, args.seed)
+    results = {"samples": args.samples, "features": args.features, "mean_features": args.mean_features}
+    with tempfile.TemporaryDirectory(dir=args.dir) as matrix_dir:
+        location = Path(matrix_dir, "matrix")
+        start = time.perf_counter()
+        update_matrix(location, profiles)
+        results["build_seconds"] = round(time.perf_counter() - start, 3)
+        results["size_mb"] = round(sum(path.stat().st_size for path in location.iterdir()) / 1e6, 1)
+
+        start = time.perf_counter()
+        matrix = PresenceMatrix(location)
+        results["open_seconds"] = round(time.perf_counter() - start, 3)
+
+        queries = np.random.default_rng(args.seed + 1).choice(matrix.samples, args.queries, replace=False)
+        start = time.perf_counter()
+        nearest = [matrix.nearest(str(sample), args.k) for sample in queries]
+        results["query_ms"] = round((time.perf_counter() - start) * 1000 / args.queries, 2)
+
+        # The same queries from the python sets of the profiles
+        profile_list = list(profiles.values())
+        start = time.perf_counter()
+        for sample, found in zip(queries[:10], nearest):
+            query = profiles[sample]
+            distances = np.array(
+                [1 - len(query & profile) / len(query | profile) if query | profile else 0.0 for profile in profile_list]
+            )
+            kth = np.sort(np.delete(distances, matrix.sample_ids[sample]))[args.k - 1]
+            assert np.isclose(found[-1]["distance"], kth), f"{sample}: {found[-1]['distance']} != {kth}"
+        results["sets_query_ms"] = round((time.perf_counter() - start) * 1000 / min(10, args.queries), 2)
+
+    print(json.dumps(results, indent=2))
+    print(f"speedup of a query against the python sets: {results['sets_query_ms'] / results['query_ms']:.0f}x")
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
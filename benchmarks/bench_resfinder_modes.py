@@ -0,0 +1,150 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Compares ResFinder/PointFinder on the reads (KMA) with ResFinder/PointFinder on the assembly (BLAST)
+of the same samples: the wall time of both modes and the concordance of the results (acquired genes, predicted
+phenotypes and point mutations). Use it to choose --resfinder_input and --resfinder_auto_reads_mb.
+Needs the ResFinder software and databases (activate envs/resfinder.yaml).
+Example: python3 benchmarks/bench_resfinder_modes.py -s output/audit_trail/sample_sheet.yaml \
+             -db_res /mnt/db/juno-amr/resfinder_db -db_point /mnt/db/juno-amr/pointfinder_db --species salmonella
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+REPOSITORY = Path(__file__).parent.parent
+sys.path.insert(0, str(REPOSITORY.joinpath("bin")))
+from resfinder_results import read_pheno_table, read_pointfinder_results, read_resfinder_genes
+
+RUN_RESFINDER = REPOSITORY.joinpath("bin", "resfinder", "src", "resfinder", "run_resfinder.py")
+
+
+def run_resfinder(mode, properties, output_dir, args):
+    """Runs ResFinder on the reads or the assembly of a sample, returns the wall time in seconds"""
+    species = properties.get("species") or args.species
+    if mode == "reads":
+        input_arguments = ["-ifq", properties["R1"], properties["R2"]]
+    else:
+        input_arguments = ["-ifa", properties["assembly"]]
+    command = [
+        sys.executable,
+        str(args.resfinder),
+        "-o",
+        str(output_dir),
+        "-s",
+        species,
+        "-l",
+        str(args.min_coverage),
+        "-t",
+        str(args.threshold),
+        "--acquired",
+        *(["--point"] if species != "other" else []),
+        *input_arguments,
+        "-db_res",
+        args.db_res,
+        "-db_point",
+        args.db_point,
+    ]
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def read_calls(output_dir):
+    """Genes, resistant antimicrobials and point mutations found by ResFinder/PointFinder"""
+    output_dir = Path(output_dir)
+    genes = {row.resistance_gene for row in read_resfinder_genes(output_dir.joinpath("ResFinder_results_tab.txt")).rows}
+    phenotypes = {
+        row.antimicrobial
+        for row in read_pheno_table(output_dir.joinpath("pheno_table.txt")).rows
+        if row.phenotype == "Resistant"
+    }
+    mutations = set()
+    if output_dir.joinpath("PointFinder_results.txt").is_file():
+        mutations = {row.mutation for row in read_pointfinder_results(output_dir.joinpath("PointFinder_results.txt")).rows}
+    return {"genes": genes, "phenotypes": phenotypes, "mutations": mutations}
+
+
+def concordance(reads, assembly):
+    """Jaccard index of the calls of both modes, with the calls found by only one of them"""
+    both = reads | assembly
+    return {
+        "jaccard": round(len(reads & assembly) / len(both), 3) if both else 1.0,
+        "only_reads": sorted(reads - assembly),
+        "only_assembly": sorted(assembly - reads),
+    }
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument(
+        "-s", "--sample_sheet", type=Path, required=True, help="Sample sheet with R1, R2 and assembly of every sample"
+    )
+    argument_parser.add_argument("-db_res", required=True)
+    argument_parser.add_argument("-db_point", required=True)
+    argument_parser.add_argument("--species", default="other", help="Species of samples without one in the sample sheet")
+    argument_parser.add_argument("-l", "--min_coverage", type=float, default=0.6)
+    argument_parser.add_argument("-t", "--threshold", type=float, default=0.8)
+    argument_parser.add_argument("--resfinder", type=Path, default=RUN_RESFINDER)
+    argument_parser.add_argument("--dir", type=Path, default=None, help="Directory for the ResFinder output")
+    argument_parser.add_argument("-o", "--output", type=Path, default=None, help="Json file for the results")
+    args = argument_parser.parse_args()
+
+    with open(args.sample_sheet) as sample_sheet_file:
+        samples = yaml.safe_load(sample_sheet_file)
+
+    results = []
+    print("sample\treads MB\treads s\tassembly s\tspeedup\tgenes\tphenotypes\tmutations")
+    with tempfile.TemporaryDirectory(dir=args.dir) as output_dir:
+        for sample, properties in samples.items():
+            if not (properties.get("R1") and properties.get("R2") and properties.get("assembly")):
+                continue
+            seconds, calls = {}, {}
+            for mode in ["reads", "assembly"]:
+                sample_dir = Path(output_dir, mode, sample)
+                seconds[mode] = run_resfinder(mode, properties, sample_dir, args)
+                calls[mode] = read_calls(sample_dir)
+            reads_mb = sum(os.path.getsize(properties[key]) for key in ["R1", "R2"]) / 1e6
+            result = {
+                "sample": sample,
+                "reads_mb": round(reads_mb, 1),
+                "reads_seconds": round(seconds["reads"], 2),
+                "assembly_seconds": round(seconds["assembly"], 2),
+                **{
+                    calls_type: concordance(calls["reads"][calls_type], calls["assembly"][calls_type])
+                    for calls_type in ["genes", "phenotypes", "mutations"]
+                },
+            }
+            results.append(result)
+            print(
+                f"{sample}\t{reads_mb:.0f}\t{seconds['reads']:.1f}\t{seconds['assembly']:.1f}\t"
+                f"{seconds['reads'] / seconds['assembly']:.1f}x\t{result['genes']['jaccard']}\t"
+                f"{result['phenotypes']['jaccard']}\t{result['mutations']['jaccard']}",
+                flush=True,
+            )
+
+    if results:
+        reads_total = sum(result["reads_seconds"] for result in results)
+        assembly_total = sum(result["assembly_seconds"] for result in results)
+        concordant = sum(result["phenotypes"]["jaccard"] == 1.0 for result in results)
+        print(
+            f"total\t\t{reads_total:.1f}\t{assembly_total:.1f}\t{reads_total / assembly_total:.1f}x\t"
+            f"{concordant}/{len(results)} samples with the same phenotypes"
+        )
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as output_file:
+            json.dump({"results": results}, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
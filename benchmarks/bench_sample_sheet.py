@@ -0,0 +1,130 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Measures the loading of a synthetic sample sheet with the python yaml loader, the C yaml loader and
+as json, and the size of the command line of make_summary.py with the sample directories as arguments (compared to
+ARG_MAX) against reading them from a manifest. With --summary the summaries of a synthetic run are made from a
+manifest, which also works when the command line would be too long.
+Example: python3 benchmarks/bench_sample_sheet.py -n 50000
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parent.parent.joinpath("bin")))
+from sample_sheet import load_sample_sheet, read_manifest, write_manifest
+
+from synthetic_results import generate_run
+
+MAKE_SUMMARY = Path(__file__).parent.parent.joinpath("bin", "make_summary.py")
+TOOLS = ["resfinder", "virulencefinder", "amrfinderplus"]
+
+
+def synthetic_sample_sheet(number_of_samples, input_dir):
+    """Sample sheet in the form of juno_library, with the species of juno_amr"""
+    return {
+        f"sample{number:06d}": {
+            "R1": f"{input_dir}/sample{number:06d}_S1_L001_R1_001.fastq.gz",
+            "R2": f"{input_dir}/sample{number:06d}_S1_L001_R2_001.fastq.gz",
+            "assembly": f"{input_dir}/sample{number:06d}.fasta",
+            "species": "escherichia_coli",
+        }
+        for number in range(number_of_samples)
+    }
+
+
+def best_time(function, repeats):
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds)
+
+
+def run_summary(run_dir, manifest):
+    """Make all summaries from the manifest without cache, returns the wall time in seconds"""
+    summary_dir = run_dir.joinpath("summary")
+    command = [
+        sys.executable,
+        str(MAKE_SUMMARY),
+        "-st", "all",
+        "-o", str(run_dir),
+        "--species", "escherichia_coli",
+        "-sr", str(summary_dir.joinpath("summary_amr_genes.csv")), str(summary_dir.joinpath("summary_amr_phenotype.csv")),
+        "-sp", str(summary_dir.joinpath("summary_amr_pointfinder_results.csv")),
+        "-si", str(summary_dir.joinpath("summary_iles.csv")),
+        "-sv", str(summary_dir.joinpath("summary_virulencefinder.csv")),
+        "-sa", str(summary_dir.joinpath("summary_amrfinderplus.csv")),
+        "-m", str(manifest),
+        "--no_cache",
+    ]
+    start = time.perf_counter()
+    subprocess.run(command, cwd=run_dir, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument("-n", "--samples", type=int, default=50000)
+    argument_parser.add_argument("--repeats", type=int, default=3)
+    argument_parser.add_argument(
+        "--summary", action="store_true", help="Also generate the results of the samples and make the summaries"
+    )
+    argument_parser.add_argument(
+        "--dir",
+        type=Path,
+        default=None,
+        help="Directory for the synthetic run, for example on network storage. Default is a temporary directory.",
+    )
+    args = argument_parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        run_dir = Path(tmp_dir)
+        samples = synthetic_sample_sheet(args.samples, run_dir.joinpath("input"))
+        yaml_sheet = run_dir.joinpath("sample_sheet.yaml")
+        json_sheet = run_dir.joinpath("sample_sheet.json")
+        with open(yaml_sheet, "w") as sample_sheet_file:
+            yaml.dump(samples, sample_sheet_file, default_flow_style=False)
+        json_sheet.write_text(json.dumps(samples))
+
+        def load_yaml(loader):
+            with open(yaml_sheet) as sample_sheet_file:
+                return yaml.load(sample_sheet_file, Loader=loader)
+
+        print(f"{args.samples} samples, best of {args.repeats} runs")
+        print("sample sheet\tseconds")
+        loaders = {"yaml SafeLoader": lambda: load_yaml(yaml.SafeLoader)}
+        if hasattr(yaml, "CSafeLoader"):
+            loaders["yaml CSafeLoader"] = lambda: load_yaml(yaml.CSafeLoader)
+        loaders["json"] = lambda: load_sample_sheet(json_sheet)
+        for name, load in loaders.items():
+            print(f"{name}\t{best_time(load, args.repeats):.3f}")
+
+        sample_dirs = {
+            tool: [f"{run_dir}/results/{tool}/{sample}" for sample in samples] for tool in TOOLS
+        }
+        manifest = run_dir.joinpath("manifest.tsv")
+        write_manifest(sample_dirs, manifest)
+        arguments = " ".join(shlex.quote(directory) for tool in TOOLS for directory in sample_dirs[tool])
+        print("\nsummary input\tbytes\tseconds")
+        print(f"command line\t{len(arguments)}\t(ARG_MAX {os.sysconf('SC_ARG_MAX')})")
+        print(f"manifest\t{manifest.stat().st_size}\t{best_time(lambda: read_manifest(manifest), args.repeats):.3f}")
+
+        if args.summary:
+            generate_run(run_dir, args.samples)
+            print(f"\nsummaries from the manifest\t{run_summary(run_dir, manifest):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
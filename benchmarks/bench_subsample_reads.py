@@ -0,0 +1,128 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Compares ResFinder/PointFinder on all reads with ResFinder/PointFinder on reads subsampled to several
+depths (bin/subsample_reads.py) of the same samples: the wall time of the subsampling and of ResFinder, and the
+concordance of the results with those of all reads (acquired genes, predicted phenotypes and point mutations).
+Use it to choose --subsample_depth. Needs the ResFinder software and databases (activate envs/resfinder.yaml).
+Example: python3 benchmarks/bench_subsample_reads.py -s output/audit_trail/sample_sheet.json \
+             -db_res /mnt/db/juno-amr/resfinder_db -db_point /mnt/db/juno-amr/pointfinder_db --depths 30 60 100
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+from bench_resfinder_modes import REPOSITORY, RUN_RESFINDER, concordance, read_calls, run_resfinder
+
+sys.path.insert(0, str(REPOSITORY.joinpath("bin")))
+from sample_sheet import load_sample_sheet
+from subsample_reads import assembly_length, subsample_reads
+
+CALL_TYPES = ["genes", "phenotypes", "mutations"]
+
+
+def genome_size(properties, species, expected_genome_size_mb):
+    """Length of the assembly, or the expected genome size of the species"""
+    if properties.get("assembly") and Path(properties["assembly"]).is_file():
+        return assembly_length(properties["assembly"])
+    return round(expected_genome_size_mb.get(species, expected_genome_size_mb["other"]) * 1e6)
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument(
+        "-s", "--sample_sheet", type=Path, required=True, help="Sample sheet with R1, R2 (and assembly) of every sample"
+    )
+    argument_parser.add_argument("-db_res", required=True)
+    argument_parser.add_argument("-db_point", required=True)
+    argument_parser.add_argument("--species", default="other", help="Species of samples without one in the sample sheet")
+    argument_parser.add_argument("--depths", type=float, nargs="+", default=[30, 60, 100])
+    argument_parser.add_argument("--seed", type=int, default=1)
+    argument_parser.add_argument("-l", "--min_coverage", type=float, default=0.6)
+    argument_parser.add_argument("-t", "--threshold", type=float, default=0.8)
+    argument_parser.add_argument("--resfinder", type=Path, default=RUN_RESFINDER)
+    argument_parser.add_argument(
+        "--config",
+        type=Path,
+        default=REPOSITORY.joinpath("config", "pipeline_parameters.yaml"),
+        help="Pipeline parameters with the expected genome size per species",
+    )
+    argument_parser.add_argument("--dir", type=Path, default=None, help="Directory for the subsamples and ResFinder output")
+    argument_parser.add_argument("-o", "--output", type=Path, default=None, help="Json file for the results")
+    args = argument_parser.parse_args()
+
+    samples = load_sample_sheet(args.sample_sheet)
+    with open(args.config) as config_file:
+        expected_genome_size_mb = yaml.safe_load(config_file)["expected_genome_size_mb"]
+
+    results = []
+    print("sample\tdepth\tkept\tsubsample s\tresfinder s\tall reads s\tspeedup\tgenes\tphenotypes\tmutations")
+    with tempfile.TemporaryDirectory(dir=args.dir) as output_dir:
+        for sample, properties in samples.items():
+            if not (properties.get("R1") and properties.get("R2")):
+                continue
+            species = properties.get("species") or args.species
+            sample_properties = {**properties, "species": species}
+            all_dir = Path(output_dir, "all", sample)
+            all_seconds = run_resfinder("reads", sample_properties, all_dir, args)
+            all_calls = read_calls(all_dir)
+            size = genome_size(properties, species.strip().lower().replace(" ", "_"), expected_genome_size_mb)
+            for depth in args.depths:
+                depth_dir = Path(output_dir, f"depth_{depth:g}")
+                depth_dir.mkdir(exist_ok=True)
+                subsampled = {
+                    **sample_properties,
+                    "R1": str(depth_dir.joinpath(f"{sample}_R1.fastq.gz")),
+                    "R2": str(depth_dir.joinpath(f"{sample}_R2.fastq.gz")),
+                }
+                start = time.perf_counter()
+                report = subsample_reads(
+                    properties["R1"], properties["R2"], subsampled["R1"], subsampled["R2"], depth, size, args.seed
+                )
+                subsample_seconds = time.perf_counter() - start
+                resfinder_dir = depth_dir.joinpath(sample)
+                resfinder_seconds = run_resfinder("reads", subsampled, resfinder_dir, args)
+                calls = read_calls(resfinder_dir)
+                result = {
+                    "sample": sample,
+                    "depth": depth,
+                    "subsample": report,
+                    "subsample_seconds": round(subsample_seconds, 2),
+                    "resfinder_seconds": round(resfinder_seconds, 2),
+                    "all_reads_seconds": round(all_seconds, 2),
+                    **{call_type: concordance(all_calls[call_type], calls[call_type]) for call_type in CALL_TYPES},
+                }
+                results.append(result)
+                print(
+                    f"{sample}\t{depth:g}\t{report['fraction']}\t{subsample_seconds:.1f}\t{resfinder_seconds:.1f}\t"
+                    f"{all_seconds:.1f}\t{all_seconds / (subsample_seconds + resfinder_seconds):.1f}x\t"
+                    + "\t".join(str(result[call_type]["jaccard"]) for call_type in CALL_TYPES),
+                    flush=True,
+                )
+
+    for depth in args.depths:
+        depth_results = [result for result in results if result["depth"] == depth]
+        if not depth_results:
+            continue
+        subsampled_total = sum(result["subsample_seconds"] + result["resfinder_seconds"] for result in depth_results)
+        all_total = sum(result["all_reads_seconds"] for result in depth_results)
+        concordant = sum(result["phenotypes"]["jaccard"] == 1.0 for result in depth_results)
+        print(
+            f"depth {depth:g}: {subsampled_total:.1f} s against {all_total:.1f} s for all reads "
+            f"({all_total / subsampled_total:.1f}x), {concordant}/{len(depth_results)} samples with the same phenotypes"
+        )
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as output_file:
+            json.dump({"results": results}, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Benchmark suite for make_summary.py. Runs every --summary_type on synthetic runs of several sizes
+and reports the wall time and peak memory (RSS) of each run. Everything runs offline. The results are stored as
+json in benchmarks/results/<commit>.json, so two commits can be compared with --compare.
+Example: python3 benchmarks/bench_summary_suite.py -n 10 1000 10000 50000
+         python3 benchmarks/bench_summary_suite.py --compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+"""
+
+import argparse
+import datetime
+import importlib.metadata
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic_results import generate_run
+
+REPOSITORY = Path(__file__).parent.parent
+MAKE_SUMMARY = REPOSITORY.joinpath("bin", "make_summary.py")
+RESULTS_DIR = Path(__file__).parent.joinpath("results")
+SUMMARY_TYPES = ["resfinder", "pointfinder", "iles", "virulencefinder", "amrfinderplus", "all"]
+
+
+# The arguments are read from stdin, because the sample directories of a large run do not fit on a command line
+RUN_SUMMARY = f"""
+import json, sys
+sys.path.insert(0, {str(MAKE_SUMMARY.parent)!r})
+from make_summary import make_summaries
+make_summaries(**json.load(sys.stdin))
+"""
+
+
+def summary_arguments(summary_type, run_dir, sample_dirs, species):
+    """Arguments of make_summaries for one summary type, the results are parsed without cache"""
+    summary_dir = run_dir.joinpath("summary")
+    file_names = {
+        "resfinder": ("resfinder_summary_file_names", ["summary_amr_genes.csv", "summary_amr_phenotype.csv"]),
+        "pointfinder": ("pointfinder_summary_file_name", ["summary_amr_pointfinder_results.csv"]),
+        "iles": ("iles_summary_file_names", ["summary_iles.csv"]),
+        "virulencefinder": ("virulencefinder_summary_file_names", ["summary_virulencefinder.csv"]),
+        "amrfinderplus": ("amrfinderplus_summary_file_names", ["summary_amrfinderplus.csv"]),
+    }
+    arguments = {
+        "summary_type": summary_type,
+        "output_dir": str(run_dir),
+        "species": species,
+        "no_cache": True,
+    }
+    for summary, (argument, names) in file_names.items():
+        if summary_type in [summary, "all"]:
+            arguments[argument] = [str(summary_dir.joinpath(name)) for name in names]
+    if summary_type == "all":
+        arguments["input"] = sample_dirs["resfinder"]
+        arguments["input_virulencefinder"] = sample_dirs["virulencefinder"]
+        arguments["input_amrfinderplus"] = sample_dirs["amrfinderplus"]
+    else:
+        tool = summary_type if summary_type in sample_dirs else "resfinder"
+        arguments["input"] = sample_dirs[tool]
+    return arguments
+
+
+def measure(arguments, cwd):
+    """Make the summaries in a new python process, returns the wall time in seconds and the peak RSS of the process in MB"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", RUN_SUMMARY],
+        cwd=cwd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        text=True,
+    )
+    process.stdin.write(json.dumps(arguments))
+    process.stdin.close()
+    # wait4 gives the resource usage of this process only, not of all children together
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, process.args)
+    # ru_maxrss is in kilobytes on linux and in bytes on macOS
+    peak_rss = usage.ru_maxrss / 1024 if sys.platform != "darwin" else usage.ru_maxrss / 1024**2
+    return seconds, peak_rss
+
+
+def package_version(name):
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPOSITORY,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        changes = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=REPOSITORY,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if changes else commit
+
+
+def run_suite(sample_counts, summary_types, repeats, species, tmp_dir=None):
+    results = []
+    for number_of_samples in sample_counts:
+        with tempfile.TemporaryDirectory(dir=tmp_dir) as run_dir:
+            run_dir = Path(run_dir)
+            sample_dirs = generate_run(run_dir, number_of_samples)
+            for summary_type in summary_types:
+                arguments = summary_arguments(summary_type, run_dir, sample_dirs, species)
+                measurements = [measure(arguments, run_dir) for _ in range(repeats)]
+                seconds = min(measurement[0] for measurement in measurements)
+                peak_rss = max(measurement[1] for measurement in measurements)
+                results.append(
+                    {
+                        "samples": number_of_samples,
+                        "summary_type": summary_type,
+                        "seconds": round(seconds, 3),
+                        "peak_rss_mb": round(peak_rss, 1),
+                    }
+                )
+                print(f"{number_of_samples}\t{summary_type}\t{seconds:.2f}\t{peak_rss:.0f}", flush=True)
+    return results
+
+
+def compare(old_location, new_location):
+    """Print the change in wall time and peak RSS between two stored benchmark results"""
+    with open(old_location) as old_file, open(new_location) as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+    old_results = {(result["samples"], result["summary_type"]): result for result in old["results"]}
+    print(f"{old['commit']} -> {new['commit']}")
+    print("samples\tsummary\tseconds\t\t\tpeak RSS (MB)")
+    for result in new["results"]:
+        previous = old_results.get((result["samples"], result["summary_type"]))
+        if previous is None:
+            continue
+        print(
+            f"{result['samples']}\t{result['summary_type']}\t"
+            f"{previous['seconds']:.2f} -> {result['seconds']:.2f} ({result['seconds'] / previous['seconds']:.2f}x)\t"
+            f"{previous['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f}"
+        )
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument("-n", "--samples", type=int, nargs="+", default=[10, 1000, 10000, 50000])
+    argument_parser.add_argument("-st", "--summary_types", nargs="+", choices=SUMMARY_TYPES, default=SUMMARY_TYPES)
+    argument_parser.add_argument("--repeats", type=int, default=1)
+    argument_parser.add_argument("--species", default="escherichia_coli")
+    argument_parser.add_argument(
+        "--dir",
+        type=Path,
+        default=None,
+        help="Directory for the synthetic runs, for example on network storage. Default is a temporary directory.",
+    )
+    argument_parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=None,
+        help="Json file for the results. Default is benchmarks/results/<commit>.json",
+    )
+    argument_parser.add_argument(
+        "--compare",
+        type=Path,
+        nargs=2,
+        metavar=("OLD", "NEW"),
+        help="Compare two stored results instead of running the benchmark",
+    )
+    args = argument_parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = git_commit()
+    print("samples\tsummary\tseconds\tpeak RSS (MB)")
+    results = run_suite(args.samples, args.summary_types, args.repeats, args.species, args.dir)
+
+    output = args.output or RESULTS_DIR.joinpath(f"{commit}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(
+            {
+                "commit": commit,
+                "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "pandas": package_version("pandas"),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "repeats": args.repeats,
+                "species": args.species,
+                "results": results,
+            },
+            output_file,
+            indent=2,
+        )
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Measures the speedup of make_summary.py --threads on a synthetic run.
+Example: python3 benchmarks/bench_summary_threads.py -n 3000 --threads 1 4 16
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic_results import generate_run
+
+MAKE_SUMMARY = Path(__file__).parent.parent.joinpath("bin", "make_summary.py")
+
+
+def run_summary(run_dir, sample_dirs, threads, streaming):
+    """Run all summaries once without cache, returns the wall time in seconds"""
+    summary_dir = run_dir.joinpath("summary")
+    command = [
+        sys.executable,
+        str(MAKE_SUMMARY),
+        "-st", "all",
+        "-sr", str(summary_dir.joinpath("summary_amr_genes.csv")), str(summary_dir.joinpath("summary_amr_phenotype.csv")),
+        "-sp", str(summary_dir.joinpath("summary_amr_pointfinder_results.csv")),
+        "-si", str(summary_dir.joinpath("summary_iles.csv")),
+        "-sv", str(summary_dir.joinpath("summary_virulencefinder.csv")),
+        "-sa", str(summary_dir.joinpath("summary_amrfinderplus.csv")),
+        "-i", *sample_dirs["resfinder"],
+        "-iv", *sample_dirs["virulencefinder"],
+        "-ia", *sample_dirs["amrfinderplus"],
+        "--threads", str(threads),
+        "--no_cache",
+    ]
+    if streaming:
+        command.append("--streaming")
+    start = time.perf_counter()
+    subprocess.run(command, cwd=run_dir, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__)
+    argument_parser.add_argument("-n", "--samples", type=int, default=3000)
+    argument_parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    argument_parser.add_argument("--repeats", type=int, default=3)
+    argument_parser.add_argument("--streaming", action="store_true")
+    argument_parser.add_argument(
+        "--dir",
+        type=Path,
+        default=None,
+        help="Directory for the synthetic run, for example on network storage. Default is a temporary directory.",
+    )
+    args = argument_parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        run_dir = Path(tmp_dir)
+        sample_dirs = generate_run(run_dir, args.samples)
+        run_dir.joinpath("config").mkdir()
+        run_dir.joinpath("config", "user_parameters.yaml").write_text(
+            f"out: {run_dir}\nspecies: escherichia_coli\n"
+        )
+
+        print(f"{args.samples} samples, best of {args.repeats} runs")
+        print("threads\tseconds\tspeedup")
+        baseline = None
+        for threads in args.threads:
+            seconds = min(
+                run_summary(run_dir, sample_dirs, threads, args.streaming)
+                for _ in range(args.repeats)
+            )
+            baseline = baseline or seconds
+            print(f"{threads}\t{seconds:.2f}\t{baseline / seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
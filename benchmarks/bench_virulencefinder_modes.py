@@ -0,0 +1,108 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Compares VirulenceFinder with BLAST on the assembly with VirulenceFinder with KMA on the reads of the
+same samples: the wall time of both methods (KMA with several numbers of threads) and the concordance of the
+virulence factors that are found. Use it to choose --virulencefinder_method and the threads of virulencefinder_kma in
+the resource_model. Needs the VirulenceFinder software and a database with KMA indexes (activate envs/virulencefinder.yaml).
+Example: python3 benchmarks/bench_virulencefinder_modes.py -s output/audit_trail/sample_sheet.json \
+             -p /mnt/db/juno-amr/virulencefinderdb --threads 1 4 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPOSITORY = Path(__file__).parent.parent
+sys.path.insert(0, str(REPOSITORY.joinpath("bin")))
+from resfinder_results import read_virulencefinder_results
+from sample_sheet import load_sample_sheet
+
+VIRULENCEFINDER = REPOSITORY.joinpath("bin", "virulencefinder", "virulencefinder.py")
+KMA_THREADS = REPOSITORY.joinpath("bin", "kma_threads")
+
+
+def run_virulencefinder(method, threads, properties, output_dir, args):
+    """Runs VirulenceFinder on the assembly (blast) or the reads (kma) of a sample, returns the wall time in seconds"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if method == "kma":
+        input_arguments = ["-i", properties["R1"], properties["R2"], "-mp", str(KMA_THREADS)]
+    else:
+        input_arguments = ["-i", properties["assembly"]]
+    command = [sys.executable, str(args.virulencefinder), *input_arguments, "-o", str(output_dir), "-p", args.database, "-x"]
+    start = time.perf_counter()
+    subprocess.run(
+        command, check=True, stdout=subprocess.DEVNULL, env={**os.environ, "KMA_THREADS": str(threads)}
+    )
+    return time.perf_counter() - start
+
+
+def read_factors(output_dir):
+    """Virulence factors found by VirulenceFinder, read like the summary reads them"""
+    results = read_virulencefinder_results(Path(output_dir, "results_tab.tsv"))
+    column = results.columns.index("Virulence factor")
+    return {row[column] for row in results.rows}
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument(
+        "-s", "--sample_sheet", type=Path, required=True, help="Sample sheet with R1, R2 and assembly of every sample"
+    )
+    argument_parser.add_argument("-p", "--database", required=True, help="VirulenceFinder database with KMA indexes")
+    argument_parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8], help="Threads of the KMA runs")
+    argument_parser.add_argument("--virulencefinder", type=Path, default=VIRULENCEFINDER)
+    argument_parser.add_argument("--dir", type=Path, default=None, help="Directory for the VirulenceFinder output")
+    argument_parser.add_argument("-o", "--output", type=Path, default=None, help="Json file for the results")
+    args = argument_parser.parse_args()
+
+    samples = load_sample_sheet(args.sample_sheet)
+    runs = [("blast", 1)] + [("kma", threads) for threads in args.threads]
+    results = []
+    print("sample\t" + "\t".join(f"{method} {threads}t s" for method, threads in runs) + "\tjaccard\tonly blast\tonly kma")
+    with tempfile.TemporaryDirectory(dir=args.dir) as output_dir:
+        for sample, properties in samples.items():
+            if not (properties.get("R1") and properties.get("R2") and properties.get("assembly")):
+                continue
+            seconds, factors = {}, {}
+            for method, threads in runs:
+                sample_dir = Path(output_dir, f"{method}_{threads}", sample)
+                seconds[f"{method}_{threads}"] = round(run_virulencefinder(method, threads, properties, sample_dir, args), 2)
+                factors[method] = read_factors(sample_dir)
+            both = factors["blast"] | factors["kma"]
+            result = {
+                "sample": sample,
+                "seconds": seconds,
+                "jaccard": round(len(factors["blast"] & factors["kma"]) / len(both), 3) if both else 1.0,
+                "only_blast": sorted(factors["blast"] - factors["kma"]),
+                "only_kma": sorted(factors["kma"] - factors["blast"]),
+            }
+            results.append(result)
+            print(
+                f"{sample}\t" + "\t".join(f"{value:.1f}" for value in seconds.values())
+                + f"\t{result['jaccard']}\t{','.join(result['only_blast'])}\t{','.join(result['only_kma'])}",
+                flush=True,
+            )
+
+    if results:
+        totals = {run: sum(result["seconds"][run] for result in results) for run in results[0]["seconds"]}
+        print(
+            "total\t" + "\t".join(f"{value:.1f}" for value in totals.values())
+            + f"\t{sum(result['jaccard'] == 1.0 for result in results)}/{len(results)} samples with the same factors"
+        )
+        for run, total in list(totals.items())[1:]:
+            print(f"speedup {run} against blast_1: {totals['blast_1'] / total:.1f}x")
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as output_file:
+            json.dump({"results": results}, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
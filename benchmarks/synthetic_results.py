@@ -0,0 +1,220 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Generates synthetic ResFinder, PointFinder, VirulenceFinder and AMRFinderPlus
+output directories in the layout of <out>/results, to benchmark the summary step offline.
+"""
+
+import argparse
+import random
+from pathlib import Path
+
+ANTIMICROBIALS = [
+    ("ampicillin", "beta-lactam"),
+    ("amoxicillin", "beta-lactam"),
+    ("cefotaxime", "beta-lactam"),
+    ("ceftazidime", "beta-lactam"),
+    ("meropenem", "beta-lactam"),
+    ("ciprofloxacin", "quinolone"),
+    ("nalidixic acid", "quinolone"),
+    ("gentamicin", "aminoglycoside"),
+    ("streptomycin", "aminoglycoside"),
+    ("sulfamethoxazole", "folate pathway antagonist"),
+    ("trimethoprim", "folate pathway antagonist"),
+    ("azithromycin", "macrolide"),
+    ("erythromycin", "macrolide"),
+    ("tetracycline", "tetracycline"),
+    ("chloramphenicol", "amphenicol"),
+    ("colistin", "polymyxin"),
+]
+GENES = [
+    ("blaTEM-1B", "AY458016", "ampicillin, amoxicillin"),
+    ("blaCTX-M-15", "AY044436", "cefotaxime, ceftazidime, ampicillin"),
+    ("aac(3)-IId", "EU022314", "gentamicin"),
+    ("sul2", "AY034138", "sulfamethoxazole"),
+    ("dfrA17", "FJ460238", "trimethoprim"),
+    ("tet(A)", "AJ517790", "tetracycline"),
+    ("mph(A)", "D16251", "azithromycin, erythromycin"),
+    ("qnrS1", "AB187515", "ciprofloxacin"),
+]
+MUTATIONS = [
+    ("gyrA p.S83L", "TCG -> TTG", "S -> L", "Nalidixic acid,Ciprofloxacin"),
+    ("gyrA p.D87N", "GAC -> AAC", "D -> N", "Nalidixic acid,Ciprofloxacin"),
+    ("parC p.S80I", "AGC -> ATC", "S -> I", "Nalidixic acid,Ciprofloxacin"),
+    ("23S r.2075a>g", "a -> g", "2075", "Erythromycin,Azithromycin"),
+    ("pmrB p.V161G", "GTG -> GGG", "V -> G", "Colistin"),
+]
+VIRULENCE_FACTORS = [
+    ("gad", "Glutamate decarboxylase"),
+    ("iss", "Increased serum survival"),
+    ("lpfA", "Long polar fimbriae"),
+    ("astA", "EAST-1 heat-stable toxin"),
+    ("terC", "Tellurium ion resistance protein"),
+]
+PHENO_TABLE_HEADER = [
+    "# ResFinder phenotype results.\n",
+    "# Sample: {samplename}_R1.fastq.gz\n",
+    "# \n",
+    "# The phenotype 'No resistance' should be interpreted with\n",
+    "# caution, as it only means that nothing in the used\n",
+    "# database indicate resistance, but resistance could exist\n",
+    "# from 'unknown' or not yet implemented sources.\n",
+    "# \n",
+    "# The 'Match' column stores one of the integers 0, 1, 2, 3.\n",
+    "#      0: No match found\n",
+    "#      1: Match < 100% ID AND match length < ref length\n",
+    "#      2: Match = 100% ID AND match length < ref length\n",
+    "#      3: Match = 100% ID AND match length = ref length\n",
+    "# If several hits occur to the same antimicrobial, the highest number is stored.\n",
+    "# \n",
+    "# \n",
+    "# Antimicrobial\tClass\tWGS-predicted phenotype\tMatch\tGenetic background\n",
+]
+AMRFINDERPLUS_COLUMNS = [
+    "Protein identifier",
+    "Contig id",
+    "Start",
+    "Stop",
+    "Strand",
+    "Gene symbol",
+    "Sequence name",
+    "Scope",
+    "Element type",
+    "Element subtype",
+    "Class",
+    "Subclass",
+    "Method",
+    "Target length",
+    "Reference sequence length",
+    "% Coverage of reference sequence",
+    "% Identity to reference sequence",
+    "Alignment length",
+    "Accession of closest sequence",
+    "Name of closest sequence",
+    "HMM id",
+    "HMM description",
+]
+
+
+def write_resfinder_results(sample_dir, samplename, rng):
+    genes = rng.sample(GENES, rng.randint(0, 5))
+    mutations = rng.sample(MUTATIONS, rng.randint(0, 3))
+
+    with open(sample_dir.joinpath("ResFinder_results_tab.txt"), "w") as f:
+        f.write(
+            "Resistance gene\tIdentity\tAlignment Length/Gene Length\tCoverage\tPosition in reference\tContig\tPosition in contig\tPhenotype\tAccession no.\n"
+        )
+        for gene, accession, phenotype in genes:
+            length = rng.randint(500, 1200)
+            start = rng.randint(1, 300000)
+            f.write(
+                f"{gene}\t{rng.uniform(95, 100):.2f}\t{length}/{length}\t100.0\t1..{length}\tNODE_{rng.randint(1, 150)}_length_{rng.randint(1000, 400000)}\t{start}..{start + length}\t{phenotype}\t{accession}\n"
+            )
+
+    resistant = {}
+    for gene, accession, phenotype in genes:
+        for antimicrobial in phenotype.split(", "):
+            resistant.setdefault(antimicrobial, []).append(f"{gene} ({gene}_1_{accession})")
+    for mutation, _, _, phenotype in mutations:
+        gene, change = mutation.split(" ", 1)
+        for antimicrobial in phenotype.lower().split(","):
+            resistant.setdefault(antimicrobial, []).append(f"{gene} ({change})")
+
+    with open(sample_dir.joinpath("pheno_table.txt"), "w") as f:
+        f.writelines(line.format(samplename=samplename) for line in PHENO_TABLE_HEADER)
+        for antimicrobial, antimicrobial_class in ANTIMICROBIALS:
+            if antimicrobial in resistant:
+                f.write(
+                    f"{antimicrobial}\t{antimicrobial_class}\tResistant\t{rng.randint(1, 3)}\t{', '.join(resistant[antimicrobial])}\n"
+                )
+            else:
+                f.write(f"{antimicrobial}\t{antimicrobial_class}\tNo resistance\t0\t\n")
+        f.write("\n")
+        f.write("# WARNING: Missing features from phenotype database:\n")
+        f.write("# Feature_ID\tRegion\tDatabase\tHit\n")
+
+    with open(sample_dir.joinpath("PointFinder_results.txt"), "w") as f:
+        f.write("Mutation\tNucleotide change\tAmino acid change\tResistance\tPMID\n")
+        for mutation, nucleotide_change, amino_acid_change, phenotype in mutations:
+            f.write(
+                f"{mutation}\t{nucleotide_change}\t{amino_acid_change}\t{phenotype}\t{rng.randint(8000000, 30000000)}\n"
+            )
+
+
+def write_virulencefinder_results(sample_dir, rng):
+    with open(sample_dir.joinpath("results_tab.tsv"), "w") as f:
+        f.write(
+            "Database\tVirulence factor\tIdentity\tQuery / Template length\tContig\tPosition in contig\tProtein function\tAccession number\n"
+        )
+        for factor, function in rng.sample(VIRULENCE_FACTORS, rng.randint(0, 4)):
+            length = rng.randint(300, 1500)
+            f.write(
+                f"virulence_ecoli\t{factor}\t{rng.uniform(90, 100):.2f}\t{length} / {length}\tNODE_{rng.randint(1, 150)}\t1..{length}\t{function}\tCP0{rng.randint(10000, 99999)}\n"
+            )
+
+
+def write_amrfinderplus_results(sample_dir, rng):
+    with open(sample_dir.joinpath("amrfinder_result.txt"), "w") as f:
+        f.write("\t".join(AMRFINDERPLUS_COLUMNS) + "\n")
+        for gene, accession, phenotype in rng.sample(GENES, rng.randint(0, 4)):
+            length = rng.randint(150, 400)
+            row = [
+                "NA",
+                f"NODE_{rng.randint(1, 150)}",
+                "1",
+                str(length * 3),
+                "+",
+                gene,
+                f"{gene} resistance protein",
+                "core",
+                "AMR",
+                "AMR",
+                phenotype.split(", ")[0].upper(),
+                phenotype.split(", ")[0].upper(),
+                "ALLELEX",
+                str(length),
+                str(length),
+                "100.00",
+                f"{rng.uniform(95, 100):.2f}",
+                str(length),
+                f"WP_{rng.randint(100000000, 999999999)}.1",
+                f"{gene} resistance protein",
+                "NA",
+                "NA",
+            ]
+            f.write("\t".join(row) + "\n")
+
+
+def generate_run(output_dir, number_of_samples, seed=1):
+    """Write synthetic results for number_of_samples samples under output_dir/results,
+    returns the sample directories per tool"""
+    rng = random.Random(seed)
+    sample_dirs = {"resfinder": [], "virulencefinder": [], "amrfinderplus": []}
+    for sample_number in range(number_of_samples):
+        samplename = f"sample{sample_number:06d}"
+        for tool in sample_dirs:
+            sample_dir = Path(output_dir).joinpath("results", tool, samplename)
+            sample_dir.mkdir(parents=True, exist_ok=True)
+            sample_dirs[tool].append(str(sample_dir))
+        write_resfinder_results(Path(sample_dirs["resfinder"][-1]), samplename, rng)
+        write_virulencefinder_results(Path(sample_dirs["virulencefinder"][-1]), rng)
+        write_amrfinderplus_results(Path(sample_dirs["amrfinderplus"][-1]), rng)
+    return sample_dirs
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(
+        description="Generate synthetic tool results to benchmark the Juno-amr summaries"
+    )
+    argument_parser.add_argument(
+        "-o", "--output", type=Path, required=True, help="Output directory of the synthetic run."
+    )
+    argument_parser.add_argument(
+        "-n", "--samples", type=int, default=100, help="Number of samples to generate."
+    )
+    argument_parser.add_argument(
+        "--seed", type=int, default=1, help="Seed for the random generator."
+    )
+    args = argument_parser.parse_args()
+    generate_run(args.output, args.samples, args.seed)
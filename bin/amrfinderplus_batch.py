@@ -0,0 +1,165 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Runs AMRFinderPlus once for a batch of assemblies, so the database is loaded once for all of them.
+The contigs of the assemblies are written to one fasta file with the number of the sample in front of every contig
+id, after the run the hits are split per sample (with the original contig ids) into <output_dir>/amrfinder_result.txt,
+the same file a run of a single sample gives.
+Example: python3 bin/amrfinderplus_batch.py -d amrfinderplusdb/2022-12-19.1 --threads 4 \
+             --assemblies s1.fasta s2.fasta --output_dirs output/results/amrfinderplus/s1 output/results/amrfinderplus/s2
+"""
+
+import argparse
+import re
+import subprocess
+import tempfile
+from pathlib import Path
+
+RESULT_FILE = "amrfinder_result.txt"
+CONTIG_COLUMN = "Contig id"
+# Contig ids in the combined fasta file are juno<number of the sample>_<original contig id>
+CONTIG_PREFIX = re.compile(r"^juno(\d+)_(.*)$")
+
+
+def make_batches(samples, batch_size):
+    """Samples in batches of batch_size. The samples are sorted, so the pipeline (sample dict) and snakemake
+    (sample sheet) make the same batches and the names stay the same as long as the samples do not change."""
+    samples = sorted(samples)
+    return {
+        f"batch{number + 1:04d}": samples[start : start + batch_size]
+        for number, start in enumerate(range(0, len(samples), batch_size))
+    }
+
+
+def combine_assemblies(assemblies, location):
+    """Writes the contigs of all assemblies to one fasta file, the contig ids get the number of their sample"""
+    with open(location, "w") as combined_file:
+        for number, assembly in enumerate(assemblies):
+            with open(assembly) as assembly_file:
+                for line in assembly_file:
+                    if line.startswith(">"):
+                        line = f">juno{number}_{line[1:].lstrip()}"
+                    combined_file.write(line)
+                    if not line.endswith("\n"):
+                        combined_file.write("\n")
+
+
+def split_results(location, output_dirs):
+    """Writes the hits of the combined run per sample, with the original contig ids. Samples without hits get
+    a result file with only the header, like amrfinder gives."""
+    with open(location) as result_file:
+        header = result_file.readline()
+        lines = result_file.readlines()
+    columns = header.rstrip("\n").split("\t")
+    contig_index = columns.index(CONTIG_COLUMN) if CONTIG_COLUMN in columns else 1
+    hits = {number: [] for number in range(len(output_dirs))}
+    for line in lines:
+        fields = line.rstrip("\n").split("\t")
+        match = CONTIG_PREFIX.match(fields[contig_index])
+        if match is None:
+            raise ValueError(f"Contig id {fields[contig_index]} in {location} is not from a sample of the batch")
+        fields[contig_index] = match.group(2)
+        hits[int(match.group(1))].append("\t".join(fields) + "\n")
+    for number, output_dir in enumerate(output_dirs):
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        with open(Path(output_dir, RESULT_FILE), "w") as sample_file:
+            sample_file.write(header)
+            sample_file.writelines(hits[number])
+
+
+def run_batch(
+    assemblies,
+    output_dirs,
+    database,
+    threads=1,
+    tmp_dir=None,
+    cache=None,
+    environment=None,
+    cache_database=None,
+):
+    """Runs amrfinder for the assemblies, assemblies with results in the result cache (bin/result_cache.py,
+    same key as the rule for a single sample) are not analysed again. The key is made with cache_database when
+    the database is a local copy (bin/stage_databases.py) of it."""
+    if len(assemblies) != len(output_dirs):
+        raise ValueError("Every assembly needs an output directory")
+    keys = {}
+    if cache is not None:
+        from result_cache import cache_key
+
+        for assembly, output_dir in zip(assemblies, output_dirs):
+            key = cache_key("amrfinderplus", [assembly], [cache_database or database], environment)
+            if not cache.fetch(key, output_dir):
+                keys[output_dir] = key
+        missing = [index for index, output_dir in enumerate(output_dirs) if output_dir in keys]
+        assemblies = [assemblies[index] for index in missing]
+        output_dirs = [output_dirs[index] for index in missing]
+        if not assemblies:
+            return
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as batch_dir:
+        combined = Path(batch_dir, "assemblies.fasta")
+        result = Path(batch_dir, RESULT_FILE)
+        combine_assemblies(assemblies, combined)
+        subprocess.run(
+            [
+                "amrfinder",
+                "-n",
+                str(combined),
+                "--plus",
+                "--threads",
+                str(threads),
+                "-o",
+                str(result),
+                "-d",
+                str(database),
+            ],
+            check=True,
+        )
+        split_results(result, output_dirs)
+    for output_dir, key in keys.items():
+        cache.store(key, output_dir, {"tool": "amrfinderplus", "parameters": {}})
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    argument_parser.add_argument("-a", "--assemblies", nargs="+", required=True)
+    argument_parser.add_argument(
+        "-o",
+        "--output_dirs",
+        nargs="+",
+        required=True,
+        help="Output directory of every assembly, in the same order",
+    )
+    argument_parser.add_argument("-d", "--database", required=True)
+    argument_parser.add_argument("--threads", type=int, default=1)
+    argument_parser.add_argument(
+        "--tmp_dir", default=None, help="Directory for the combined fasta file"
+    )
+    argument_parser.add_argument("--cache_dir", default=None, help="Result cache, see bin/result_cache.py")
+    argument_parser.add_argument("--cache_max_gb", type=float, default=None)
+    argument_parser.add_argument("--environment", default=None, help="Conda environment file of amrfinder, part of the cache key")
+    argument_parser.add_argument(
+        "--cache_database", default=None, help="Database the cache key is made with, default is --database"
+    )
+    args = argument_parser.parse_args()
+    cache = None
+    if args.cache_dir:
+        from result_cache import ResultCache
+
+        cache = ResultCache(args.cache_dir, args.cache_max_gb)
+    run_batch(
+        args.assemblies,
+        args.output_dirs,
+        args.database,
+        args.threads,
+        args.tmp_dir,
+        cache,
+        args.environment,
+        args.cache_database,
+    )
+
+
+if __name__ == "__main__":
+    main()
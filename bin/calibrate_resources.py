@@ -0,0 +1,198 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Fits the resource_model of config/pipeline_parameters.yaml to the benchmarks of previous runs.
+For each tool the peak memory and the run time of every sample are fitted to the size of its input (least squares),
+the line is raised by the 95th percentile of the residuals and a safety factor, so few jobs need a restart. A job of
+a batch rule is measured against the summed input of the samples of its batch, which juno_amr.py writes to
+amrfinderplus_batches.yaml next to the sample sheet in the audit trail.
+Example: python3 bin/calibrate_resources.py --run output/log/benchmark output/audit_trail/sample_sheet.json -o resource_model.yaml
+"""
+
+import argparse
+import csv
+from pathlib import Path
+
+import yaml
+
+from performance_report import CACHE_HIT_SUFFIX, percentile
+from resource_model import TOOL_RULES, file_size_mb
+from sample_sheet import load_sample_sheet
+
+# Resource in the model and how it is computed from a line of a snakemake benchmark file
+BENCHMARK_RESOURCES = {
+    "mem_gb": lambda row: float(row["max_rss"]) / 1024,
+    "runtime": lambda row: float(row["s"]) / 60,
+}
+# Rules whose benchmarks are named after a batch of samples, and the file with the samples of every batch
+BATCH_RULES = ["runamrfinderplusBatch"]
+BATCHES_FILE = "amrfinderplus_batches.yaml"
+
+
+def read_benchmark(location):
+    """The largest value of each resource over the repeats in a snakemake benchmark file"""
+    values = {}
+    with open(location, "r", newline="") as benchmark_file:
+        for row in csv.DictReader(benchmark_file, delimiter="\t"):
+            for resource, get_value in BENCHMARK_RESOURCES.items():
+                try:
+                    value = get_value(row)
+                except (KeyError, ValueError):
+                    # Benchmarks have NA when the process was too short to be measured
+                    continue
+                values[resource] = max(values.get(resource, 0), value)
+    return values
+
+
+def read_batches(sample_sheet_location):
+    """Samples of every batch of a run, None when the run has no batches file"""
+    location = Path(sample_sheet_location).with_name(BATCHES_FILE)
+    if not location.is_file():
+        return None
+    with open(location) as batches_file:
+        return yaml.safe_load(batches_file)
+
+
+def benchmark_jobs(benchmark_dir, rule_name, samples, batches):
+    """Benchmark file and samples of every job of a rule"""
+    rule_dir = Path(benchmark_dir, rule_name)
+    if rule_name not in BATCH_RULES:
+        return [(rule_dir.joinpath(f"{sample}.tsv"), [sample]) for sample in samples]
+    locations = sorted(rule_dir.glob("*.tsv"))
+    if locations and batches is None:
+        print(
+            f"# {len(locations)} benchmarks of {rule_name} in {benchmark_dir} skipped, "
+            f"there is no {BATCHES_FILE} next to the sample sheet"
+        )
+        return []
+    return [(location, batches.get(location.stem, [])) for location in locations]
+
+
+def collect_measurements(runs):
+    """(input size in MB, resources) of every job with a benchmark, per tool"""
+    measurements = {tool: [] for tool, file_keys in TOOL_RULES.values()}
+    for benchmark_dir, sample_sheet_location in runs:
+        samples = load_sample_sheet(sample_sheet_location)
+        batches = read_batches(sample_sheet_location)
+        for rule_name, (tool, file_keys) in TOOL_RULES.items():
+            for location, job_samples in benchmark_jobs(benchmark_dir, rule_name, samples, batches):
+                # Jobs whose results came from the result cache did not run the tool
+                if not location.is_file() or location.with_suffix(CACHE_HIT_SUFFIX).exists():
+                    continue
+                paths = [
+                    samples[sample][key]
+                    for sample in job_samples
+                    if sample in samples
+                    for key in file_keys
+                    if samples[sample].get(key)
+                ]
+                size = file_size_mb(paths)
+                # Input files of old runs can be removed, their size is unknown
+                if size > 0:
+                    measurements[tool].append((size, read_benchmark(location)))
+    return measurements
+
+
+def fit_line(points, safety_factor):
+    """Least squares line through (size, value) points, raised to cover 95% of the points"""
+    sizes = [size for size, value in points]
+    values = [value for size, value in points]
+    mean_size = sum(sizes) / len(sizes)
+    mean_value = sum(values) / len(values)
+    variance = sum((size - mean_size) ** 2 for size in sizes)
+    if variance > 0:
+        per_mb = sum(
+            (size - mean_size) * (value - mean_value) for size, value in points
+        ) / variance
+    else:
+        per_mb = 0.0
+    # Resources do not go down with a larger input
+    per_mb = max(per_mb, 0.0)
+    intercept = mean_value - per_mb * mean_size
+    residuals = [value - (intercept + per_mb * size) for size, value in points]
+    intercept += max(percentile(residuals, 0.95), 0.0)
+    return intercept * safety_factor, per_mb * safety_factor
+
+
+def calibrate(resource_model, measurements, safety_factor, minimum_samples):
+    """Returns a copy of the resource model with the lines fitted to the measurements"""
+    calibrated = {tool: dict(resources) for tool, resources in resource_model.items()}
+    for tool, samples in measurements.items():
+        for resource in BENCHMARK_RESOURCES:
+            points = [
+                (size, values[resource]) for size, values in samples if resource in values
+            ]
+            if tool not in calibrated or resource not in calibrated[tool]:
+                continue
+            if len(points) < minimum_samples:
+                print(f"# {tool} {resource}: {len(points)} benchmarks, not calibrated")
+                continue
+            intercept, per_mb = fit_line(points, safety_factor)
+            calibrated[tool][resource] = {
+                **calibrated[tool][resource],
+                "intercept": round(intercept, 3),
+                "per_mb": round(per_mb, 6),
+            }
+            print(f"# {tool} {resource}: fitted to {len(points)} benchmarks")
+    return calibrated
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    argument_parser.add_argument(
+        "--run",
+        nargs=2,
+        action="append",
+        required=True,
+        metavar=("BENCHMARK_DIR", "SAMPLE_SHEET"),
+        help="Benchmark directory (<output>/log/benchmark) and sample sheet of a previous run, can be given more than once",
+    )
+    argument_parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        default=Path(__file__).parent.parent.joinpath("config", "pipeline_parameters.yaml"),
+        help="Pipeline parameters with the current resource model, its limits (min, max) are kept",
+    )
+    argument_parser.add_argument(
+        "--safety_factor",
+        type=float,
+        default=1.2,
+        help="The fitted lines are multiplied by this factor, default is 1.2",
+    )
+    argument_parser.add_argument(
+        "--minimum_samples",
+        type=int,
+        default=10,
+        help="Resources with fewer benchmarks are not calibrated, default is 10",
+    )
+    argument_parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=None,
+        help="Yaml file for the calibrated resource model, default is to print it",
+    )
+    args = argument_parser.parse_args()
+
+    with open(args.config) as config_file:
+        resource_model = yaml.safe_load(config_file)["resource_model"]
+    measurements = collect_measurements(args.run)
+    calibrated = calibrate(
+        resource_model, measurements, args.safety_factor, args.minimum_samples
+    )
+
+    output = yaml.safe_dump(
+        {"resource_model": calibrated}, sort_keys=False, default_flow_style=None
+    )
+    if args.output:
+        args.output.write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
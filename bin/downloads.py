@@ -4,14 +4,117 @@ Authors: Roxanne Wolthuis
 Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
 Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
 Date: 30 - 03 - 2021
-Documentation: -
+Documentation: Downloads and installs the software and databases of Juno-amr. The components are installed at
+the same time, each under a file lock and in a temporary directory that is renamed into place when it is complete,
+so runs that start together on a new db_dir do not corrupt each other. The installed components can be exported
+to a tarball bundle (with the KMA indexes) and imported on another node without downloading or indexing again.
+Example: python3 bin/downloads.py -d /mnt/db/juno-amr --export juno_amr_databases.tar.gz
+         python3 bin/downloads.py -d /scratch/juno-amr --import juno_amr_databases.tar.gz
 """
 
 import argparse
+import datetime
+import fcntl
+import json
+import os
 import pathlib
+import re
+import shutil
 import subprocess
-import os
-import juno_library.helper_functions as hf
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+BITBUCKET = "https://bitbucket.org/genomicepidemiology"
+# Written in a component when it is completely installed
+INSTALLED_FILE = ".juno_amr_installed.json"
+BUNDLE_MANIFEST = "bundle.json"
+# Only regular files and directories inside the target are extracted, on python versions that support it
+EXTRACT_ARGUMENTS = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+
+
+class Component:
+    """Software or database that is installed from a git repository into a directory"""
+
+    def __init__(self, name, kind, repository, legacy_check_file=None, post_install=None):
+        self.name = name
+        self.kind = kind
+        # Components without a repository are installed by hand, they are only exported and imported
+        self.repository = repository
+        # Installs made before the installed file existed are recognised by this file
+        self.legacy_check_file = legacy_check_file
+        self.post_install = post_install
+
+
+def install_kma_indexes(directory):
+    """Index the database with KMA, INSTALL.py of the database does this. Databases without INSTALL.py are
+    indexed like it does, every <name>.fsa to <name>.comp.b and the other KMA index files."""
+    directory = pathlib.Path(directory)
+    if directory.joinpath("INSTALL.py").is_file():
+        subprocess.run(
+            ["python3", "INSTALL.py"], cwd=directory, check=True, stdin=subprocess.DEVNULL
+        )
+        return
+    for fasta in sorted(directory.glob("*.fsa")):
+        subprocess.run(["kma_index", "-i", fasta.name, "-o", fasta.stem], cwd=directory, check=True)
+
+
+def has_kma_indexes(directory):
+    return any(pathlib.Path(directory).glob("*.comp.b"))
+
+
+def install_resfinder_db(directory):
+    install_kma_indexes(directory)
+    # Applying a change in the phenotypes.txt file of resfinder_db for gene OXA-244
+    phenotypes = pathlib.Path(directory, "phenotypes.txt")
+    if phenotypes.is_file():
+        phenotypes.write_text(
+            re.sub(
+                r"(blaOXA-244_1_KP659189)(\tBeta-lactam)(\tUnknown Beta-lactam)",
+                r"\1\2\tAmoxicillin, Amoxicillin+Clavulanic acid, Ampcillin, Ampicillin+Clavulanic acid, Imipenem, Meropenem, Piperacillin, Piperacillin+Tazobactam",
+                phenotypes.read_text(),
+            )
+        )
+
+
+COMPONENTS = {
+    "resfinder": Component("resfinder", "software", "resfinder", "src/resfinder/run_resfinder.py"),
+    "virulencefinder": Component(
+        "virulencefinder", "software", "virulencefinder", "virulencefinder.py"
+    ),
+    "resfinder_db": Component(
+        "resfinder_db", "database", "resfinder_db", "config", install_resfinder_db
+    ),
+    "pointfinder_db": Component(
+        "pointfinder_db", "database", "pointfinder_db", "config", install_kma_indexes
+    ),
+    # The KMA indexes are used by --virulencefinder_method kma
+    "virulencefinder_db": Component(
+        "virulencefinderdb", "database", "virulencefinder_db", "config", install_kma_indexes
+    ),
+    "amrfinderplus_db": Component("amrfinderplusdb", "database", None),
+}
+
+
+@contextmanager
+def file_lock(location):
+    """Exclusive lock on a file next to the directory that is installed, waits until other runs are done"""
+    location.parent.mkdir(parents=True, exist_ok=True)
+    with open(location, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def replace_directory(source, destination):
+    """Renames source to destination, an incomplete destination of an interrupted install is removed"""
+    if destination.exists():
+        old = destination.with_name(f".{destination.name}.old.{os.getpid()}")
+        os.rename(destination, old)
+        shutil.rmtree(old, ignore_errors=True)
+    os.rename(source, destination)
 
 
 class DownloadsJunoAmr:
@@ -30,10 +133,20 @@ class DownloadsJunoAmr:
         db_pointfinder_asked_version="legacy_final_working_version",
         db_virulencefinder_asked_version="master",
         # Amrfinderplus db is manually downloaded, the current version in use is: 2022-12-19.1
+        git_mirror=BITBUCKET,
+        bundle=None,
+        bin_dir=None,
     ):
         self.db_dir = pathlib.Path(db_dir)
-        self.bin_dir = pathlib.Path(__file__).parent.absolute()
+        self.bin_dir = pathlib.Path(bin_dir or pathlib.Path(__file__).parent).absolute()
         self.update_dbs = update_dbs
+        # Base url of the git repositories, a local mirror (file://) can be used on nodes without internet
+        self.git_mirror = git_mirror.rstrip("/")
+        # The databases are removed before a bundle is imported, so an update with a bundle installs the bundle
+        if self.update_dbs:
+            shutil.rmtree(self.db_dir, ignore_errors=True)
+        if bundle is not None:
+            self.import_bundle(bundle)
         self.downloaded_versions = self.get_downloads_juno_amr(
             software_virulence_finder_asked_version=software_virulence_finder_asked_version,
             software_resfinder_asked_version=software_resfinder_asked_version,
@@ -42,77 +155,97 @@ class DownloadsJunoAmr:
             db_virulencefinder_asked_version=db_virulencefinder_asked_version,
         )
 
+    def directory(self, component):
+        parent = self.bin_dir if component.kind == "software" else self.db_dir
+        return parent.joinpath(component.name)
+
+    def installed_version(self, component):
+        """Version of an installed component, None if it is not (completely) installed"""
+        directory = self.directory(component)
+        installed_file = directory.joinpath(INSTALLED_FILE)
+        if installed_file.is_file():
+            with open(installed_file) as opened_file:
+                return json.load(opened_file)["version"]
+        if component.legacy_check_file is None:
+            return "manual" if directory.is_dir() and any(directory.iterdir()) else None
+        if directory.joinpath(component.legacy_check_file).is_file():
+            return "unknown"
+        return None
+
+    def reported_version(self, component, asked_version):
+        """The installed version (for example from a bundle), the asked version for installs without an installed file"""
+        installed = self.installed_version(component)
+        return asked_version if installed in [None, "unknown"] else installed
+
+    def install(self, component, version):
+        """Clones, checks out and installs a component in a temporary directory and renames it into place"""
+        directory = self.directory(component)
+        if self.installed_version(component) is not None:
+            return self.reported_version(component, version)
+        with file_lock(directory.with_name(f".{directory.name}.lock")):
+            # Another run may have installed it while this one waited for the lock
+            if self.installed_version(component) is not None:
+                return self.reported_version(component, version)
+            print(f"\x1b[0;33m Downloading {component.name}...\n\033[0;0m")
+            tmp_dir = directory.with_name(f".{directory.name}.tmp.{os.getpid()}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            try:
+                subprocess.run(
+                    ["git", "clone", "--quiet", f"{self.git_mirror}/{component.repository}.git", str(tmp_dir)],
+                    check=True,
+                )
+                subprocess.run(["git", "checkout", "--quiet", version], cwd=tmp_dir, check=True)
+                commit = subprocess.run(
+                    ["git", "rev-parse", "HEAD"], cwd=tmp_dir, check=True, capture_output=True, text=True
+                ).stdout.strip()
+                if component.post_install is not None:
+                    component.post_install(tmp_dir)
+                with open(tmp_dir.joinpath(INSTALLED_FILE), "w") as installed_file:
+                    json.dump(
+                        {"name": component.name, "version": version, "commit": commit},
+                        installed_file,
+                    )
+                replace_directory(tmp_dir, directory)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        return version
+
     def download_software_resfinder(self, version):
         """Function to download resfinder if it is not present"""
-        current_dir = os.getcwd()
-        resfinder_software_dir = self.bin_dir.joinpath("resfinder")
-        if not resfinder_software_dir.joinpath("run_resfinder.py").is_file():
-            print("\x1b[0;33m Downloading resfinder software...\n\033[0;0m")
-            os.chdir(self.bin_dir)
-            os.system(
-                f"git clone https://bitbucket.org/genomicepidemiology/resfinder.git && cd {resfinder_software_dir} && git reset --hard {version}"
-            )
-            os.chdir(current_dir)
-        return version
+        return self.install(COMPONENTS["resfinder"], version)
 
     def download_software_virulencefinder(self, version):
         """Function to download virulencefinder if it is not present"""
-        virulencefinder_software_dir = self.bin_dir.joinpath("virulencefinder")
-        if not virulencefinder_software_dir.joinpath("virulencefinder.py").is_file():
-            print("\x1b[0;33m Downloading virulencefinder software...\n\033[0;0m")
-            hf.download_git_repo(
-                version,
-                "https://bitbucket.org/genomicepidemiology/virulencefinder.git",
-                virulencefinder_software_dir,
-            )
-        return version
+        return self.install(COMPONENTS["virulencefinder"], version)
 
     def download_db_virulencefinder(self, version):
         """Function to download virulencefinder database if it is not present"""
-        virulencefinder_db_dir = self.db_dir.joinpath("virulencefinderdb")
-        if not virulencefinder_db_dir.joinpath("config").is_file():
-            print("\x1b[0;33m Downloading virulencefinder database...\n\033[0;0m")
-            hf.download_git_repo(
-                version,
-                "https://bitbucket.org/genomicepidemiology/virulencefinder_db.git",
-                virulencefinder_db_dir,
-            )
+        version = self.install(COMPONENTS["virulencefinder_db"], version)
+        self.add_kma_indexes(COMPONENTS["virulencefinder_db"])
         return version
 
+    def add_kma_indexes(self, component):
+        """Indexes a database that was installed before its KMA indexes were part of the install"""
+        directory = self.directory(component)
+        if not directory.is_dir() or has_kma_indexes(directory):
+            return
+        with file_lock(directory.with_name(f".{directory.name}.lock")):
+            if has_kma_indexes(directory):
+                return
+            print(f"\x1b[0;33m Building the KMA indexes of {component.name}...\n\033[0;0m")
+            install_kma_indexes(directory)
+            # The installed file is part of the version of the database for the staged copies and the result cache
+            installed_file = directory.joinpath(INSTALLED_FILE)
+            if installed_file.is_file():
+                os.utime(installed_file)
+
     def download_db_resfinder(self, version):
         """Function to download resfinder database if it is not present"""
-        resfinder_db_dir = self.db_dir.joinpath("resfinder_db")
-        current_dir = os.getcwd()
-        if not resfinder_db_dir.joinpath("config").is_file():
-            print("\x1b[0;33m Downloading resfinder database...\n\033[0;0m")
-            hf.download_git_repo(
-                version,
-                "https://bitbucket.org/genomicepidemiology/resfinder_db.git",
-                resfinder_db_dir,
-            )
-            os.chdir(resfinder_db_dir)
-            os.system(f"python3 INSTALL.py")
-            # Applying a change in the phenotypes.txt file of resfinder_db for gene OXA-244
-            oxa_cmd = "sed -i 's/\(blaOXA-244_1_KP659189\)\(\tBeta-lactam\)\(\tUnknown Beta-lactam\)/\\1\\2\tAmoxicillin, Amoxicillin+Clavulanic acid, Ampcillin, Ampicillin+Clavulanic acid, Imipenem, Meropenem, Piperacillin, Piperacillin+Tazobactam/' phenotypes.txt"
-            os.system(oxa_cmd)
-            os.chdir(current_dir)
-        return version
+        return self.install(COMPONENTS["resfinder_db"], version)
 
     def download_db_pointfinder(self, version):
         """Function to download pointfinder database if it is not present"""
-        pointfinder_db_dir = self.db_dir.joinpath("pointfinder_db")
-        current_dir = os.getcwd()
-        if not pointfinder_db_dir.joinpath("config").is_file():
-            print("\x1b[0;33m Downloading pointfinder database...\n\033[0;0m")
-            hf.download_git_repo(
-                version,
-                "https://bitbucket.org/genomicepidemiology/pointfinder_db.git",
-                pointfinder_db_dir,
-            )
-            os.chdir(pointfinder_db_dir)
-            os.system(f"python3 INSTALL.py")
-            os.chdir(current_dir)
-        return version
+        return self.install(COMPONENTS["pointfinder_db"], version)
 
     def get_downloads_juno_amr(
         self,
@@ -122,87 +255,172 @@ class DownloadsJunoAmr:
         db_virulencefinder_asked_version,
         db_pointfinder_asked_version,
     ):
-        if self.update_dbs:
-            try:
-                rm_dir = subprocess.run(
-                    ["rm", "-rf", str(self.db_dir)], check=True, timeout=60
-                )
-            except:
-                rm_dir.kill()
-                raise
-        software_version = {
-            "resfinder": self.download_software_resfinder(
-                version=software_resfinder_asked_version
-            ),
-            "virulencefinder": self.download_software_virulencefinder(
-                version=software_virulence_finder_asked_version
+        downloads = {
+            "resfinder": (self.download_software_resfinder, software_resfinder_asked_version),
+            "virulencefinder": (
+                self.download_software_virulencefinder,
+                software_virulence_finder_asked_version,
             ),
-            "resfinder_db": self.download_db_resfinder(
-                version=db_resfinder_asked_version
-            ),
-            "pointfinder_db": self.download_db_pointfinder(
-                version=db_pointfinder_asked_version
-            ),
-            "virulencefinder_db": self.download_db_virulencefinder(
-                version=db_virulencefinder_asked_version
+            "resfinder_db": (self.download_db_resfinder, db_resfinder_asked_version),
+            "pointfinder_db": (self.download_db_pointfinder, db_pointfinder_asked_version),
+            "virulencefinder_db": (
+                self.download_db_virulencefinder,
+                db_virulencefinder_asked_version,
             ),
         }
+        # Downloading and indexing wait for the network and subprocesses, so threads are enough
+        with ThreadPoolExecutor(max_workers=len(downloads)) as executor:
+            futures = {
+                name: executor.submit(download, version)
+                for name, (download, version) in downloads.items()
+            }
+            software_version = {name: future.result() for name, future in futures.items()}
         return software_version
 
-    if __name__ == "__main__":
-        argument_parser = argparse.ArgumentParser(
-            description="Dowload databases for Juno-amr"
-        )
-        argument_parser.add_argument(
-            "-d",
-            "--db-dir",
-            type=pathlib.Path,
-            default="db",
-            help="Database directory where the databases will be stored.",
-        )
-        argument_parser.add_argument(
-            "-sr",
-            "--software-resfinder-version",
-            type=str,
-            default="4.6.0",
-            help="Version to download for resfinder software.",
-        )
-        argument_parser.add_argument(
-            "-sv",
-            "--software-virulencefinder-version",
-            type=str,
-            default="2.0.4",
-            help="Version to download for virulencefinder software.",
-        )
-        argument_parser.add_argument(
-            "-dbv",
-            "--database-virulencefinder-version",
-            type=str,
-            default="master",
-            help="Version to download for virulencefinder database.",
-        )
-        argument_parser.add_argument(
-            "-dbr",
-            "--database-resfinder-version",
-            type=str,
-            default="master",
-            help="Version to download for resfinder database.",
-        )
-        argument_parser.add_argument(
-            "-dbp",
-            "--database-pointfinder-version",
-            type=str,
-            default="master",
-            help="Version to download for pointfinder database.",
-        )
-        argument_parser.add_argument("--update", dest="update_dbs", action="store_true")
-        args = argument_parser.parse_args()
-        downloads = DownloadsJunoAmr(
-            db_dir=args.db_dir,
-            update_dbs=args.update_dbs,
-            software_resfinder_asked_version=args.software_resfinder_version,
-            software_virulencefinder_asked_version=args.software_virulencefinder_asked_version,
-            db_pointfinder_asked_version=args.database_pointfinder_version,
-            db_resfinder_asked_version=args.database_resfinder_version,
-            db_virulencefinder_asked_version=args.database_virulencefinder_version,
-        )
+    def export_bundle(self, location):
+        """Writes the installed components (without their git history) and a manifest with their versions to a tarball"""
+        manifest = {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "components": {},
+        }
+        with tarfile.open(location, "w:gz") as bundle:
+            for name, component in COMPONENTS.items():
+                directory = self.directory(component)
+                version = self.installed_version(component)
+                if version is None:
+                    if component.repository is None:
+                        continue
+                    raise FileNotFoundError(f"{component.name} is not installed in {directory.parent}")
+                bundle.add(
+                    directory,
+                    arcname=f"{component.kind}/{component.name}",
+                    filter=lambda member: (
+                        None if ".git" in pathlib.PurePosixPath(member.name).parts else member
+                    ),
+                )
+                manifest["components"][name] = version
+            manifest_file = pathlib.Path(location).with_name(f".{BUNDLE_MANIFEST}.{os.getpid()}")
+            manifest_file.write_text(json.dumps(manifest, indent=2))
+            try:
+                bundle.add(manifest_file, arcname=BUNDLE_MANIFEST)
+            finally:
+                manifest_file.unlink()
+        return manifest
+
+    def import_bundle(self, location):
+        """Installs the components of a bundle that are not installed yet, each under its lock"""
+        with tarfile.open(location, "r:*") as bundle:
+            manifest = json.load(bundle.extractfile(BUNDLE_MANIFEST))
+            members = bundle.getmembers()
+            for member in members:
+                if member.name.startswith("/") or ".." in pathlib.PurePosixPath(member.name).parts:
+                    raise ValueError(f"Unsafe path {member.name} in {location}")
+            for name, component in COMPONENTS.items():
+                if name not in manifest["components"]:
+                    continue
+                directory = self.directory(component)
+                arcname = f"{component.kind}/{component.name}"
+                with file_lock(directory.with_name(f".{directory.name}.lock")):
+                    if self.installed_version(component) is not None:
+                        continue
+                    print(f"\x1b[0;33m Installing {component.name} from {location}...\n\033[0;0m")
+                    tmp_dir = directory.with_name(f".{directory.name}.tmp.{os.getpid()}")
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                    try:
+                        component_members = [
+                            member
+                            for member in members
+                            if member.name == arcname or member.name.startswith(arcname + "/")
+                        ]
+                        bundle.extractall(tmp_dir, members=component_members, **EXTRACT_ARGUMENTS)
+                        replace_directory(tmp_dir.joinpath(arcname), directory)
+                    finally:
+                        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return manifest
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    argument_parser.add_argument(
+        "-d",
+        "--db-dir",
+        type=pathlib.Path,
+        default="db",
+        help="Database directory where the databases will be stored.",
+    )
+    argument_parser.add_argument(
+        "-sr",
+        "--software-resfinder-version",
+        type=str,
+        default="4.6.0",
+        help="Version to download for resfinder software.",
+    )
+    argument_parser.add_argument(
+        "-sv",
+        "--software-virulencefinder-version",
+        type=str,
+        default="2.0.4",
+        help="Version to download for virulencefinder software.",
+    )
+    argument_parser.add_argument(
+        "-dbv",
+        "--database-virulencefinder-version",
+        type=str,
+        default="master",
+        help="Version to download for virulencefinder database.",
+    )
+    argument_parser.add_argument(
+        "-dbr",
+        "--database-resfinder-version",
+        type=str,
+        default="master",
+        help="Version to download for resfinder database.",
+    )
+    argument_parser.add_argument(
+        "-dbp",
+        "--database-pointfinder-version",
+        type=str,
+        default="legacy_final_working_version",
+        help="Version to download for pointfinder database.",
+    )
+    argument_parser.add_argument("--update", dest="update_dbs", action="store_true")
+    argument_parser.add_argument(
+        "--mirror",
+        default=BITBUCKET,
+        help=f"Base url of the git repositories, for example file:///data/mirrors. Default is {BITBUCKET}",
+    )
+    argument_parser.add_argument(
+        "--import",
+        dest="import_bundle",
+        type=pathlib.Path,
+        default=None,
+        help="Install the components in this bundle first, only missing components are downloaded",
+    )
+    argument_parser.add_argument(
+        "--export",
+        dest="export_bundle",
+        type=pathlib.Path,
+        default=None,
+        help="Write the installed software and databases to this bundle (tar.gz)",
+    )
+    args = argument_parser.parse_args()
+    downloads = DownloadsJunoAmr(
+        db_dir=args.db_dir,
+        update_dbs=args.update_dbs,
+        software_resfinder_asked_version=args.software_resfinder_version,
+        software_virulence_finder_asked_version=args.software_virulencefinder_version,
+        db_pointfinder_asked_version=args.database_pointfinder_version,
+        db_resfinder_asked_version=args.database_resfinder_version,
+        db_virulencefinder_asked_version=args.database_virulencefinder_version,
+        git_mirror=args.mirror,
+        bundle=args.import_bundle,
+    )
+    print(downloads.downloaded_versions)
+    if args.export_bundle:
+        downloads.export_bundle(args.export_bundle)
+
+
+if __name__ == "__main__":
+    main()
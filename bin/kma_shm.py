@@ -0,0 +1,140 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Loads the KMA indexes of the ResFinder and PointFinder databases into shared memory (kma shm) once per
+node, so the ResFinder jobs that run side by side share one copy instead of each loading the index. ResFinder uses
+the shared copy through bin/kma_shared, a kma that adds -shm to the calls of the indexes that are loaded. Every run
+that uses the shared indexes registers itself in /dev/shm, the indexes are only removed when the last run on the node
+is done.
+Example: python3 bin/kma_shm.py setup /mnt/db/juno-amr/resfinder_db /mnt/db/juno-amr/pointfinder_db
+         python3 bin/kma_shm.py teardown /mnt/db/juno-amr/resfinder_db /mnt/db/juno-amr/pointfinder_db
+"""
+
+import argparse
+import fcntl
+import hashlib
+import os
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+
+# kma that uses the indexes in shared memory, given to ResFinder with -k
+KMA_SHARED = Path(__file__).parent.joinpath("kma_shared").absolute()
+# Runs that use the shared indexes, one file per process id (node local). The loaded indexes are marked in its
+# indexes directory (see index_marker), bin/kma_shared reads the other indexes from disk.
+USERS_DIR = Path("/dev/shm/juno_amr_kma")
+# Every KMA index has a <prefix>.comp.b file
+INDEX_SUFFIX = ".comp.b"
+
+
+def kma_databases(database_dirs):
+    """Prefixes of all KMA indexes in the database directories"""
+    prefixes = []
+    for database_dir in database_dirs:
+        for index in sorted(Path(database_dir).glob(f"**/*{INDEX_SUFFIX}")):
+            prefixes.append(str(index)[: -len(INDEX_SUFFIX)])
+    return prefixes
+
+
+def users_dir(databases):
+    key = hashlib.sha1("\n".join(sorted(databases)).encode()).hexdigest()[:16]
+    return USERS_DIR.joinpath(key)
+
+
+def index_marker(database):
+    """File that marks the index as loaded, named after its resolved path like bin/kma_shared computes it"""
+    key = hashlib.sha1(os.path.realpath(database).encode()).hexdigest()[:16]
+    return USERS_DIR.joinpath("indexes", key)
+
+
+def running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def other_users(databases, pid):
+    """Process ids of the other runs on this node that still use the indexes"""
+    directory = users_dir(databases)
+    if not directory.is_dir():
+        return []
+    return [
+        int(user.name)
+        for user in directory.iterdir()
+        if user.name.isdigit() and int(user.name) != pid and running(int(user.name))
+    ]
+
+
+@contextmanager
+def users_lock():
+    """Runs that start or stop at the same time on a node load and remove the indexes one after the other"""
+    USERS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(USERS_DIR.joinpath(".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def setup_shared_memory(databases, pid=None, kma="kma"):
+    """Loads the indexes into shared memory, unless another run on the node already did"""
+    pid = pid or os.getpid()
+    directory = users_dir(databases)
+    with users_lock():
+        directory.mkdir(parents=True, exist_ok=True)
+        if not other_users(databases, pid):
+            for database in databases:
+                subprocess.run([kma, "shm", "-t_db", database, "-shmLvl", "1"], check=True)
+                marker = index_marker(database)
+                marker.parent.mkdir(exist_ok=True)
+                marker.touch()
+        directory.joinpath(str(pid)).touch()
+    print(f"{len(databases)} KMA indexes in shared memory")
+
+
+def teardown_shared_memory(databases, pid=None, kma="kma"):
+    """Removes the indexes from shared memory when no other run on the node uses them"""
+    pid = pid or os.getpid()
+    directory = users_dir(databases)
+    with users_lock():
+        directory.joinpath(str(pid)).unlink(missing_ok=True)
+        if other_users(databases, pid) or not directory.is_dir():
+            return
+        for database in databases:
+            index_marker(database).unlink(missing_ok=True)
+            # A failed destroy only leaves memory in use until the node restarts, it should not fail the run
+            subprocess.run([kma, "shm", "-t_db", database, "-destroy"], check=False)
+        for user in directory.iterdir():
+            user.unlink(missing_ok=True)
+        directory.rmdir()
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    argument_parser.add_argument("action", choices=["setup", "teardown"])
+    argument_parser.add_argument("database_dirs", nargs="+")
+    argument_parser.add_argument(
+        "--pid",
+        type=int,
+        default=None,
+        help="Process id the run is registered with, default is the parent process (the shell)",
+    )
+    args = argument_parser.parse_args()
+    databases = kma_databases(args.database_dirs)
+    pid = args.pid or os.getppid()
+    if args.action == "setup":
+        setup_shared_memory(databases, pid)
+    else:
+        teardown_shared_memory(databases, pid)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,28 +7,386 @@ Date: 30 - 03 - 2021
 Documentation: -
 """
 
-from operator import index
-from statistics import mode
-import sys
 import argparse
-from pandas.core.arrays.sparse import dtype
+import cProfile
 import yaml
 import csv
+import json
 import os
-import pandas as pd
+import re
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-import shutil
+from sample_sheet import load_sample_sheet, read_manifest
+from resfinder_results import (
+    PointMutation,
+    ResultTable,
+    find_resfinder_json,
+    read_amrfinderplus_results,
+    read_pheno_table,
+    read_pointfinder_results,
+    read_resfinder_genes,
+    read_resfinder_json,
+    read_virulencefinder_results,
+)
+from summary_parquet import parquet_location, write_summary_parquet
+from summary_profile import SummaryProfile, timed
+
+
+# The JunoSummary that parses the samples in a worker process of JunoSummary.parse_samples, set once per worker
+worker_summary = None
+
+
+def init_worker(summary):
+    global worker_summary
+    worker_summary = summary
+
+
+def parse_worker_sample(result_files, sample):
+    samplename, sample_dir = sample
+    return worker_summary.parse_result_files(samplename, sample_dir, result_files)
+
+
+def combined_column_name(column, suffix):
+    """Column name in the iles summary, for columns that were merged with suffixes _x/_y and stripped with rstrip("_x") and rstrip("_y")"""
+    return (column + suffix).rstrip("_x").rstrip("_y")
+
+
+class StreamingTableWriter:
+    """Writes the rows of all samples like pd.concat(...).to_csv(mode="a", index=False) would,
+    samples can have different columns. The rows are kept in a temporary file instead of in memory
+    until all samples are added, because the union of the columns is only known at the end."""
+
+    def __init__(self, location):
+        self.location = location
+        # dict is used as an ordered set, the value is the position of the column in the summary
+        self.columns = {}
+        self.spill_file = tempfile.TemporaryFile(mode="w+")
+
+    def add_rows(self, columns, rows):
+        for column in columns:
+            self.columns.setdefault(column, len(self.columns))
+        self.spill_file.write(json.dumps([columns, rows]) + "\n")
+
+    def close(self):
+        self.spill_file.seek(0)
+        with open(self.location, "a", newline="") as csvfile:
+            summary_file = csv.writer(csvfile, lineterminator=os.linesep)
+            summary_file.writerow(self.columns)
+            for line in self.spill_file:
+                columns, rows = json.loads(line)
+                positions = [self.columns[column] for column in columns]
+                for row in rows:
+                    values = [""] * len(self.columns)
+                    for position, value in zip(positions, row):
+                        values[position] = value
+                    summary_file.writerow(values)
+        self.spill_file.close()
+
+
+class StreamingResfinderSummary:
+    """Streaming version of the ResFinder gene and phenotype summaries"""
+
+    summary = "resfinder"
+    tool = "resfinder"
+    result_files = ["ResFinder_results_tab.txt", "pheno_table.txt"]
+
+    def __init__(self, genes_summary_location, pheno_summary_location):
+        self.genes_csvfile = open(genes_summary_location, "w", newline="")
+        self.genes_summary_file = csv.writer(self.genes_csvfile)
+        self.pheno_summary_location = pheno_summary_location
+        self.pheno_table = StreamingTableWriter(pheno_summary_location)
+        self.header_written = False
+
+    def add_sample(self, samplename, records):
+        genes = records["ResFinder_results_tab.txt"]
+        pheno_table = records["pheno_table.txt"]
+
+        # The headers are taken from the first sample
+        if not self.header_written:
+            self.genes_summary_file.writerow(["Sample"] + genes.columns)
+            with open(self.pheno_summary_location, "w", newline="") as csvfile:
+                summary_file = csv.writer(csvfile)
+                for string in pheno_table.comments:
+                    summary_file.writerow([string])
+            self.header_written = True
+
+        for gene in genes.rows:
+            self.genes_summary_file.writerow([samplename] + gene.values())
+
+        antimicrobials = ["Samplename"] + [row.antimicrobial for row in pheno_table.rows]
+        antimicrobial_match = [samplename] + [row.match for row in pheno_table.rows]
+        self.pheno_table.add_rows(antimicrobials, [antimicrobial_match])
+
+    def close(self):
+        self.genes_csvfile.close()
+        self.pheno_table.close()
+
+
+class StreamingPointfinderSummary:
+    """Streaming version of the PointFinder summary"""
+
+    summary = "pointfinder"
+    tool = "resfinder"
+    result_files = ["PointFinder_results.txt"]
+
+    def __init__(self, location):
+        self.csvfile = open(location, "a", newline="")
+        self.summary_file = csv.writer(self.csvfile, lineterminator=os.linesep)
+        self.column_names = None
+
+    def add_sample(self, samplename, records):
+        # PointFinder is not run for samples of species that are not in its database
+        if "PointFinder_results.txt" not in records:
+            return
+        pointfinder_results = records["PointFinder_results.txt"]
+
+        # The column names are taken from the first sample
+        if self.column_names is None:
+            self.column_names = ["Samplename"] + pointfinder_results.columns
+            self.summary_file.writerow(self.column_names)
+
+        for mutation in pointfinder_results.rows:
+            self.summary_file.writerow([samplename] + mutation.values())
+
+    def close(self):
+        if self.column_names is None:
+            self.summary_file.writerow(["Samplename"] + list(PointMutation.columns))
+        self.csvfile.close()
+
+
+class StreamingToolSummary:
+    """Streaming version of the virulencefinder and amrfinderplus summaries"""
+
+    def __init__(self, location, tool, result_file):
+        self.summary = tool
+        self.tool = tool
+        self.result_files = [result_file]
+        self.table = StreamingTableWriter(location)
+
+    def add_sample(self, samplename, records):
+        results = records[self.result_files[0]]
+        self.table.add_rows(
+            ["Samplename"] + results.columns,
+            [[samplename] + row for row in results.rows],
+        )
+
+    def close(self):
+        self.table.close()
+
+
+class StreamingIlesSummary:
+    """Streaming version of the iles summary. Gives the same result as merging the phenotype
+    and pointfinder tables of all samples, the values of each sample are kept in a temporary file
+    until the columns and the cotrimoxazole outcome of the whole run are known."""
+
+    summary = "iles"
+    tool = "resfinder"
+    result_files = ["pheno_table.txt", "PointFinder_results.txt"]
+
+    def __init__(self, location, antibiotics, add_cotrimoxazole):
+        self.location = location
+        self.antibiotics = antibiotics
+        self.antibiotics_regex = re.compile("|".join(antibiotics))
+        self.add_cotrimoxazole = add_cotrimoxazole
+        # dicts are used as ordered sets of the column names of both tables
+        self.pointfinder_columns = {}
+        self.pheno_columns = {}
+        self.spill_file = tempfile.TemporaryFile(mode="w+")
+
+    def add_sample(self, samplename, records):
+        # Link each mutation to the antimicrobials it gives resistance to
+        pointfinder_values = {}
+        for row in records["PointFinder_results.txt"].rows:
+            mutation = row.mutation
+            unique_resistance = []
+            for x in row.resistance.split(","):
+                x = x.strip(" ")
+                if x not in unique_resistance:
+                    unique_resistance.append(x)
+            for x in unique_resistance:
+                antimicrobial = x.lower()
+                if self.antibiotics_regex.search(antimicrobial):
+                    pointfinder_values.setdefault(antimicrobial, []).append(mutation)
+        pointfinder_values = {
+            antimicrobial: self.clean_value(",".join(mutations))
+            for antimicrobial, mutations in sorted(pointfinder_values.items())
+        }
+
+        # Select the antimicrobials of the species, for resistant ones the genetic background is given
+        pheno_values = {}
+        for row in records["pheno_table.txt"].rows:
+            if row.antimicrobial in self.antibiotics:
+                phenotype = row.phenotype
+                if phenotype == "Resistant":
+                    phenotype = row.genetic_background
+                pheno_values[row.antimicrobial.lower()] = self.clean_value(phenotype)
+
+        for antimicrobial in pointfinder_values:
+            self.pointfinder_columns.setdefault(antimicrobial)
+        for antimicrobial in pheno_values:
+            self.pheno_columns.setdefault(antimicrobial)
+        self.spill_file.write(
+            json.dumps([self.clean_value(samplename), pointfinder_values, pheno_values])
+            + "\n"
+        )
+
+    @staticmethod
+    def clean_value(value):
+        return value.replace(",", " ").replace("\n", "")
+
+    def iter_rows(self, pointfinder_names, pheno_names):
+        """Yield samplename and the combined values of each sample, pointfinder values go first"""
+        self.spill_file.seek(0)
+        for line in self.spill_file:
+            samplename, pointfinder_values, pheno_values = json.loads(line)
+            values = {}
+            for sample_values, names in [
+                (pointfinder_values, pointfinder_names),
+                (pheno_values, pheno_names),
+            ]:
+                for column, name in names.items():
+                    if column in sample_values and values.get(name) is None:
+                        values[name] = sample_values[column]
+            yield samplename, values
+
+    def close(self):
+        # Columns found in both tables get a suffix in the merge
+        pointfinder_names = {
+            column: combined_column_name(
+                column, "_x" if column in self.pheno_columns else ""
+            )
+            for column in self.pointfinder_columns
+        }
+        pheno_names = {
+            column: combined_column_name(
+                column, "_y" if column in self.pointfinder_columns else ""
+            )
+            for column in self.pheno_columns
+        }
+        columns = sorted(set(pointfinder_names.values()) | set(pheno_names.values()))
+
+        if self.add_cotrimoxazole:
+            for column in ["trimethoprim", "sulfamethoxazole"]:
+                if column not in columns:
+                    raise KeyError(column)
+            # if trimethoprim or sulfamethoxazole == no resistance in any sample then cotrimoxazole == no resistance
+            no_resistance = any(
+                "No resistance" in [values.get("trimethoprim"), values.get("sulfamethoxazole")]
+                for samplename, values in self.iter_rows(pointfinder_names, pheno_names)
+            )
+            if "cotrimoxazole" not in columns:
+                columns.append("cotrimoxazole")
+
+        with open(self.location, "w", newline="") as csvfile:
+            summary_file = csv.writer(csvfile, lineterminator=os.linesep)
+            summary_file.writerow(["samplename"] + columns)
+            for samplename, values in self.iter_rows(pointfinder_names, pheno_names):
+                if self.add_cotrimoxazole:
+                    if no_resistance:
+                        values["cotrimoxazole"] = "No resistance"
+                    else:
+                        values["cotrimoxazole"] = " ".join(
+                            [values.get("trimethoprim"), values.get("sulfamethoxazole")]
+                        )
+                summary_file.writerow(
+                    [samplename] + [values.get(column) for column in columns]
+                )
+        self.spill_file.close()
+
+
+class StreamingIlesSummaries:
+    """Streaming iles summary of runs with samples of several species. Each antibiotics panel has its own
+    StreamingIlesSummary, with more than one panel these write to temporary files that are merged in the
+    order of the samples at the end. Samples of species without a panel are left out."""
+
+    summary = "iles"
+    tool = "resfinder"
+    result_files = ["pheno_table.txt", "PointFinder_results.txt"]
+
+    def __init__(self, location, sample_panels, panels):
+        self.location = location
+        self.sample_panels = sample_panels
+        used_panels = list(dict.fromkeys(sample_panels.values()))
+        if len(used_panels) == 1:
+            self.temp_dir = None
+            self.locations = {used_panels[0]: location}
+        else:
+            self.temp_dir = tempfile.TemporaryDirectory()
+            self.locations = {
+                panel: os.path.join(self.temp_dir.name, f"{panel}.csv")
+                for panel in used_panels
+            }
+        self.writers = {
+            panel: StreamingIlesSummary(panel_location, *panels[panel])
+            for panel, panel_location in self.locations.items()
+        }
+
+    def add_sample(self, samplename, records):
+        panel = self.sample_panels.get(samplename)
+        if panel is not None:
+            self.writers[panel].add_sample(samplename, records)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        if self.temp_dir is None:
+            return
+
+        # The columns of all panels, in the order they are first found
+        readers = {}
+        opened_files = []
+        columns = {}
+        for panel, panel_location in self.locations.items():
+            opened_file = open(panel_location, "r", newline="")
+            opened_files.append(opened_file)
+            readers[panel] = csv.DictReader(opened_file)
+            columns.update(dict.fromkeys(readers[panel].fieldnames))
+
+        with open(self.location, "w", newline="") as csvfile:
+            summary_file = csv.writer(csvfile, lineterminator=os.linesep)
+            summary_file.writerow(columns)
+            for samplename, panel in self.sample_panels.items():
+                values = next(readers[panel])
+                summary_file.writerow([values.get(column, "") for column in columns])
+        for opened_file in opened_files:
+            opened_file.close()
+        self.temp_dir.cleanup()
 
 
 class JunoSummary:
     def __init__(self, arguments=None):
+        """arguments is a dict with the same names as the command line arguments (see get_user_arguments),
+        used when the summaries are made from python code instead of the command line"""
         self.user_parameters_path = "config/user_parameters.yaml"
         self.summary_folder_path = "summary"
         self.results_folder = "results_per_sample"
+        self.cache_folder = ".cache"
+        # Increase when the parsed records change, so old cache files are not used anymore
+        self.cache_version = 2
         self.antibiotics_ecoli_salm = ["ampicillin", "cefotaxime", "ciprofloxacin", "gentamicin", "meropenem", "sulfamethoxazole", "trimethoprim", "cotrimoxazole", "azithromycin"]
         self.antibiotics_camp = ["ciprofloxacin", "gentamicin", "erythromycin", "tetracycline"]
-
-    def get_user_arguments(self):
+        # Antibiotics panel of the iles summary and whether cotrimoxazole is added, per species
+        self.iles_panels = {
+            "escherichia_coli": (self.antibiotics_ecoli_salm, True),
+            "salmonella": (self.antibiotics_ecoli_salm, True),
+            "campylobacter": (self.antibiotics_camp, False),
+        }
+        # Each result file is parsed once per sample, the parsed records are shared by all summaries
+        self.result_parsers = {
+            "ResFinder_results_tab.txt": ("resfinder", read_resfinder_genes),
+            "pheno_table.txt": ("resfinder", read_pheno_table),
+            "PointFinder_results.txt": ("resfinder", read_pointfinder_results),
+            "results_tab.tsv": ("virulencefinder", read_virulencefinder_results),
+            "amrfinder_result.txt": ("amrfinderplus", read_amrfinderplus_results),
+        }
+        self.parsed_results = {}
+        self.dict_arguments = dict(arguments or {})
+        self.profile = SummaryProfile()
+
+    def get_user_arguments(self, argv=None):
         """Function to parse the command line arguments from the user"""
         # Create argparser
         self.parser = argparse.ArgumentParser(
@@ -94,7 +452,6 @@ class JunoSummary:
             "-i",
             "--input",
             type=str,
-            required=True,
             metavar="dir",
             dest="input",
             # For the amount of samples there has to be at least one
@@ -102,6 +459,36 @@ class JunoSummary:
             help="The input directory for each sample?",
         )
 
+        self.parser.add_argument(
+            "-m",
+            "--input_manifest",
+            type=str,
+            metavar="file",
+            dest="input_manifest",
+            default=None,
+            help="Tsv file with the columns tool and directory, listing the output directory of each sample per tool (resfinder, virulencefinder, amrfinderplus). Used instead of -i, -iv and -ia, for runs with too many samples for the command line",
+        )
+
+        self.parser.add_argument(
+            "-iv",
+            "--input_virulencefinder",
+            type=str,
+            metavar="dir",
+            dest="input_virulencefinder",
+            nargs="+",
+            help="The virulencefinder output directory for each sample, only used with summary type all",
+        )
+
+        self.parser.add_argument(
+            "-ia",
+            "--input_amrfinderplus",
+            type=str,
+            metavar="dir",
+            dest="input_amrfinderplus",
+            nargs="+",
+            help="The amrfinderplus output directory for each sample, only used with summary type all",
+        )
+
         self.parser.add_argument(
             "-st",
             "--summary_type",
@@ -109,39 +496,182 @@ class JunoSummary:
             required=True,
             metavar="name",
             dest="summary_type",
-            help="The type of summaries to create, choose from: resfinder, pointfinder, amrfinderplus or virulencefinder",
+            help="The type of summaries to create, choose from: resfinder, pointfinder, amrfinderplus, virulencefinder, iles or all. With all, every summary that has a file name is created from a single parse of the sample results",
             choices=[
                 "resfinder",
                 "pointfinder",
                 "amrfinderplus",
                 "virulencefinder",
                 "iles",
+                "all",
             ],
         )
 
+        self.parser.add_argument(
+            "-o",
+            "--output_dir",
+            type=str,
+            metavar="dir",
+            dest="output_dir",
+            default=None,
+            help="Output directory of the pipeline, the summary directory is created in it. Default is the 'out' of the user parameters file",
+        )
+
+        self.parser.add_argument(
+            "--species",
+            type=str,
+            metavar="name",
+            dest="species",
+            default=None,
+            help="Species of the samples, decides which iles summary is made. Default is the 'species' of the user parameters file",
+        )
+
+        self.parser.add_argument(
+            "--sample_sheet",
+            type=str,
+            metavar="file",
+            dest="sample_sheet",
+            default=None,
+            help="Sample sheet (yaml, or json with the .json extension) of the run. The species of each sample in it is used instead of --species, so one run can contain samples of several species",
+        )
+
+        self.parser.add_argument(
+            "-up",
+            "--user_parameters",
+            type=str,
+            metavar="file",
+            dest="user_parameters",
+            default=self.user_parameters_path,
+            help=f"Yaml file with the parameters of the run, only read when the output directory or species are not given. Default is {self.user_parameters_path}",
+        )
+
+        self.parser.add_argument(
+            "-c",
+            "--cache_dir",
+            type=str,
+            metavar="dir",
+            dest="cache_dir",
+            default=None,
+            help="Directory to store the parsed results of each sample, samples whose result files did not change are not parsed again. Default is a .cache directory inside the summary directory",
+        )
+
+        self.parser.add_argument(
+            "--no_cache",
+            action="store_true",
+            dest="no_cache",
+            help="Parse the results of every sample without using or writing the cache",
+        )
+
+        self.parser.add_argument(
+            "-t",
+            "--threads",
+            type=int,
+            metavar="int",
+            dest="threads",
+            default=1,
+            help="Number of threads used to parse the results of the samples, default is 1",
+        )
+
+        self.parser.add_argument(
+            "--resfinder_json",
+            action="store_true",
+            dest="resfinder_json",
+            help="Read the ResFinder and PointFinder results from the standardised json output of ResFinder instead of the text tables",
+        )
+
+        self.parser.add_argument(
+            "--streaming",
+            action="store_true",
+            dest="streaming",
+            help="Write the summaries while the samples are parsed, memory use stays the same for any number of samples",
+        )
+
+        self.parser.add_argument(
+            "--parquet",
+            action="store_true",
+            dest="parquet",
+            help="Also write each summary as a Parquet file next to the csv file, text columns are dictionary encoded and identity and coverage are numbers",
+        )
+
+        self.parser.add_argument(
+            "--profile",
+            type=str,
+            metavar="file",
+            dest="profile",
+            default=None,
+            help="Write the time of each phase of the summary step (config load, parse, transform, write) with the number of files and rows to this json file",
+        )
+
+        self.parser.add_argument(
+            "--cprofile",
+            type=str,
+            metavar="file",
+            dest="cprofile",
+            default=None,
+            help="Profile the summary step with cProfile and write the statistics to this file, they can be read with pstats or snakeviz",
+        )
+
         # parse arguments
-        self.dict_arguments = vars(self.parser.parse_args())
+        self.dict_arguments = vars(self.parser.parse_args(argv))
+        if not self.dict_arguments["input"] and not self.dict_arguments["input_manifest"]:
+            self.parser.error("one of the arguments -i/--input or -m/--input_manifest is required")
 
     def preproccesing_for_summary_files(self):
-        # Get the output directory from the yaml file
-        open_config_parameters = open(self.user_parameters_path)
-        parsed_config = yaml.load(open_config_parameters, Loader=yaml.FullLoader)
-        self.output_dir_name = parsed_config["out"]
-        self.species = parsed_config["species"]
+        self.output_dir_name = self.dict_arguments.get("output_dir")
+        self.species = self.dict_arguments.get("species")
+        # Get the output directory and species that were not given from the yaml file
+        if self.output_dir_name is None or self.species is None:
+            user_parameters_path = (
+                self.dict_arguments.get("user_parameters") or self.user_parameters_path
+            )
+            with self.profile.phase("config", file=str(user_parameters_path)) as counts:
+                counts["files"] = 1
+                with open(user_parameters_path) as open_config_parameters:
+                    parsed_config = yaml.load(open_config_parameters, Loader=yaml.FullLoader)
+            if self.output_dir_name is None:
+                self.output_dir_name = parsed_config["out"]
+            if self.species is None:
+                self.species = parsed_config["species"]
 
         # Make new summary directory
         dirpath = Path(f"{self.output_dir_name}/{self.summary_folder_path}")
         if not os.path.exists(dirpath):
             os.makedirs(dirpath)
 
-        # get samples from the sample directory
-        self.input_paths = self.dict_arguments.get("input")
-        self.samplenames = []
-        for path in self.input_paths:
-            path.strip("'")
-            elements = path.split("/")
-            samplename = elements[-1]
-            self.samplenames.append(samplename)
+        # get samples from the sample directory of each tool
+        summary_type = self.dict_arguments.get("summary_type")
+        if self.dict_arguments.get("input_manifest"):
+            manifest = read_manifest(self.dict_arguments.get("input_manifest"))
+            if summary_type == "all":
+                tools = ["resfinder", "virulencefinder", "amrfinderplus"]
+            elif summary_type in ["virulencefinder", "amrfinderplus"]:
+                tools = [summary_type]
+            else:
+                tools = ["resfinder"]
+            self.input_paths = {tool: manifest.get(tool, []) for tool in tools}
+        elif summary_type == "all":
+            self.input_paths = {
+                "resfinder": self.dict_arguments.get("input"),
+                "virulencefinder": self.dict_arguments.get("input_virulencefinder"),
+                "amrfinderplus": self.dict_arguments.get("input_amrfinderplus"),
+            }
+        elif summary_type in ["virulencefinder", "amrfinderplus"]:
+            self.input_paths = {summary_type: self.dict_arguments.get("input")}
+        else:
+            self.input_paths = {"resfinder": self.dict_arguments.get("input")}
+
+        self.samplenames = {}
+        for tool, paths in self.input_paths.items():
+            # The samplename is the last directory of the path, also when the path ends with a slash
+            self.samplenames[tool] = [Path(path.strip("'")).name for path in paths or []]
+
+        # Species of each sample, samples that are not in it have the species of the run
+        self.sample_species = dict(self.dict_arguments.get("sample_species") or {})
+        if self.dict_arguments.get("sample_sheet"):
+            sample_sheet = load_sample_sheet(self.dict_arguments.get("sample_sheet"))
+            for samplename, properties in sample_sheet.items():
+                if properties.get("species"):
+                    self.sample_species.setdefault(samplename, properties["species"])
 
         # Collect summary file names from the parser
         self.resfinder_summary_file_names = self.dict_arguments.get(
@@ -159,276 +689,373 @@ class JunoSummary:
         self.amrfinderplus_summary_file_names = self.dict_arguments.get(
             "amrfinderplus_summary_file_names"
         )
+
+        self.threads = self.dict_arguments.get("threads") or 1
+        self.resfinder_json = self.dict_arguments.get("resfinder_json")
+
+        # Parsed results per sample are cached, so adding a sample to a run does not parse all samples again
+        if self.dict_arguments.get("no_cache"):
+            self.cache_dir = None
+        elif self.dict_arguments.get("cache_dir"):
+            self.cache_dir = Path(self.dict_arguments.get("cache_dir"))
+        else:
+            self.cache_dir = dirpath.joinpath(self.cache_folder)
         return self.output_dir_name, self.samplenames, dirpath
 
+    def get_parsed_results(self, result_file):
+        """Returns (samplename, parsed records) for each sample, the file is only parsed the first time it is requested"""
+        if result_file not in self.parsed_results:
+            tool = self.result_parsers[result_file][0]
+            # With --resfinder_json all ResFinder tables come from one json file, so they are parsed together
+            result_files = [result_file]
+            if tool == "resfinder" and self.resfinder_json:
+                result_files = [name for name, (parser_tool, _) in self.result_parsers.items() if parser_tool == tool]
+            samples = list(zip(self.samplenames[tool], self.input_paths[tool]))
+            with self.profile.phase("parse", result_file=result_file) as counts:
+                parsed = self.parse_samples(samples, result_files)
+                for name in result_files:
+                    self.parsed_results[name] = []
+                for (samplename, path), timed_records in zip(samples, parsed):
+                    for name, (seconds, records) in timed_records.items():
+                        self.profile.add_parse_time(name, samplename, seconds)
+                        self.parsed_results[name].append((samplename, records))
+                        counts["files"] = counts.get("files", 0) + 1
+                        counts["rows"] = counts.get("rows", 0) + len(records.rows)
+        return self.parsed_results[result_file]
+
+    def species_of(self, samplename):
+        return (
+            self.sample_species.get(samplename, self.species)
+            .strip()
+            .lower()
+            .replace(" ", "_")
+        )
+
+    def has_result_file(self, samplename, result_file):
+        """PointFinder is not run for samples of species that are not in its database"""
+        return result_file != "PointFinder_results.txt" or self.species_of(samplename) != "other"
+
+    def iles_sample_panels(self):
+        """The iles panel (species) of each sample that has one, in the order of the samples"""
+        sample_panels = {}
+        for samplename in self.samplenames["resfinder"]:
+            species = self.species_of(samplename)
+            if species in self.iles_panels:
+                # E. coli and Salmonella share a panel, they are summarised together
+                sample_panels[samplename] = (
+                    "escherichia_coli" if species == "salmonella" else species
+                )
+        return sample_panels
+
+    def parse_samples(self, samples, result_files):
+        """Parse the result files of every (samplename, sample_dir) with the requested number of worker processes, the
+        results keep the order of the samples. Processes are used because parsing is mostly python code, which threads
+        can not run in parallel."""
+        if self.threads <= 1:
+            for samplename, sample_dir in samples:
+                yield self.parse_result_files(samplename, sample_dir, result_files)
+            return
+
+        # The workers are started by a fork server, not forked from this process, which can be the snakemake process
+        # with its threads. Each worker gets a copy of what parsing needs once, when it starts.
+        with ProcessPoolExecutor(
+            max_workers=self.threads,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=init_worker,
+            initargs=(self.parse_state(),),
+        ) as executor:
+            # Samples are submitted in chunks, so finished results do not pile up when the caller is slower than the parsing
+            chunk_size = self.threads * 64
+            for start in range(0, len(samples), chunk_size):
+                yield from executor.map(
+                    partial(parse_worker_sample, result_files), samples[start : start + chunk_size], chunksize=16
+                )
+
+    def parse_state(self):
+        """A JunoSummary with only the settings that parsing a sample needs, which is sent to the worker processes"""
+        state = JunoSummary()
+        for name in ["species", "sample_species", "resfinder_json", "cache_dir"]:
+            setattr(state, name, getattr(self, name))
+        return state
+
+    def parse_result_files(self, samplename, sample_dir, result_files):
+        """Parse the result files of a sample, returns the time and records of each file that the sample has"""
+        json_tables = {}
+        return {
+            result_file: timed(self.parse_result_file, samplename, sample_dir, result_file, json_tables)
+            for result_file in result_files
+            if self.has_result_file(samplename, result_file)
+        }
+
+    def parse_result_file(self, samplename, sample_dir, result_file, json_tables=None):
+        """Parse one result file of a sample. With --resfinder_json the ResFinder and PointFinder tables
+        are read from the standardised json output of ResFinder instead of the text files, the json is
+        parsed once into json_tables for all tables of the sample."""
+        tool, parse_function = self.result_parsers[result_file]
+        if tool == "resfinder" and self.resfinder_json:
+            pathname = find_resfinder_json(sample_dir)
+            json_tables = {} if json_tables is None else json_tables
+
+            def parse_function(pathname):
+                if pathname not in json_tables:
+                    json_tables[pathname] = read_resfinder_json(pathname)
+                return json_tables[pathname][result_file]
+
+        else:
+            pathname = f"{sample_dir}/{result_file}"
+        return self.parse_with_cache(
+            pathname, tool, samplename, result_file, parse_function
+        )
+
+    def parse_with_cache(self, pathname, tool, samplename, result_file, parse_function):
+        """Return the cached records of a result file if the file did not change, otherwise parse and cache it"""
+        if self.cache_dir is None:
+            return parse_function(pathname)
+
+        # A cached file is only valid for the same file path, size and modification time
+        file_stats = os.stat(pathname)
+        cache_key = {
+            "cache_version": self.cache_version,
+            "path": os.path.abspath(pathname),
+            "size": file_stats.st_size,
+            "mtime_ns": file_stats.st_mtime_ns,
+        }
+        cache_file = self.cache_dir.joinpath(tool, samplename, f"{result_file}.json")
+        if cache_file.is_file():
+            try:
+                with open(cache_file, "r") as opened_file:
+                    cached = json.load(opened_file)
+                if cached["key"] == cache_key:
+                    return ResultTable.from_json(cached["records"])
+            except (ValueError, KeyError):
+                # A broken cache file is parsed again and overwritten
+                pass
+
+        records = parse_function(pathname)
+        # Write to a temporary file first, so an interrupted run never leaves a half written cache file
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_cache_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        with open(temp_cache_file, "w") as opened_file:
+            json.dump({"key": cache_key, "records": records.to_json()}, opened_file)
+        os.replace(temp_cache_file, cache_file)
+        return records
+
     def create_amr_genes_summary(self):
         genes_summary_location = self.resfinder_summary_file_names[0]
+        parsed_results = self.get_parsed_results("ResFinder_results_tab.txt")
 
         # write genedata to outputfile
-        with open(genes_summary_location, "w", newline="") as csvfile:
+        with self.profile.phase(
+            "write", summary="resfinder", file=genes_summary_location
+        ) as counts, open(genes_summary_location, "w", newline="") as csvfile:
             summary_file = csv.writer(csvfile)
 
             # Set the header for the file
             # Just taking the first sample to get the header for the csv file
-            pathname = f"{self.input_paths[0]}/ResFinder_results_tab.txt"
-            opened_file = open(pathname, "r")
-
-            # get the column names
-            header = opened_file.readline().split("\t")
-            del header[4:]
-            header.insert(0, "Sample")
+            header = ["Sample"] + parsed_results[0][1].columns
             summary_file.writerow(header)
 
-            # for each sample get the data
-            # Set a counter to add the correct sample name for each sample
-            sample_counter = 0
-            for path in self.input_paths:
-                pathname = f"{path}/ResFinder_results_tab.txt"
-                opened_file = open(pathname, "r")
-                data_lines = opened_file.readlines()[1:]
-
-                # Write elements of interest to the generated summary file
-                for line in data_lines:
-                    elements_in_line = line.split("\t")
-                    del elements_in_line[4:]
-                    elements_in_line.insert(0, self.samplenames[sample_counter])
-                    summary_file.writerow(elements_in_line)
-                sample_counter = sample_counter + 1
+            # for each sample write elements of interest to the generated summary file
+            for samplename, genes in parsed_results:
+                for gene in genes.rows:
+                    summary_file.writerow([samplename] + gene.values())
+                counts["rows"] = counts.get("rows", 0) + len(genes.rows)
+            counts["files"] = 1
 
     def add_header_to_phenotype_summary(self):
         self.pheno_summary_location = self.resfinder_summary_file_names[1]
+        # Just taking the first sample to get the header for the csv file
+        header_selection = self.get_parsed_results("pheno_table.txt")[0][1].comments
         with open(f"{self.pheno_summary_location}", "w", newline="") as csvfile:
             summary_file = csv.writer(csvfile)
 
             # Set the informational header for the file
-            # Just taking the first sample to get the header for the csv file
-            pathname = f"{self.input_paths[0]}/pheno_table.txt"
-            opened_file = open(pathname, "r")
-            header = opened_file.readlines()
-            header_selection = header[7:16]
             for string in header_selection:
                 summary_file.writerow([string])
 
     def create_amr_phenotype_summary(self):
-        # set boolean for colnames true here
-        add_colnames = True
-        # Create empty list to store the dataframes for each sample
-        self.df_list = []
-
-        sample_counter = 0
-        for path in self.input_paths:
-            # empty list for antimicrobial classes
-            antimicrobials = []
-            # add sample name column
-            antimicrobials.insert(0, "Samplename")
-
-            # Make an empty list for the file content
-            file_content = []
-            # Make empty list for each sample and add the samplename to the sample column
-            antimicrobial_match = []
-
-            antimicrobial_match.insert(0, self.samplenames[sample_counter])
-            # Open the resfinder results
-            pathname = f"{path}/pheno_table.txt"
-            opened_file = open(pathname, "r")
-            # Make subselection of the file starting line 17 where the antimicrobial classes are listed
-            # TODO make it based on the header
-            sub_selection = opened_file.readlines()[17:]
-            sample_counter = sample_counter + 1
-
-            for line in sub_selection:
-                # Search for the end of the antimicrobial classes that are listed in the file
-                if line.startswith("\n"):
-                    break
-                # Append all lines containing information to the file content list
-                file_content.append(line)
-
-            # Collect the antimicrobial names and their matches
-            for line in file_content:
-                elements = line.split("\t")
-                antimicrobial_match.append(elements[3])
-                antimicrobials.append(elements[0])
-
-            # Create temp dataframe and store data
-            temp_df = pd.DataFrame([antimicrobial_match], columns=antimicrobials)
-            # Append df to a list with all the dfs
-            self.df_list.append(temp_df)
-
-        # Merge all dataframes in one
-        final_df = pd.concat(self.df_list, axis=0, ignore_index=True)
+        import pandas as pd
+
+        parsed_results = self.get_parsed_results("pheno_table.txt")
+        with self.profile.phase("transform", summary="resfinder"):
+            # Create empty list to store the dataframes for each sample
+            self.df_list = []
+
+            for samplename, pheno_table in parsed_results:
+                # Collect the antimicrobial names and their matches, starting with the sample name column
+                antimicrobials = ["Samplename"]
+                antimicrobial_match = [samplename]
+                for row in pheno_table.rows:
+                    antimicrobial_match.append(row.match)
+                    antimicrobials.append(row.antimicrobial)
+
+                # Create temp dataframe and store data
+                temp_df = pd.DataFrame([antimicrobial_match], columns=antimicrobials)
+                # Append df to a list with all the dfs
+                self.df_list.append(temp_df)
+
+            # Merge all dataframes in one
+            final_df = pd.concat(self.df_list, axis=0, ignore_index=True)
         # Write the dataframe to existing file with header
-        final_df.to_csv(f"{self.pheno_summary_location}", mode="a", index=False)
+        self.write_summary(final_df, "resfinder", self.pheno_summary_location, mode="a")
 
     def pointfinder_result_summary(self):
+        import pandas as pd
 
-        # Get path & open 1 file for the colnames
-        pathname = f"{self.input_paths[0]}/PointFinder_results.txt"
-        opened_file = open(pathname, "r")
-        # Get columns from one of the files
-        lines = opened_file.readlines()
-        column_names = lines[0].split("\t")
-        column_names.insert(0, "Samplename")
+        parsed_results = self.get_parsed_results("PointFinder_results.txt")
 
-        # Make an empty list to add list with data for each sample
-        data_per_sample = []
+        # Get columns from one of the files
+        if parsed_results:
+            column_names = ["Samplename"] + parsed_results[0][1].columns
+        else:
+            column_names = ["Samplename"] + list(PointMutation.columns)
 
         # Collect data for each sample and add this to a list with the samplename
-        sample_counter = 0
-        for path in self.input_paths:
-            pathname = f"{path}/PointFinder_results.txt"
-            opened_file = open(pathname, "r")
-            lines = opened_file.readlines()
-            subselection = lines[1:]
-
-            # If pointfinder has no results, write an empty list to the summary
-            for line in subselection:
-                sample = []
-
-                if len(line) < 1:
-                    # append hier lege values voor alle columns
-                    sample.extend(
-                        (self.samplenames[sample_counter], None, None, None, None, None)
-                    )
-                # if there is result, place it in a list and convert this to a pd dataframe
-                else:
-                    sample.append(self.samplenames[sample_counter])
-                    elements = line.split("\t")
-                    for element in elements:
-                        sample.append(element)
-
-                data_per_sample.append(sample)
-            sample_counter = sample_counter + 1
-
-        data_frame = pd.DataFrame(data_per_sample, columns=column_names)
-        data_frame.to_csv(self.pointfinder_summary_file_name[0], mode="a", index=False)
+        with self.profile.phase("transform", summary="pointfinder"):
+            data_per_sample = []
+            for samplename, pointfinder_results in parsed_results:
+                for mutation in pointfinder_results.rows:
+                    data_per_sample.append([samplename] + mutation.values())
+
+            data_frame = pd.DataFrame(data_per_sample, columns=column_names)
+        self.write_summary(
+            data_frame, "pointfinder", self.pointfinder_summary_file_name[0], mode="a"
+        )
 
     def iles_summary(self):
-        """Summary file specific for iles/lims"""
-
-        self.species = self.species.replace(" ", "_")
-        sample_counter_pheno_table = 0
-        sample_counter_pointfinder = 0
-        df_list = []
-        df_list_point = []
-
-        # loop over for pheno table
-        for filename in self.input_paths:
-            dirpath = f"{filename}/pheno_table.txt"
-            opened_file = open(dirpath, "r")
-            # select lines starting with 'antimicrobial'
-            data_lines = opened_file.readlines()[17:]
-
-            df = pd.DataFrame([x.split("\t") for x in data_lines], dtype="object")
-            df.columns = [
-                "Antimicrobial",
-                "Class",
-                "WGS-predicted phenotype",
-                "Match",
-                "Genetic background",
-            ]
-
-            # select antimicrobial rows per species
-            # TODO dit kan samen met wat helemaal onderaan staat
-            if self.species == "escherichia_coli" or self.species == "salmonella":
-                filtered_df = df.loc[df['Antimicrobial'].isin(self.antibiotics_ecoli_salm)]
-            elif self.species == "campylobacter":
-                filtered_df = df.loc[df['Antimicrobial'].isin(self.antibiotics_camp)]
+        """Summary file specific for iles/lims. With samples of several species a table is made for the
+        samples of each antibiotics panel, the tables are combined in the order of the samples."""
+        import pandas as pd
 
+        sample_panels = self.iles_sample_panels()
+        if not sample_panels:
+            print("No iles summary for this species")
+            return
+
+        pointfinder_results = self.get_parsed_results("PointFinder_results.txt")
+        pheno_results = self.get_parsed_results("pheno_table.txt")
+        with self.profile.phase("transform", summary="iles"):
+            tables = []
+            for panel in dict.fromkeys(sample_panels.values()):
+                antibiotics, add_cotrimoxazole = self.iles_panels[panel]
+                samplenames = [
+                    samplename
+                    for samplename, sample_panel in sample_panels.items()
+                    if sample_panel == panel
+                ]
+                selected = set(samplenames)
+                tables.append(
+                    self.iles_table(
+                        [result for result in pointfinder_results if result[0] in selected],
+                        [result for result in pheno_results if result[0] in selected],
+                        antibiotics,
+                        add_cotrimoxazole,
+                        samplenames,
+                    )
+                )
+            if len(tables) == 1:
+                final_combined = tables[0]
             else:
-                print("No iles summary for this species")
-                return
-
-            selected_rows = filtered_df[
-                ["Antimicrobial", "WGS-predicted phenotype", "Genetic background"]
-            ].copy()
-            selected_rows.loc[
-                selected_rows["WGS-predicted phenotype"] == "Resistant",
-                "WGS-predicted phenotype",
-            ] = selected_rows["Genetic background"]
-            final = selected_rows[["Antimicrobial", "WGS-predicted phenotype"]].copy()
-
-            # flip the df
-            final.set_index("Antimicrobial", inplace=True)
-            transposed = final.transpose()
-            transposed.insert(
-                0, "samplename", self.samplenames[sample_counter_pheno_table]
-            )
-            sample_counter_pheno_table = sample_counter_pheno_table + 1
-            df_list.append(transposed)
-
-        # loop over for pointfinder file
-        for filename in self.input_paths:
-            dirpath = f"{filename}/PointFinder_results.txt"
-            opened_file = open(dirpath, "r")
-            pointfinder_data = opened_file.readlines()[1:]
-            mut_res_combos = []
-            # get the mutation and resistance
-            for line in pointfinder_data:
-                line = line.split("\t")
-                mutation = line[0]
-                resistance = line[3].split(",")
-                unique_resistance = []
-                for x in resistance:
-                    x = x.strip(" ")
-                    if x not in unique_resistance:
-                        unique_resistance.append(x)
-
-                # link the mutation to the resistance
-                for x in unique_resistance:
-                    dictlist = [mutation, x]
-                    mut_res_combos.append(dictlist)
-
-            # create df
-            df = pd.DataFrame(mut_res_combos, columns=["0", "1"])
-            df = df.set_index("1")
-            transposed = df.transpose()
-            transposed.columns = transposed.columns.str.lower()
-
-            # TODO get nalicilix acid out of the cols
-
-            #select only the used antimicrobials
-            if self.species == "escherichia_coli" or self.species == "salmonella":   
-                filtered_transposed = transposed.filter(regex='|'.join(self.antibiotics_ecoli_salm))
-            elif self.species == "campylobacter":
-                filtered_transposed = transposed.filter(regex='|'.join(self.antibiotics_camp))
-            else:
-                print("No iles summary for this species")
-                return
+                final_combined = pd.concat(tables).reindex(list(sample_panels))
+        self.write_summary(final_combined, "iles", self.iles_summary_file_names[0])
+
+    def iles_table(
+        self,
+        parsed_pointfinder_results,
+        parsed_pheno_results,
+        antibiotics,
+        add_cotrimoxazole,
+        samplenames,
+    ):
+        """All samples are collected in one long table (samplename, antimicrobial, source, value)
+        that is filtered on the species panel and pivoted once"""
+        import pandas as pd
+
+        # Link each mutation to the (unique) antimicrobials it gives resistance to
+        pointfinder_rows = []
+        for samplename, pointfinder_results in parsed_pointfinder_results:
+            for row in pointfinder_results.rows:
+                resistance = [x.strip(" ") for x in row.resistance.split(",")]
+                for x in dict.fromkeys(resistance):
+                    pointfinder_rows.append((samplename, x.lower(), row.mutation))
+        pointfinder = pd.DataFrame(
+            pointfinder_rows, columns=["samplename", "antimicrobial", "value"]
+        )
 
-            complete_df = (
-                filtered_transposed.astype(str)
-                .groupby(filtered_transposed.columns, axis=1)
-                .agg(lambda x: x.apply(",".join, 1))
-            )
-            complete_df.insert(
-                0, "samplename", self.samplenames[sample_counter_pointfinder]
+        # For resistant antimicrobials the genetic background is given instead of the phenotype
+        pheno_rows = [
+            (samplename, row.antimicrobial, row.phenotype, row.genetic_background)
+            for samplename, pheno_table in parsed_pheno_results
+            for row in pheno_table.rows
+        ]
+        pheno = pd.DataFrame(
+            pheno_rows,
+            columns=["samplename", "antimicrobial", "phenotype", "background"],
+        )
+
+        # Select the antimicrobials of the species panel. Pointfinder antimicrobials are matched on
+        # part of the name, this is only checked for the few unique names and then used as a set
+        antibiotics_regex = re.compile("|".join(antibiotics))
+        pointfinder_panel = {
+            name
+            for name in pointfinder["antimicrobial"].unique()
+            if antibiotics_regex.search(name)
+        }
+        pointfinder = pointfinder[pointfinder["antimicrobial"].isin(pointfinder_panel)]
+        pheno = pheno[pheno["antimicrobial"].isin(set(antibiotics))]
+        pheno = pheno.assign(
+            value=pheno["phenotype"].where(
+                pheno["phenotype"] != "Resistant", pheno["background"]
             )
-            df_list_point.append(complete_df)
-            sample_counter_pointfinder = sample_counter_pointfinder + 1
-
-        final_df_point = pd.concat(df_list_point)
-        final_df = pd.concat(df_list, axis=0, ignore_index=True)
-        final_df.columns = final_df.columns.str.lower()
-        inner_merged_total = pd.merge(
-            final_df_point, final_df, on=["samplename"], how="inner"
-        )
-        inner_merged_total = inner_merged_total.replace(",", " ", regex=True)
-        inner_merged_total = inner_merged_total.replace("\n", "", regex=True)
-
-        # remove suffix to combine columns
-        inner_merged_total.columns = inner_merged_total.columns.str.rstrip("_x")
-        inner_merged_total.columns = inner_merged_total.columns.str.rstrip("_y")
-        final_combined = inner_merged_total.groupby(level=0, axis=1).first()
-
-        if self.species == "escherichia_coli" or self.species == "salmonella":    
-            final_combined.filter(regex='|'.join(self.antibiotics_ecoli_salm))
-        elif self.species == "campylobacter":
-            final_combined.filter(regex='|'.join(self.antibiotics_camp))
-        else:
-            print("No iles summary for this species")
-            return
+        )[["samplename", "antimicrobial", "value"]]
+
+        # All mutations of a sample for the same antimicrobial are combined in one value
+        if not pointfinder.empty:
+            pointfinder = pointfinder.groupby(
+                ["samplename", "antimicrobial"], sort=False, as_index=False
+            )["value"].agg(",".join)
+
+        # Antimicrobials found by both tools are combined in one column, the pointfinder value goes first
+        pheno_panel = set(pheno["antimicrobial"])
+        long_table = pd.concat(
+            [
+                pointfinder.assign(
+                    source=0,
+                    column=pointfinder["antimicrobial"].map(
+                        {
+                            name: combined_column_name(name, "_x" if name in pheno_panel else "")
+                            for name in pointfinder_panel
+                        }
+                    ),
+                ),
+                pheno.assign(
+                    source=1,
+                    column=pheno["antimicrobial"].map(
+                        {
+                            name: combined_column_name(name, "_y" if name in pointfinder_panel else "")
+                            for name in pheno_panel
+                        }
+                    ),
+                ),
+            ],
+            ignore_index=True,
+        )
+        long_table = long_table.dropna(subset=["value"])
+        long_table = long_table.sort_values("source", kind="stable").drop_duplicates(
+            ["samplename", "column"], keep="first"
+        )
+        long_table["value"] = (
+            long_table["value"].str.replace(",", " ").str.replace("\n", "")
+        )
+
+        # One row for each sample (in the order of the input), one column for each antimicrobial
+        samplenames = list(dict.fromkeys(samplenames))
+        final_combined = long_table.pivot(
+            index="samplename", columns="column", values="value"
+        ).reindex(samplenames)
+        final_combined.columns.name = None
 
-        if self.species == "escherichia_coli" or self.species == "salmonella":
+        if add_cotrimoxazole:
             # if trimepthoprim or sulfamethoxazole == no resistance then cotrimoxazole == no resistance, because there is no resistance against one of the two means that there is no resistance
             if (
                 "No resistance" in final_combined["trimethoprim"].values
@@ -440,88 +1067,236 @@ class JunoSummary:
                     ["trimethoprim", "sulfamethoxazole"]
                 ].agg(" ".join, axis=1)
 
-        col_name = "samplename"
-        first_col = final_combined.pop(col_name)
-        final_combined.insert(0, col_name, first_col)
-        final_combined.to_csv(self.iles_summary_file_names[0], index=False)
+        final_combined.insert(
+            0,
+            "samplename",
+            [samplename.replace(",", " ").replace("\n", "") for samplename in samplenames],
+        )
+        return final_combined
 
     def virulencefinder_summary(self):
+        import pandas as pd
+
         virulence_summary_location = self.virulencefinder_summary_file_names[0]
-        sample_counter = 0
-        dflist = []
-        for path in self.input_paths:
-            pathname = f"{path}/results_tab.tsv"
-            opened_file = pd.read_csv(
-                pathname, sep="\t", dtype=object, keep_default_na=False
-            )
-            filtered_df = opened_file.filter(
-                [
-                    "Virulence factor",
-                    "Identity",
-                    "Query / Template length",
-                    "Protein function",
-                ],
-                axis=1,
-            )
-            filtered_df.insert(0, "Samplename", self.samplenames[sample_counter])
-            sample_counter = sample_counter + 1
-            dflist.append(filtered_df)
+        parsed_results = self.get_parsed_results("results_tab.tsv")
+        with self.profile.phase("transform", summary="virulencefinder"):
+            dflist = []
+            for samplename, results in parsed_results:
+                filtered_df = pd.DataFrame(results.rows, columns=results.columns)
+                filtered_df.insert(0, "Samplename", samplename)
+                dflist.append(filtered_df)
 
-        final_df = pd.concat(dflist, axis=0, ignore_index=True)
-        final_df.to_csv(virulence_summary_location, mode="a", index=False)
+            final_df = pd.concat(dflist, axis=0, ignore_index=True)
+        self.write_summary(final_df, "virulencefinder", virulence_summary_location, mode="a")
 
     def amrfinderplus_summary(self):
+        import pandas as pd
+
         amrfinderplus_summary_location = self.amrfinderplus_summary_file_names[0]
-        sample_counter = 0
-        dflist = []
-        for path in self.input_paths:
-            pathname = f"{path}/amrfinder_result.txt"
-            opened_file = pd.read_csv(
-                pathname, sep="\t", dtype=object, keep_default_na=False
-            )
-            filtered_df = opened_file.filter(
-                [
-                    "Gene symbol",
-                    "Sequence name",
-                    "Element type",
-                    "Element subtype",
-                    "Class",
-                    "Subclass",
-                    "% Coverage of reference sequence",
-                    "% Identity to reference sequence",
-                ],
-                axis=1,
+        parsed_results = self.get_parsed_results("amrfinder_result.txt")
+        with self.profile.phase("transform", summary="amrfinderplus"):
+            dflist = []
+            for samplename, results in parsed_results:
+                filtered_df = pd.DataFrame(results.rows, columns=results.columns)
+                filtered_df.insert(0, "Samplename", samplename)
+                dflist.append(filtered_df)
+
+            final_df = pd.concat(dflist, axis=0, ignore_index=True)
+        self.write_summary(final_df, "amrfinderplus", amrfinderplus_summary_location, mode="a")
+
+    def write_summary(self, data_frame, summary, location, mode="w"):
+        with self.profile.phase("write", summary=summary, file=location) as counts:
+            data_frame.to_csv(location, mode=mode, index=False)
+            counts["files"] = 1
+            counts["rows"] = len(data_frame)
+
+    def requested_summaries(self):
+        """The summaries to create, for summary type all every summary that has a file name"""
+        summary_type = self.dict_arguments.get("summary_type")
+        if summary_type != "all":
+            return [summary_type]
+        summary_file_names = {
+            "resfinder": self.resfinder_summary_file_names,
+            "pointfinder": self.pointfinder_summary_file_name,
+            "iles": self.iles_summary_file_names,
+            "virulencefinder": self.virulencefinder_summary_file_names,
+            "amrfinderplus": self.amrfinderplus_summary_file_names,
+        }
+        return [summary for summary, file_names in summary_file_names.items() if file_names]
+
+    def streaming_summaries(self):
+        """Write the summaries while the samples are parsed, so memory use does not grow with the number of samples.
+        Each result file of a sample is parsed once and given to every summary that uses it."""
+        writers = []
+        for summary in self.requested_summaries():
+            if summary == "resfinder":
+                writers.append(
+                    StreamingResfinderSummary(
+                        self.resfinder_summary_file_names[0],
+                        self.resfinder_summary_file_names[1],
+                    )
+                )
+            elif summary == "pointfinder":
+                writers.append(
+                    StreamingPointfinderSummary(self.pointfinder_summary_file_name[0])
+                )
+            elif summary == "iles":
+                sample_panels = self.iles_sample_panels()
+                if sample_panels:
+                    writers.append(
+                        StreamingIlesSummaries(
+                            self.iles_summary_file_names[0],
+                            sample_panels,
+                            self.iles_panels,
+                        )
+                    )
+                else:
+                    print("No iles summary for this species")
+            elif summary == "virulencefinder":
+                writers.append(
+                    StreamingToolSummary(
+                        self.virulencefinder_summary_file_names[0],
+                        "virulencefinder",
+                        "results_tab.tsv",
+                    )
+                )
+            elif summary == "amrfinderplus":
+                writers.append(
+                    StreamingToolSummary(
+                        self.amrfinderplus_summary_file_names[0],
+                        "amrfinderplus",
+                        "amrfinder_result.txt",
+                    )
+                )
+
+        for tool, paths in self.input_paths.items():
+            tool_writers = [writer for writer in writers if writer.tool == tool]
+            result_files = []
+            for writer in tool_writers:
+                result_files.extend(
+                    f for f in writer.result_files if f not in result_files
+                )
+            samples = list(zip(self.samplenames[tool], paths or []))
+            parsed = self.parse_samples(samples, result_files)
+            for (samplename, path), timed_records in zip(samples, parsed):
+                records = {}
+                for result_file, (seconds, result) in timed_records.items():
+                    # Parsing and writing are interleaved, so the parse phase is the sum of the parse time of each sample
+                    self.profile.add_parse_time(result_file, samplename, seconds)
+                    self.profile.add(
+                        "parse",
+                        seconds,
+                        {"result_file": result_file},
+                        files=1,
+                        rows=len(result.rows),
+                    )
+                    records[result_file] = result
+                for writer in tool_writers:
+                    with self.profile.phase("transform", summary=writer.summary):
+                        writer.add_sample(samplename, records)
+
+        for writer in writers:
+            with self.profile.phase("write", summary=writer.summary):
+                writer.close()
+
+    def all_summaries(self):
+        """Create every summary that has a file name, each result file is parsed only once"""
+        if self.resfinder_summary_file_names:
+            self.create_amr_genes_summary()
+            self.add_header_to_phenotype_summary()
+            self.create_amr_phenotype_summary()
+
+        if self.pointfinder_summary_file_name:
+            self.pointfinder_result_summary()
+
+        if self.iles_summary_file_names:
+            self.iles_summary()
+
+        if self.virulencefinder_summary_file_names:
+            self.virulencefinder_summary()
+
+        if self.amrfinderplus_summary_file_names:
+            self.amrfinderplus_summary()
+
+    def parquet_summaries(self):
+        """Write a Parquet copy of each summary csv file that was created"""
+        summary_locations = {
+            "genes": (self.resfinder_summary_file_names or [None])[0],
+            "phenotype": (self.resfinder_summary_file_names or [None, None])[1],
+            "pointfinder": (self.pointfinder_summary_file_name or [None])[0],
+            "iles": (self.iles_summary_file_names or [None])[0],
+            "virulencefinder": (self.virulencefinder_summary_file_names or [None])[0],
+            "amrfinderplus": (self.amrfinderplus_summary_file_names or [None])[0],
+        }
+        for summary, location in summary_locations.items():
+            if location and os.path.isfile(location):
+                with self.profile.phase("write", summary=summary, file=parquet_location(location)):
+                    write_summary_parquet(location, summary)
+
+    def run(self):
+        """Create the summaries of the requested summary type"""
+        summary_type = self.dict_arguments.get("summary_type")
+        cprofile_location = self.dict_arguments.get("cprofile")
+        if cprofile_location:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        if self.dict_arguments.get("streaming"):
+            self.streaming_summaries()
+
+        elif summary_type == "resfinder":
+            self.create_amr_genes_summary()
+            self.add_header_to_phenotype_summary()
+            self.create_amr_phenotype_summary()
+
+        elif summary_type == "pointfinder":
+            self.pointfinder_result_summary()
+
+        elif summary_type == "amrfinderplus":
+            self.amrfinderplus_summary()
+
+        elif summary_type == "virulencefinder":
+            self.virulencefinder_summary()
+
+        elif summary_type == "iles":
+            self.iles_summary()
+
+        elif summary_type == "all":
+            self.all_summaries()
+
+        if self.dict_arguments.get("parquet"):
+            self.parquet_summaries()
+
+        if cprofile_location:
+            profiler.disable()
+            Path(cprofile_location).parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(cprofile_location)
+        if self.dict_arguments.get("profile"):
+            self.profile.write(
+                self.dict_arguments.get("profile"),
+                summary_type=summary_type,
+                streaming=bool(self.dict_arguments.get("streaming")),
+                threads=self.threads,
+                samples={tool: len(names) for tool, names in self.samplenames.items()},
             )
-            filtered_df.insert(0, "Samplename", self.samplenames[sample_counter])
-            sample_counter = sample_counter + 1
-            dflist.append(filtered_df)
 
-        final_df = pd.concat(dflist, axis=0, ignore_index=True)
-        final_df.to_csv(amrfinderplus_summary_location, mode="a", index=False)
+
+def make_summaries(**arguments):
+    """Create summaries from python code, for example in a snakemake run block. The keyword arguments have
+    the names of the command line arguments, e.g.
+    make_summaries(summary_type="all", output_dir="output", species="salmonella", input=[...], resfinder_summary_file_names=[genes, pheno])
+    """
+    summary = JunoSummary(arguments)
+    summary.preproccesing_for_summary_files()
+    summary.run()
+    return summary
 
 
 def main():
     m = JunoSummary()
     m.get_user_arguments()
     m.preproccesing_for_summary_files()
-    summary_type = m.dict_arguments.get("summary_type")
-
-    if summary_type == "resfinder":
-        m.create_amr_genes_summary()
-        m.add_header_to_phenotype_summary()
-        m.create_amr_phenotype_summary()
-
-    elif summary_type == "pointfinder":
-        m.pointfinder_result_summary()
-
-    elif summary_type == "amrfinderplus":
-        m.amrfinderplus_summary()
-
-    elif summary_type == "virulencefinder":
-        m.virulencefinder_summary()
-
-    elif summary_type == "iles":
-        m.iles_summary()
+    m.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Removes empty files and empty directories from the outputs of the rules before a run, so snakemake
+runs the samples of an interrupted run again. Only the output locations of the rules (the result directory of every
+sample and the summary directory) are scanned, each in its own thread, instead of the whole output directory.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Result directories of the tool rules, with a directory per sample
+TOOL_RESULT_DIRS = ["resfinder", "amrfinderplus", "virulencefinder"]
+# Directories are walked in parallel, the time goes to waiting for the (network) file system
+CLEANUP_THREADS = 16
+
+
+def rule_output_locations(output_dir, samples):
+    output_dir = Path(output_dir)
+    locations = [
+        output_dir.joinpath("results", tool, sample)
+        for tool in TOOL_RESULT_DIRS
+        for sample in samples
+    ]
+    locations.append(output_dir.joinpath("summary"))
+    return locations
+
+
+def clean_directory(path, removed):
+    """Removes the empty files and then the empty directories below path (path included), the removed paths are
+    added to removed. Returns whether path was removed."""
+    try:
+        entries = list(os.scandir(path))
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+    remaining = len(entries)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if clean_directory(entry.path, removed):
+                remaining -= 1
+        elif entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_size == 0:
+            os.unlink(entry.path)
+            removed["files"].append(entry.path)
+            remaining -= 1
+    if remaining == 0:
+        os.rmdir(path)
+        removed["directories"].append(str(path))
+        return True
+    return False
+
+
+def clean_outputs(locations, threads=CLEANUP_THREADS):
+    """Cleans the locations in parallel, returns a report of what was removed and how long it took"""
+    start = time.perf_counter()
+    locations = [Path(location) for location in locations]
+
+    def clean(location):
+        removed = {"files": [], "directories": []}
+        clean_directory(location, removed)
+        return removed
+
+    removed = {"files": [], "directories": []}
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for location_removed in executor.map(clean, locations):
+            removed["files"].extend(location_removed["files"])
+            removed["directories"].extend(location_removed["directories"])
+    return {
+        "seconds": round(time.perf_counter() - start, 3),
+        "locations": len(locations),
+        "removed_files": sorted(removed["files"]),
+        "removed_directories": sorted(removed["directories"]),
+    }
@@ -0,0 +1,117 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Aggregated performance report of a run from the snakemake benchmark files of the rules
+(<output>/log/benchmark/<rule>/<sample>.tsv). For every rule the percentiles of the wall time, peak memory and I/O,
+the slowest samples and the CPU efficiency (cpu time / (wall time * requested threads)) are written to the audit
+trail, so the resources can be tuned and a tool that became slower after a database update is noticed. Jobs whose
+results were taken from the result cache did not run the tool, their benchmarks are left out.
+"""
+
+import csv
+import math
+from pathlib import Path
+
+import yaml
+
+# Measurement in the report and how it is computed from a line of a snakemake benchmark file
+BENCHMARK_METRICS = {
+    "wall_seconds": lambda row: float(row["s"]),
+    "max_rss_mb": lambda row: float(row["max_rss"]),
+    "io_in_mb": lambda row: float(row["io_in"]),
+    "io_out_mb": lambda row: float(row["io_out"]),
+    "cpu_seconds": lambda row: float(row["cpu_time"]),
+}
+PERCENTILES = {"p50": 0.5, "p90": 0.9, "p95": 0.95, "max": 1.0}
+# Number of slowest samples per rule in the report
+SLOWEST_SAMPLES = 10
+# Marker next to the benchmark (<sample>.cache_hit) of a job whose results were taken from the result cache
+CACHE_HIT_SUFFIX = ".cache_hit"
+
+
+def read_benchmark(location):
+    """The measurements of the first repeat in a snakemake benchmark file, measurements that are NA are left out"""
+    with open(location, "r", newline="") as benchmark_file:
+        for row in csv.DictReader(benchmark_file, delimiter="\t"):
+            values = {}
+            for metric, get_value in BENCHMARK_METRICS.items():
+                try:
+                    values[metric] = get_value(row)
+                except (KeyError, TypeError, ValueError):
+                    # Benchmarks have NA when the process was too short to be measured
+                    continue
+            return values
+    return {}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, int(math.ceil(fraction * len(values))) - 1))]
+
+
+def collect_jobs(benchmark_dir, requested_threads):
+    """Measurements of every job per rule. Jobs of a rule with a {sample} wildcard are in a directory named after
+    the rule, a rule that runs once has a single <rule>.tsv file."""
+    jobs = {}
+    benchmark_dir = Path(benchmark_dir)
+    for location in sorted(benchmark_dir.glob("**/*.tsv")):
+        if location.with_suffix(CACHE_HIT_SUFFIX).exists():
+            continue
+        relative = location.relative_to(benchmark_dir)
+        if len(relative.parts) > 1:
+            rule, sample = relative.parts[0], location.stem
+        else:
+            rule, sample = location.stem, None
+        values = read_benchmark(location)
+        if "wall_seconds" not in values:
+            continue
+        threads = requested_threads(rule, sample)
+        values["threads"] = threads
+        if "cpu_seconds" in values and values["wall_seconds"] > 0:
+            values["cpu_efficiency"] = values["cpu_seconds"] / (values["wall_seconds"] * threads)
+        jobs.setdefault(rule, []).append((sample, values))
+    return jobs
+
+
+def summarize_rule(jobs):
+    summary = {"jobs": len(jobs)}
+    for metric in [*BENCHMARK_METRICS, "cpu_efficiency"]:
+        values = [values[metric] for sample, values in jobs if metric in values]
+        if values:
+            summary[metric] = {
+                name: round(percentile(values, fraction), 3)
+                for name, fraction in PERCENTILES.items()
+            }
+    threads = sorted({values["threads"] for sample, values in jobs})
+    summary["requested_threads"] = threads
+    slowest = sorted(jobs, key=lambda job: job[1]["wall_seconds"], reverse=True)
+    summary["slowest_samples"] = [
+        {
+            "sample": sample,
+            **{
+                metric: round(values[metric], 3)
+                for metric in ["wall_seconds", "max_rss_mb", "cpu_efficiency"]
+                if metric in values
+            },
+            "threads": values["threads"],
+        }
+        for sample, values in slowest[:SLOWEST_SAMPLES]
+        if sample is not None
+    ]
+    return summary
+
+
+def performance_report(benchmark_dir, requested_threads):
+    """Report per rule, requested_threads(rule, sample) gives the threads a job got (sample is None for rules
+    that run once)"""
+    jobs = collect_jobs(benchmark_dir, requested_threads)
+    return {rule: summarize_rule(rule_jobs) for rule, rule_jobs in jobs.items()}
+
+
+def write_performance_report(benchmark_dir, location, requested_threads):
+    report = performance_report(benchmark_dir, requested_threads)
+    Path(location).parent.mkdir(parents=True, exist_ok=True)
+    with open(location, "w") as report_file:
+        yaml.safe_dump(report, report_file, sort_keys=False)
+    return report
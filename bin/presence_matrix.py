@@ -0,0 +1,345 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Presence/absence matrix of the samples by the genes and mutations that ResFinder, PointFinder,
+AMRFinderPlus and VirulenceFinder found (features, e.g. resfinder:blaTEM-1B or pointfinder:gyrA p.S83L), built from
+the summaries of a run. A matrix can be updated with the samples of every run, the ids of samples and features never
+change: new ones get the next id and a sample that is added again gets its new profile. The matrix is stored in a
+directory as numpy arrays in compressed sparse row (sample -> features) and column (feature -> samples) form, which
+are memory mapped when the matrix is opened. Queries only read the samples of the features of the query profile,
+so the nearest profiles (Jaccard or Hamming) among hundreds of thousands of samples are found in milliseconds.
+Example: python3 bin/presence_matrix.py update -m /data/amr_matrix --summary_dir output/summary
+         python3 bin/presence_matrix.py query -m /data/amr_matrix --sample sample1 -k 20
+"""
+
+import argparse
+import csv
+import datetime
+import fcntl
+import json
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+# Summary file, tool and column with the feature, for the summaries with one row per gene or mutation
+FEATURE_SOURCES = {
+    "summary_amr_genes.csv": ("resfinder", "Resistance gene"),
+    "summary_amr_pointfinder_results.csv": ("pointfinder", "Mutation"),
+    "summary_amrfinderplus.csv": ("amrfinderplus", "Gene symbol"),
+    "summary_virulencefinder.csv": ("virulencefinder", "Virulence factor"),
+}
+SAMPLE_COLUMNS = ["Sample", "Samplename"]
+SAMPLES_FILE = "samples.txt"
+FEATURES_FILE = "features.txt"
+MANIFEST_FILE = "matrix.json"
+FORMAT_VERSION = 1
+# indptr/indices: features of each sample, feature_indptr/feature_indices: samples of each feature
+ARRAYS = {
+    "indptr": np.int64,
+    "indices": np.int32,
+    "feature_indptr": np.int64,
+    "feature_indices": np.int32,
+}
+METRICS = ["jaccard", "hamming"]
+
+
+def read_profiles(summary_dir, samples=()):
+    """Features of every sample in the summaries of a run. The samples (for example of the sample sheet) are
+    included without features when none were found."""
+    profiles = {sample: set() for sample in samples}
+    for file_name, (tool, column) in FEATURE_SOURCES.items():
+        location = Path(summary_dir, file_name)
+        if not location.is_file():
+            continue
+        with open(location, newline="") as summary_file:
+            reader = csv.DictReader(summary_file)
+            sample_column = next(
+                (name for name in SAMPLE_COLUMNS if name in (reader.fieldnames or [])), None
+            )
+            if sample_column is None or column not in reader.fieldnames:
+                continue
+            for row in reader:
+                features = profiles.setdefault(row[sample_column], set())
+                if row[column]:
+                    features.add(f"{tool}:{row[column]}")
+    return profiles
+
+
+def read_names(location):
+    with open(location, encoding="utf-8") as names_file:
+        return names_file.read().splitlines()
+
+
+def write_names(location, names):
+    with open(location, "w", encoding="utf-8") as names_file:
+        names_file.writelines(f"{name}\n" for name in names)
+
+
+@contextmanager
+def file_lock(location):
+    location.parent.mkdir(parents=True, exist_ok=True)
+    with open(location, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class PresenceMatrix:
+    """Sample by feature presence matrix stored in a directory, see update_matrix"""
+
+    def __init__(self, directory, mmap_mode="r"):
+        self.directory = Path(directory)
+        with open(self.directory.joinpath(MANIFEST_FILE)) as manifest_file:
+            self.manifest = json.load(manifest_file)
+        if self.manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"The presence matrix in {directory} has format version {self.manifest['format_version']}, "
+                f"this version of juno-amr reads version {FORMAT_VERSION}"
+            )
+        self.samples = read_names(self.directory.joinpath(SAMPLES_FILE))
+        self.features = read_names(self.directory.joinpath(FEATURES_FILE))
+        for name in ARRAYS:
+            setattr(self, name, np.load(self.directory.joinpath(f"{name}.npy"), mmap_mode=mmap_mode))
+        # Number of features of every sample
+        self.sizes = np.diff(self.indptr)
+        self._sample_ids = None
+        self._feature_ids = None
+
+    @property
+    def sample_ids(self):
+        if self._sample_ids is None:
+            self._sample_ids = {sample: number for number, sample in enumerate(self.samples)}
+        return self._sample_ids
+
+    @property
+    def feature_ids(self):
+        if self._feature_ids is None:
+            self._feature_ids = {feature: number for number, feature in enumerate(self.features)}
+        return self._feature_ids
+
+    @property
+    def shape(self):
+        return len(self.samples), len(self.features)
+
+    def profile_ids(self, sample):
+        sample_id = self.sample_ids[sample]
+        return np.asarray(self.indices[self.indptr[sample_id] : self.indptr[sample_id + 1]])
+
+    def profile(self, sample):
+        """Features of a sample"""
+        return [self.features[feature_id] for feature_id in self.profile_ids(sample)]
+
+    def query_profile(self, query):
+        """Feature ids and number of features of a query, which is a sample or a list of features. Features that
+        are not in the matrix are part of the query profile, but no sample has them."""
+        if isinstance(query, str):
+            feature_ids = self.profile_ids(query)
+            return feature_ids, len(feature_ids)
+        features = set(query)
+        feature_ids = np.array(
+            sorted(self.feature_ids[feature] for feature in features if feature in self.feature_ids),
+            dtype=np.int64,
+        )
+        return feature_ids, len(features)
+
+    def shared_features(self, feature_ids):
+        """Number of the features that every sample shares with the query"""
+        postings = [
+            self.feature_indices[self.feature_indptr[feature_id] : self.feature_indptr[feature_id + 1]]
+            for feature_id in feature_ids
+        ]
+        if not postings:
+            return np.zeros(len(self.samples), dtype=np.int64)
+        return np.bincount(np.concatenate(postings), minlength=len(self.samples))
+
+    def distances(self, query, metric="jaccard"):
+        """Jaccard distance (1 - shared / union, 0 for two empty profiles) or Hamming distance (features that only
+        one of the two has) of every sample to the query, with the number of shared features"""
+        feature_ids, query_size = self.query_profile(query)
+        shared = self.shared_features(feature_ids)
+        union = self.sizes + query_size - shared
+        if metric == "jaccard":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                distance = np.where(union > 0, 1.0 - shared / union, 0.0)
+        elif metric == "hamming":
+            distance = union - shared
+        else:
+            raise ValueError(f"Unknown metric {metric}, choose from {', '.join(METRICS)}")
+        return distance, shared
+
+    def nearest(self, query, k=10, metric="jaccard", include_self=False):
+        """The k samples with the profiles closest to the query (a sample or a list of features), ties are
+        ordered by sample id"""
+        distance, shared = self.distances(query, metric)
+        candidates = np.arange(len(self.samples))
+        if isinstance(query, str) and not include_self:
+            candidates = candidates[candidates != self.sample_ids[query]]
+        if k < len(candidates):
+            # Only the k nearest (and the samples with the same distance as the k-th) are sorted
+            kth = np.partition(distance[candidates], k - 1)[k - 1]
+            candidates = candidates[distance[candidates] <= kth]
+        order = candidates[np.lexsort((candidates, distance[candidates]))][:k]
+        return [
+            {
+                "sample": self.samples[sample_id],
+                "distance": distance[sample_id].item(),
+                "shared": int(shared[sample_id]),
+                "features": int(self.sizes[sample_id]),
+            }
+            for sample_id in order
+        ]
+
+    def to_scipy(self):
+        """The matrix as a scipy.sparse csr_matrix of booleans"""
+        try:
+            from scipy.sparse import csr_matrix
+        except ImportError as error:
+            raise ImportError("scipy is needed for PresenceMatrix.to_scipy, install it with 'pip install scipy'") from error
+        return csr_matrix(
+            (np.ones(len(self.indices), dtype=bool), self.indices, self.indptr), shape=self.shape
+        )
+
+
+def write_matrix(directory, samples, features, rows, columns):
+    """Writes the matrix with an entry for every (row, column) pair, the pairs are unique"""
+    order = np.lexsort((columns, rows))
+    rows, columns = rows[order], columns[order]
+    indptr = np.zeros(len(samples) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(samples)), out=indptr[1:])
+    feature_order = np.argsort(columns, kind="stable")
+    feature_indptr = np.zeros(len(features) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(columns, minlength=len(features)), out=feature_indptr[1:])
+    arrays = {
+        "indptr": indptr,
+        "indices": columns,
+        "feature_indptr": feature_indptr,
+        "feature_indices": rows[feature_order],
+    }
+    directory.mkdir(parents=True)
+    for name, data_type in ARRAYS.items():
+        np.save(directory.joinpath(f"{name}.npy"), arrays[name].astype(data_type))
+    write_names(directory.joinpath(SAMPLES_FILE), samples)
+    write_names(directory.joinpath(FEATURES_FILE), features)
+    with open(directory.joinpath(MANIFEST_FILE), "w") as manifest_file:
+        json.dump(
+            {
+                "format_version": FORMAT_VERSION,
+                "samples": len(samples),
+                "features": len(features),
+                "entries": len(columns),
+                "updated": datetime.datetime.now().isoformat(timespec="seconds"),
+            },
+            manifest_file,
+            indent=2,
+        )
+
+
+def update_matrix(directory, profiles):
+    """Adds the profiles ({sample: features}) to the matrix in directory, which is made when it is not there.
+    The new matrix is written next to the old one and renamed into place, processes that have the old one open
+    keep reading it."""
+    directory = Path(directory)
+    with file_lock(directory.with_name(f".{directory.name}.lock")):
+        if directory.joinpath(MANIFEST_FILE).is_file():
+            matrix = PresenceMatrix(directory)
+            samples, features = matrix.samples, matrix.features
+            sample_ids, feature_ids = dict(matrix.sample_ids), dict(matrix.feature_ids)
+            rows = np.repeat(np.arange(len(samples), dtype=np.int64), matrix.sizes)
+            columns = np.asarray(matrix.indices, dtype=np.int64)
+        else:
+            samples, features, sample_ids, feature_ids = [], [], {}, {}
+            rows = columns = np.zeros(0, dtype=np.int64)
+
+        new_rows, new_columns = [], []
+        for sample, sample_features in profiles.items():
+            if sample not in sample_ids:
+                sample_ids[sample] = len(samples)
+                samples.append(sample)
+            for feature in sorted(sample_features):
+                if feature not in feature_ids:
+                    feature_ids[feature] = len(features)
+                    features.append(feature)
+                new_rows.append(sample_ids[sample])
+                new_columns.append(feature_ids[feature])
+        # The samples that are added again only keep their new profile
+        replaced = np.array([sample_ids[sample] for sample in profiles], dtype=np.int64)
+        kept = ~np.isin(rows, replaced)
+        rows = np.concatenate([rows[kept], np.array(new_rows, dtype=np.int64)])
+        columns = np.concatenate([columns[kept], np.array(new_columns, dtype=np.int64)])
+
+        tmp_dir = directory.with_name(f".{directory.name}.tmp.{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        try:
+            write_matrix(tmp_dir, samples, features, rows, columns)
+            if directory.exists():
+                old = directory.with_name(f".{directory.name}.old.{os.getpid()}")
+                os.rename(directory, old)
+                os.rename(tmp_dir, directory)
+                shutil.rmtree(old, ignore_errors=True)
+            else:
+                os.rename(tmp_dir, directory)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return PresenceMatrix(directory)
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    subparsers = argument_parser.add_subparsers(dest="command", required=True)
+    update_parser = subparsers.add_parser("update", help="Add the samples of a run to a matrix")
+    update_parser.add_argument("-m", "--matrix", type=Path, required=True, help="Directory of the matrix")
+    update_parser.add_argument(
+        "--summary_dir", type=Path, required=True, help="Summary directory of a juno-amr run"
+    )
+    update_parser.add_argument(
+        "--sample_sheet",
+        type=Path,
+        default=None,
+        help="Sample sheet of the run, samples without any gene or mutation are added with an empty profile",
+    )
+    query_parser = subparsers.add_parser("query", help="Find the samples with the nearest profiles")
+    query_parser.add_argument("-m", "--matrix", type=Path, required=True, help="Directory of the matrix")
+    query = query_parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("--sample", help="Sample in the matrix whose profile is the query")
+    query.add_argument(
+        "--features", nargs="+", help="Profile of the query, for example resfinder:blaTEM-1B 'pointfinder:gyrA p.S83L'"
+    )
+    query_parser.add_argument("--metric", choices=METRICS, default="jaccard")
+    query_parser.add_argument("-k", type=int, default=10, help="Number of samples, default is 10")
+    info_parser = subparsers.add_parser("info", help="Number of samples, features and entries of a matrix")
+    info_parser.add_argument("-m", "--matrix", type=Path, required=True, help="Directory of the matrix")
+    args = argument_parser.parse_args()
+
+    if args.command == "update":
+        samples = ()
+        if args.sample_sheet:
+            from sample_sheet import load_sample_sheet
+
+            samples = load_sample_sheet(args.sample_sheet)
+        matrix = update_matrix(args.matrix, read_profiles(args.summary_dir, samples))
+        print(json.dumps(matrix.manifest))
+    elif args.command == "query":
+        matrix = PresenceMatrix(args.matrix)
+        if args.sample is not None and args.sample not in matrix.sample_ids:
+            sys.exit(f"Sample {args.sample} is not in the matrix {args.matrix}")
+        writer = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+        writer.writerow(["sample", f"{args.metric}_distance", "shared_features", "features"])
+        for result in matrix.nearest(args.sample if args.sample is not None else args.features, args.k, args.metric):
+            writer.writerow(
+                [result["sample"], round(result["distance"], 4), result["shared"], result["features"]]
+            )
+    else:
+        print(json.dumps(PresenceMatrix(args.matrix).manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Parsers for the result files of ResFinder/PointFinder (text tables or the standardised
+json output), VirulenceFinder and AMRFinderPlus. Every file is read once into a ResultTable with compact
+records, which is shared by all summaries of make_summary.py.
+"""
+
+import csv
+import json
+from pathlib import Path
+
+# Name of the json output of ResFinder, given to ResFinder with -j by the rules
+RESFINDER_JSON = "resfinder.json"
+
+
+class Record:
+    """Base class for one row of a result table, the fields are given by __slots__"""
+
+    __slots__ = ()
+    # Column names of the fields in the text output of the tool
+    columns = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def values(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(repr(value) for value in self.values())})"
+
+
+class ResfinderGene(Record):
+    __slots__ = ("resistance_gene", "identity", "alignment_length", "coverage")
+    columns = ("Resistance gene", "Identity", "Alignment Length/Gene Length", "Coverage")
+
+
+class Phenotype(Record):
+    __slots__ = (
+        "antimicrobial",
+        "antimicrobial_class",
+        "phenotype",
+        "match",
+        "genetic_background",
+    )
+    columns = (
+        "Antimicrobial",
+        "Class",
+        "WGS-predicted phenotype",
+        "Match",
+        "Genetic background",
+    )
+
+
+class PointMutation(Record):
+    __slots__ = ("mutation", "nucleotide_change", "amino_acid_change", "resistance", "pmid")
+    columns = ("Mutation", "Nucleotide change", "Amino acid change", "Resistance", "PMID")
+
+
+RECORD_TYPES = {
+    record_type.__name__: record_type
+    for record_type in [ResfinderGene, Phenotype, PointMutation]
+}
+
+
+class ResultTable:
+    """Parsed result file: the column names as written by the tool, the rows and the comment lines
+    before the table. Rows are Record objects, or lists for tables without a fixed record type."""
+
+    __slots__ = ("record_type", "columns", "rows", "comments")
+
+    def __init__(self, record_type, columns, rows, comments=None):
+        self.record_type = record_type
+        self.columns = columns
+        self.rows = rows
+        self.comments = comments or []
+
+    def row_values(self):
+        if self.record_type is None:
+            return self.rows
+        return [row.values() for row in self.rows]
+
+    def to_json(self):
+        return {
+            "record_type": self.record_type.__name__ if self.record_type else None,
+            "columns": self.columns,
+            "rows": self.row_values(),
+            "comments": self.comments,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        record_type = RECORD_TYPES.get(data["record_type"])
+        rows = data["rows"]
+        if record_type is not None:
+            rows = [record_type(*values) for values in rows]
+        return cls(record_type, data["columns"], rows, data["comments"])
+
+
+def split_line(line):
+    return line.rstrip("\r\n").split("\t")
+
+
+def read_records(pathname, lines, record_type, stop_at_empty_line=False):
+    """Make records of the lines of a table, the first line is the header. Fields are found by column name,
+    so the order of the columns in the file does not matter."""
+    header = split_line(lines[0].lstrip("# "))
+    positions = []
+    for column in record_type.columns:
+        if column not in header:
+            raise ValueError(f"Column '{column}' not found in {pathname}")
+        positions.append(header.index(column))
+
+    rows = []
+    for line in lines[1:]:
+        if not line.strip("\r\n"):
+            if stop_at_empty_line:
+                break
+            continue
+        fields = split_line(line)
+        rows.append(
+            record_type(*[fields[i] if i < len(fields) else "" for i in positions])
+        )
+    return ResultTable(record_type, [header[i] for i in positions], rows)
+
+
+def read_resfinder_genes(pathname):
+    """ResFinder_results_tab.txt, only the columns used in the summary are kept"""
+    with open(pathname, "r") as opened_file:
+        lines = opened_file.readlines()
+    return read_records(pathname, lines, ResfinderGene)
+
+
+def read_pheno_table(pathname):
+    """pheno_table.txt, the antimicrobial table starts at the '# Antimicrobial' header and ends at the first empty line"""
+    with open(pathname, "r") as opened_file:
+        lines = opened_file.readlines()
+
+    for header_index, line in enumerate(lines):
+        if line.startswith("# Antimicrobial\t"):
+            break
+    else:
+        raise ValueError(f"No antimicrobial table found in {pathname}")
+
+    table = read_records(pathname, lines[header_index:], Phenotype, stop_at_empty_line=True)
+    # The informational header for the phenotype summary starts at the empty comment line after the caution
+    # paragraph at the top (or after the title and the sample when there is no caution)
+    start = next((index for index, line in enumerate(lines[:header_index]) if "caution" in line), 0)
+    start = next((index for index in range(start, header_index) if lines[index].strip() == "#"), header_index)
+    table.comments = lines[start:header_index]
+    return table
+
+
+def read_pointfinder_results(pathname):
+    """PointFinder_results.txt"""
+    with open(pathname, "r") as opened_file:
+        lines = opened_file.readlines()
+    return read_records(pathname, lines, PointMutation)
+
+
+def read_tool_table(pathname, columns):
+    """Read a tab separated result file of VirulenceFinder or AMRFinderPlus and keep the given columns
+    (in the given order) that are present in the file"""
+    with open(pathname, "r", newline="") as opened_file:
+        reader = csv.reader(opened_file, delimiter="\t")
+        header = next(reader, [])
+        positions = [header.index(column) for column in columns if column in header]
+        rows = [
+            [fields[i] if i < len(fields) else "" for i in positions]
+            for fields in reader
+            if fields
+        ]
+    return ResultTable(None, [header[i] for i in positions], rows)
+
+
+def read_virulencefinder_results(pathname):
+    return read_tool_table(
+        pathname,
+        [
+            "Virulence factor",
+            "Identity",
+            "Query / Template length",
+            "Protein function",
+        ],
+    )
+
+
+def read_amrfinderplus_results(pathname):
+    return read_tool_table(
+        pathname,
+        [
+            "Gene symbol",
+            "Sequence name",
+            "Element type",
+            "Element subtype",
+            "Class",
+            "Subclass",
+            "% Coverage of reference sequence",
+            "% Identity to reference sequence",
+        ],
+    )
+
+
+def find_resfinder_json(sample_dir):
+    """The standardised json output of ResFinder in a sample directory. The rules name it RESFINDER_JSON, in the
+    output of older runs it has the name ResFinder gave it and has to be the only json file."""
+    pathname = Path(sample_dir, RESFINDER_JSON)
+    if pathname.is_file():
+        return pathname
+    json_files = sorted(Path(sample_dir).glob("*.json"))
+    if not json_files:
+        raise FileNotFoundError(f"No ResFinder json output found in {sample_dir}")
+    if len(json_files) > 1:
+        raise ValueError(
+            f"More than one json file in {sample_dir} ({', '.join(path.name for path in json_files)}), "
+            f"the json output of ResFinder should be named {RESFINDER_JSON}"
+        )
+    return json_files[0]
+
+
+def read_resfinder_json(pathname):
+    """Read the standardised json output of ResFinder into the same tables as the text output.
+    Returns a dict with the name of the text file each table replaces as key."""
+    with open(pathname, "r") as opened_file:
+        results = json.load(opened_file)
+    seq_regions = results.get("seq_regions", {})
+    seq_variations = results.get("seq_variations", {})
+
+    genes = []
+    for region in seq_regions.values():
+        if not any(database.startswith("ResFinder") for database in region.get("ref_database", [])):
+            continue
+        reference_length = region.get("ref_seq_length", region.get("ref_seq_lenght", ""))
+        genes.append(
+            ResfinderGene(
+                region["name"],
+                str(region.get("identity", "")),
+                f"{region.get('alignment_length', '')}/{reference_length}",
+                str(region.get("coverage", "")),
+            )
+        )
+
+    def mutation_name(variation):
+        gene = variation.get("gene_name") or variation["ref_id"].split(";;")[0]
+        return gene, variation.get("seq_var", "")
+
+    mutations = []
+    for variation in seq_variations.values():
+        gene, change = mutation_name(variation)
+        mutations.append(
+            PointMutation(
+                f"{gene} {change}",
+                f"{variation.get('ref_codon', '')} -> {variation.get('var_codon', '')}".upper(),
+                f"{variation.get('ref_aa', '')} -> {variation.get('var_aa', '')}".upper(),
+                ",".join(name.capitalize() for name in variation.get("phenotypes", [])),
+                ",".join(str(pmid) for pmid in variation.get("pmids", [])),
+            )
+        )
+
+    phenotypes = []
+    for phenotype in results.get("phenotypes", {}).values():
+        if phenotype.get("category", "amr") != "amr":
+            continue
+        background = [
+            f"{seq_regions[key]['name']} ({seq_regions[key]['ref_id']})"
+            for key in phenotype.get("seq_regions", [])
+            if key in seq_regions
+        ]
+        background.extend(
+            "{} ({})".format(*mutation_name(seq_variations[key]))
+            for key in phenotype.get("seq_variations", [])
+            if key in seq_variations
+        )
+        phenotypes.append(
+            Phenotype(
+                phenotype.get("amr_resistance", phenotype.get("key", "")),
+                ", ".join(phenotype.get("amr_classes", [])),
+                "Resistant" if phenotype.get("amr_resistant") else "No resistance",
+                str(phenotype.get("grade", 0)),
+                ", ".join(background),
+            )
+        )
+
+    return {
+        "ResFinder_results_tab.txt": ResultTable(
+            ResfinderGene, list(ResfinderGene.columns), genes
+        ),
+        "pheno_table.txt": ResultTable(Phenotype, list(Phenotype.columns), phenotypes),
+        "PointFinder_results.txt": ResultTable(
+            PointMutation, list(PointMutation.columns), mutations
+        ),
+    }
@@ -0,0 +1,88 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Threads and resources of the tool rules from the size of the input of each sample. Every
+resource is a line (intercept + per_mb * input size in MB) limited to a minimum and maximum, the lines are in
+the resource_model of config/pipeline_parameters.yaml and can be fitted to the benchmarks of previous runs
+with bin/calibrate_resources.py.
+"""
+
+import math
+import os
+
+# Rule name, tool in the resource model and the input files of a sample (keys in the sample sheet) that give its size
+TOOL_RULES = {
+    "runResfinderFastq": ("resfinder", ["R1", "R2"]),
+    "runResfinderFasta": ("resfinder_assembly", ["assembly"]),
+    "runamrfinderplus": ("amrfinderplus", ["assembly"]),
+    "runamrfinderplusBatch": ("amrfinderplus", ["assembly"]),
+    "runVirulencefinder": ("virulencefinder", ["assembly"]),
+    "runVirulencefinderKma": ("virulencefinder_kma", ["R1", "R2"]),
+    "subsampleReads": ("subsample_reads", ["R1", "R2"]),
+}
+
+# Rules that are not tool rules and the threads in the config they run with, the other rules run with one thread
+# (for example makePresenceMatrix)
+CONFIG_THREADS = {"makeSummaries": "summary"}
+
+# Resources that grow with the attempt, so a job that was killed for running out of memory or time
+# is restarted with more
+SCALED_BY_ATTEMPT = ["mem_gb", "runtime"]
+
+
+def file_size_mb(paths):
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path)) / 1e6
+
+
+def fastq_size_mb(input):
+    """Size of the fastq files (R1 and R2) of a sample. A rule that gets subsampled reads also has the reads of the
+    sample as input (reads), the subsample is not made yet when the resources are set and is at most as large."""
+    return file_size_mb(input.get("reads") or [input.r1, input.r2])
+
+
+def assembly_size_mb(input):
+    """Length of the assembly in Mbp. The file size is used, headers and newlines are only a few percent of
+    a fasta file and the file does not have to be read when the DAG is made."""
+    return file_size_mb([input.fasta_sample])
+
+
+def assemblies_size_mb(input):
+    """Length of all assemblies of a batch in Mbp"""
+    return file_size_mb(input.fasta_samples)
+
+
+def estimate(model, size_mb, attempt=1, resource=None):
+    value = model["intercept"] + model["per_mb"] * size_mb
+    value = min(max(value, model["min"]), model["max"])
+    # The maximum is for the first attempt, a restarted job gets more even when the first attempt got the maximum
+    if resource in SCALED_BY_ATTEMPT:
+        value *= attempt
+    return int(math.ceil(value))
+
+
+def requested_threads(config, rule, samples=()):
+    """Threads a job of a rule got, for the tool rules from the input files of its samples (properties in the
+    sample sheet), a job has more than one sample when it runs a batch"""
+    if rule in TOOL_RULES:
+        tool, file_keys = TOOL_RULES[rule]
+        paths = [
+            properties[key]
+            for properties in samples
+            for key in file_keys
+            if properties.get(key)
+        ]
+        return estimate(config["resource_model"][tool]["threads"], file_size_mb(paths))
+    if rule in CONFIG_THREADS:
+        return int(config["threads"].get(CONFIG_THREADS[rule], 1))
+    return 1
+
+
+def sample_resource(resource_model, tool, resource, size_function):
+    """Function for the resources of a rule, gives the resource for the input of a sample"""
+    model = resource_model[tool][resource]
+    if resource == "threads":
+        return lambda wildcards, input: estimate(model, size_function(input))
+    return lambda wildcards, input, attempt: estimate(
+        model, size_function(input), attempt, resource
+    )
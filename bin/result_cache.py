@@ -0,0 +1,208 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Cache of the result directories of ResFinder, AMRFinderPlus and VirulenceFinder across runs. An entry is
+keyed by a hash of the content of the input files, the databases (path, size and modification time of their files),
+the conda environment of the tool, the software and database versions and the parameters. A hit is copied into the
+output directory instead of running the tool. Results are copied (not hardlinked) into and out of the cache and the
+files of an entry are read-only, so changing an output in place never changes the cached results of later runs.
+Entries are written to a temporary directory and renamed, readers hold a shared lock and eviction (least recently used
+entries first, when the cache is larger than the maximum size) an exclusive lock, so runs can share a cache.
+Example: python3 bin/result_cache.py fetch --cache_dir cache --tool virulencefinder --inputs s1.fasta -o output/s1 && exit 0
+         <run the tool>
+         python3 bin/result_cache.py store --cache_dir cache --tool virulencefinder --inputs s1.fasta -o output/s1
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from stat import S_IWGRP, S_IWOTH, S_IWUSR
+
+# Increase when the layout of the cache changes, so old entries are not used anymore
+CACHE_VERSION = 1
+# Files in an entry besides the results
+ENTRY_FILE = ".entry.json"
+CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as opened_file:
+        for chunk in iter(lambda: opened_file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def directory_fingerprint(path):
+    """Relative path, size and modification time of every file in a database directory. A database that is
+    downloaded again gets a new fingerprint, even if its content did not change."""
+    path = Path(path)
+    if path.is_file():
+        stat = path.stat()
+        return [[path.name, stat.st_size, stat.st_mtime_ns]]
+    files = []
+    for root, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            location = Path(root, filename)
+            stat = location.stat()
+            files.append([str(location.relative_to(path)), stat.st_size, stat.st_mtime_ns])
+    return files
+
+
+def cache_key(tool, inputs, databases=(), environment=None, parameters=None):
+    description = {
+        "cache_version": CACHE_VERSION,
+        "tool": tool,
+        "inputs": [file_digest(path) for path in inputs],
+        "databases": [directory_fingerprint(path) for path in databases],
+        "environment": file_digest(environment) if environment else None,
+        "parameters": parameters or {},
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def copy_tree(source, destination, read_only=False):
+    """Copies the files of source into destination, the copies are made read-only when asked"""
+    for root, dirnames, filenames in os.walk(source):
+        target_dir = Path(destination, Path(root).relative_to(source))
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for filename in filenames:
+            if filename == ENTRY_FILE:
+                continue
+            target = target_dir.joinpath(filename)
+            if target.exists() or target.is_symlink():
+                target.unlink()
+            shutil.copyfile(Path(root, filename), target)
+            if read_only:
+                target.chmod(target.stat().st_mode & ~(S_IWUSR | S_IWGRP | S_IWOTH))
+
+
+class ResultCache:
+    def __init__(self, cache_dir, max_size_gb=None):
+        self.cache_dir = Path(cache_dir)
+        self.entries_dir = self.cache_dir.joinpath("entries")
+        self.tmp_dir = self.cache_dir.joinpath("tmp")
+        self.max_size = max_size_gb * 1e9 if max_size_gb else None
+        for directory in [self.entries_dir, self.tmp_dir]:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def lock(self, exclusive=False):
+        with open(self.cache_dir.joinpath(".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def entry(self, key):
+        return self.entries_dir.joinpath(key[:2], key)
+
+    def fetch(self, key, output_dir):
+        """Materialises the cached results in output_dir, returns False if the key is not in the cache"""
+        entry = self.entry(key)
+        with self.lock():
+            if not entry.joinpath(ENTRY_FILE).is_file():
+                return False
+            copy_tree(entry, output_dir)
+            # The modification time of the entry file is the last use, for the eviction
+            os.utime(entry.joinpath(ENTRY_FILE))
+        return True
+
+    def store(self, key, output_dir, description=None):
+        """Adds the results in output_dir to the cache, an entry that is already there is kept"""
+        entry = self.entry(key)
+        if entry.joinpath(ENTRY_FILE).is_file():
+            return
+        tmp_entry = self.tmp_dir.joinpath(f"{key}.{os.getpid()}")
+        copy_tree(output_dir, tmp_entry, read_only=True)
+        size = sum(
+            location.stat().st_size for location in tmp_entry.rglob("*") if location.is_file()
+        )
+        with open(tmp_entry.joinpath(ENTRY_FILE), "w") as entry_file:
+            json.dump({**(description or {}), "size": size, "stored": time.time()}, entry_file)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # Another job stored the same results first
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        if self.max_size is not None:
+            self.evict(self.max_size)
+
+    def entries(self):
+        """(last use, size, location) of every entry"""
+        entries = []
+        for prefix_dir in self.entries_dir.iterdir():
+            for entry in prefix_dir.iterdir():
+                try:
+                    with open(entry.joinpath(ENTRY_FILE)) as entry_file:
+                        size = json.load(entry_file)["size"]
+                    last_use = entry.joinpath(ENTRY_FILE).stat().st_mtime
+                except (OSError, ValueError, KeyError):
+                    continue
+                entries.append((last_use, size, entry))
+        return entries
+
+    def evict(self, max_size):
+        """Removes the least recently used entries until the cache is not larger than max_size bytes"""
+        with self.lock(exclusive=True):
+            entries = sorted(self.entries())
+            total = sum(size for last_use, size, entry in entries)
+            removed = 0
+            for last_use, size, entry in entries:
+                if total <= max_size:
+                    break
+                # Renamed first, so a half removed entry is never found
+                trash = self.tmp_dir.joinpath(f"evicted.{entry.name}.{os.getpid()}")
+                os.rename(entry, trash)
+                shutil.rmtree(trash, ignore_errors=True)
+                total -= size
+                removed += 1
+        return removed
+
+
+def parse_parameters(parameters):
+    """name=value pairs of the command line as a dict"""
+    return dict(parameter.split("=", 1) for parameter in parameters or [])
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    argument_parser.add_argument("action", choices=["fetch", "store"])
+    argument_parser.add_argument("--cache_dir", type=Path, required=True)
+    argument_parser.add_argument("--max_gb", type=float, default=None, help="Maximum size of the cache, in GB")
+    argument_parser.add_argument("--tool", required=True)
+    argument_parser.add_argument("--inputs", nargs="+", required=True)
+    argument_parser.add_argument("--databases", nargs="*", default=[])
+    argument_parser.add_argument("--environment", default=None, help="Conda environment file of the tool")
+    argument_parser.add_argument(
+        "--parameters", nargs="*", default=[], metavar="NAME=VALUE", help="Versions and parameters of the tool"
+    )
+    argument_parser.add_argument("-o", "--output_dir", type=Path, required=True)
+    args = argument_parser.parse_args()
+
+    cache = ResultCache(args.cache_dir, args.max_gb)
+    parameters = parse_parameters(args.parameters)
+    key = cache_key(args.tool, args.inputs, args.databases, args.environment, parameters)
+    if args.action == "fetch":
+        if not cache.fetch(key, args.output_dir):
+            sys.exit(1)
+        print(f"Results of {args.tool} for {args.output_dir.name} taken from the cache")
+    else:
+        cache.store(key, args.output_dir, {"tool": args.tool, "parameters": parameters})
+
+
+if __name__ == "__main__":
+    main()
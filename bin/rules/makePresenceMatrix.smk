@@ -0,0 +1,25 @@
+# The genes and mutations of the samples as a sparse presence matrix (see bin/presence_matrix.py), for the samples
+# of this run and, with presence_matrix, also added to a matrix of earlier runs to find samples with similar profiles
+rule makePresenceMatrix:
+    input:
+        **{
+            name: SUMMARY_OUTPUTS[name]
+            for name in PRESENCE_MATRIX_SUMMARIES
+            if name in SUMMARY_OUTPUTS
+        },
+    output:
+        directory(OUT + "/summary/presence_matrix"),
+    benchmark:
+        OUT + "/log/benchmark/makePresenceMatrix.tsv"
+    message:
+        "Creating the presence matrix of the genes and mutations"
+    resources:
+        mem_gb=int(config["mem_gb"]["summary"]),
+    threads: 1
+    run:
+        from presence_matrix import read_profiles, update_matrix
+
+        profiles = read_profiles(OUT + "/summary", SAMPLES)
+        update_matrix(output[0], profiles)
+        if PRESENCE_MATRIX:
+            update_matrix(PRESENCE_MATRIX, profiles)
@@ -0,0 +1,73 @@
+# The summaries are made inside the snakemake process, so no python interpreter (and pandas) is started for them
+from make_summary import make_summaries
+
+# All summaries are made in one step, so the results of every sample are only parsed once
+SUMMARY_OUTPUTS = {
+    "genes_summary": OUT + "/summary/summary_amr_genes.csv",
+    "pheno_summary": OUT + "/summary/summary_amr_phenotype.csv",
+    "vir_summary": OUT + "/summary/summary_virulencefinder.csv",
+    "amrfinderplus_summary": OUT + "/summary/summary_amrfinderplus.csv",
+}
+SUMMARY_ARGUMENTS = {
+    "resfinder_summary_file_names": [
+        SUMMARY_OUTPUTS["genes_summary"],
+        SUMMARY_OUTPUTS["pheno_summary"],
+    ],
+    "virulencefinder_summary_file_names": [SUMMARY_OUTPUTS["vir_summary"]],
+    "amrfinderplus_summary_file_names": [SUMMARY_OUTPUTS["amrfinderplus_summary"]],
+}
+
+# If no sample has a species in the PointFinder database, there will be no output expected of this part
+if POINTFINDER_SAMPLES:
+    SUMMARY_OUTPUTS["pointfinder_results"] = (
+        OUT + "/summary/summary_amr_pointfinder_results.csv"
+    )
+    SUMMARY_ARGUMENTS["pointfinder_summary_file_name"] = [
+        SUMMARY_OUTPUTS["pointfinder_results"]
+    ]
+
+# iles summary can only be created for ecoli, campylobacter and salmonella samples
+if ILES_SAMPLES:
+    SUMMARY_OUTPUTS["iles_summary"] = OUT + "/summary/summary_iles.csv"
+    SUMMARY_ARGUMENTS["iles_summary_file_names"] = [SUMMARY_OUTPUTS["iles_summary"]]
+
+# Parquet copies of the summaries are written next to the csv files when asked for
+if config.get("summary_parquet", False):
+    for name, location in list(SUMMARY_OUTPUTS.items()):
+        SUMMARY_OUTPUTS[name + "_parquet"] = location.replace(".csv", ".parquet")
+    SUMMARY_ARGUMENTS["parquet"] = True
+
+# The time of each phase of the summary step is kept in the audit trail, a cProfile dump only when asked for
+SUMMARY_ARGUMENTS["profile"] = OUT + "/audit_trail/summary_profile.json"
+if config.get("summary_cprofile", False):
+    SUMMARY_ARGUMENTS["cprofile"] = OUT + "/audit_trail/summary_profile.pstats"
+
+
+rule makeSummaries:
+    input:
+        resfinder_output_dir=expand(OUT + "/results/resfinder/{sample}", sample=SAMPLES),
+        vir_output=expand(OUT + "/results/virulencefinder/{sample}/", sample=SAMPLES),
+        amrfinderplus_output=expand(
+            OUT + "/results/amrfinderplus/{sample}/", sample=SAMPLES
+        ),
+    output:
+        **SUMMARY_OUTPUTS,
+    benchmark:
+        OUT + "/log/benchmark/makeSummaries.tsv"
+    message:
+        "Creating summary files"
+    resources:
+        mem_gb=int(config["mem_gb"]["summary"]),
+    threads: int(config["threads"]["summary"])
+    run:
+        make_summaries(
+            summary_type="all",
+            output_dir=OUT,
+            species=config["species"],
+            sample_species={sample: sample_species(sample) for sample in SAMPLES},
+            input=list(input.resfinder_output_dir),
+            input_virulencefinder=list(input.vir_output),
+            input_amrfinderplus=list(input.amrfinderplus_output),
+            threads=threads,
+            **SUMMARY_ARGUMENTS,
+        )
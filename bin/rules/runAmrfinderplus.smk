@@ -1,23 +1,92 @@
-rule runamrfinderplus:
-    """Run amrfinderplus"""
-    input:
-        fasta_sample=lambda wildcards: SAMPLES[wildcards.sample]["assembly"],
-    output:
-        output_dir=directory(OUT + "/results/amrfinderplus/{sample}/"),
-    conda:
-        "../../envs/amrfinderplus.yaml"
-    message:
-        "Processing received fasta sample(s) in amrfinderplus"
-    resources:
-        mem_gb=int(config["mem_gb"]["amrfinderplus"]),
-    threads: int(config["threads"]["amrfinderplus"])
-    shell:
-        #TODO amrfinder needs to be run with -u in order to update
-        #This needs to be done the first time an environment is created or anytime you want to update
-        #Do this with a boolean or?
-        #amrfinder -u
-        #mkdir -p {output.output_dir} && amrfinder -n {input.fasta_sample} --plus -o {output.output_dir}/amrfinder_result.txt
-        #amrfinder cannot be run with -p or -n, just run it as a separate command
-        """
-        mkdir -p {output.output_dir} && amrfinder -n {input.fasta_sample} --plus -o {output.output_dir}/amrfinder_result.txt -d /mnt/db/juno-amr/amrfinderplusdb/2022-12-19.1
-        """
+from amrfinderplus_batch import make_batches
+
+AMRFINDERPLUS_BATCH_SIZE = int(config.get("amrfinderplus_batch_size", 1))
+
+
+if AMRFINDERPLUS_BATCH_SIZE > 1:
+
+    # One job per batch of assemblies, so the database is loaded once for all samples in the batch.
+    # The outputs of a batch are fixed lists, so there is a rule for every batch.
+    for batch, batch_samples in make_batches(SAMPLES, AMRFINDERPLUS_BATCH_SIZE).items():
+
+        rule:
+            name:
+                f"runamrfinderplus_{batch}"
+            input:
+                fasta_samples=[SAMPLES[sample]["assembly"] for sample in batch_samples],
+            output:
+                output_dirs=[
+                    directory(OUT + f"/results/amrfinderplus/{sample}/")
+                    for sample in batch_samples
+                ],
+            benchmark:
+                OUT + f"/log/benchmark/runamrfinderplusBatch/{batch}.tsv"
+            conda:
+                "../../envs/amrfinderplus.yaml"
+            message:
+                f"Processing {len(batch_samples)} fasta samples in amrfinderplus ({batch})"
+            params:
+                amrfinderplus_db=database_path(config["amrfinderplus_db"]),
+                # Every assembly of the batch is looked up in the result cache, only the others are analysed
+                cache=(
+                    f"--cache_dir {shlex.quote(RESULT_CACHE)} --cache_max_gb {config.get('result_cache_max_gb', 100)} "
+                    f"--environment {shlex.quote(os.path.join(workflow.basedir, 'envs', 'amrfinderplus.yaml'))} "
+                    f"--cache_database {shlex.quote(config['amrfinderplus_db'])}"
+                    if RESULT_CACHE
+                    else ""
+                ),
+            resources:
+                mem_gb=sample_resource(config["resource_model"], "amrfinderplus", "mem_gb", assemblies_size_mb),
+                runtime=sample_resource(config["resource_model"], "amrfinderplus", "runtime", assemblies_size_mb),
+            threads: sample_resource(config["resource_model"], "amrfinderplus", "threads", assemblies_size_mb)
+            shell:
+                """
+                amrfinderplus_db={params.amrfinderplus_db}
+                python3 bin/amrfinderplus_batch.py -a {input.fasta_samples} -o {output.output_dirs} -d "$amrfinderplus_db" --threads {threads} {params.cache}
+                """
+
+else:
+
+    rule runamrfinderplus:
+        """Run amrfinderplus"""
+        input:
+            fasta_sample=lambda wildcards: SAMPLES[wildcards.sample]["assembly"],
+        output:
+            output_dir=directory(OUT + "/results/amrfinderplus/{sample}/"),
+        benchmark:
+            OUT + "/log/benchmark/runamrfinderplus/{sample}.tsv"
+        group:
+            SAMPLE_GROUP
+        conda:
+            "../../envs/amrfinderplus.yaml"
+        message:
+            "Processing received fasta sample(s) in amrfinderplus"
+        params:
+            amrfinderplus_db=database_path(config["amrfinderplus_db"]),
+            use_cache=bool(RESULT_CACHE),
+            cache_hit=cache_hit_marker("runamrfinderplus"),
+            cache=result_cache_arguments("amrfinderplus", [config["amrfinderplus_db"]]),
+        resources:
+            mem_gb=sample_resource(config["resource_model"], "amrfinderplus", "mem_gb", assembly_size_mb),
+            runtime=sample_resource(config["resource_model"], "amrfinderplus", "runtime", assembly_size_mb),
+            **GROUP_RESOURCES,
+        threads: sample_resource(config["resource_model"], "amrfinderplus", "threads", assembly_size_mb)
+        shell:
+            #TODO amrfinder needs to be run with -u in order to update
+            #This needs to be done the first time an environment is created or anytime you want to update
+            #Do this with a boolean or?
+            #amrfinder -u
+            #mkdir -p {output.output_dir} && amrfinder -n {input.fasta_sample} --plus -o {output.output_dir}/amrfinder_result.txt
+            #amrfinder cannot be run with -p or -n, just run it as a separate command
+            """
+            rm -f {params.cache_hit}
+            if [ {params.use_cache} == True ] && python3 bin/result_cache.py fetch {params.cache} -o {output.output_dir}; then
+                touch {params.cache_hit}
+                exit 0
+            fi
+            amrfinderplus_db={params.amrfinderplus_db}
+            mkdir -p {output.output_dir} && amrfinder -n {input.fasta_sample} --plus --threads {threads} -o {output.output_dir}/amrfinder_result.txt -d "$amrfinderplus_db"
+            if [ {params.use_cache} == True ]; then
+                python3 bin/result_cache.py store {params.cache} -o {output.output_dir}
+            fi
+            """
@@ -1,27 +1,57 @@
-# TODO this rule is currently out of use, because we now only run resfinder on fastq files
 rule runResfinderFasta:
-    """Trying to run resfinder with hardcoded paths and all packages installed in a environment generated by conda/snakemake"""
+    """Run resfinder and pointfinder on the assembly, for the samples that use the assembly (see resfinder_input)"""
     input:
         fasta_sample=lambda wildcards: SAMPLES[wildcards.sample]["assembly"],
     output:
         output_dir=directory(OUT + "/results/resfinder/{sample}"),
+    benchmark:
+        OUT + "/log/benchmark/runResfinderFasta/{sample}.tsv"
+    group:
+        SAMPLE_GROUP
+    wildcard_constraints:
+        sample=sample_pattern(RESFINDER_ASSEMBLY_SAMPLES),
+    conda:
+        "../../envs/resfinder.yaml"
     message:
         "Processing received fasta sample in ResFinder and PointFinder"
     params:
         l=config["resfinder_min_coverage"],
         t=config["resfinder_identity_threshold"],
-        species=config["species"],
-        resfinder_db=config["resfinder_db"],
-        pointfinder_db=config["pointfinder_db"],
-        run_pointfinder=config["run_pointfinder"],
+        species=lambda wildcards: sample_species(wildcards.sample),
+        resfinder_db=database_path(config["resfinder_db"]),
+        pointfinder_db=database_path(config["pointfinder_db"]),
+        run_pointfinder=lambda wildcards: wildcards.sample in POINTFINDER_SAMPLES,
+        use_cache=bool(RESULT_CACHE),
+        cache_hit=cache_hit_marker("runResfinderFasta"),
+        cache=result_cache_arguments(
+            "resfinder",
+            [config["resfinder_db"], config["pointfinder_db"]],
+            input="assembly",
+            min_coverage=config["resfinder_min_coverage"],
+            identity_threshold=config["resfinder_identity_threshold"],
+            species=lambda wildcards: sample_species(wildcards.sample),
+            run_pointfinder=lambda wildcards: wildcards.sample in POINTFINDER_SAMPLES,
+        ),
     resources:
-        mem_gb=int(config["mem_gb"]["resfinder"]),
-    threads: int(config["threads"]["resfinder"])
+        mem_gb=sample_resource(config["resource_model"], "resfinder_assembly", "mem_gb", assembly_size_mb),
+        runtime=sample_resource(config["resource_model"], "resfinder_assembly", "runtime", assembly_size_mb),
+        **GROUP_RESOURCES,
+    threads: sample_resource(config["resource_model"], "resfinder_assembly", "threads", assembly_size_mb)
     shell:
         """
-if [ {params.run_pointfinder} == "1" ]; then
-    python3 bin/resfinder/run_resfinder.py -o {output.output_dir} -s \"{params.species}\" -l {params.l} -t {params.t} --acquired --point -ifa {input.fasta_sample} -db_res {params.resfinder_db} -db_point {params.pointfinder_db}
+rm -f {params.cache_hit}
+if [ {params.use_cache} == True ] && python3 bin/result_cache.py fetch {params.cache} -o {output.output_dir}; then
+    touch {params.cache_hit}
+    exit 0
+fi
+resfinder_db={params.resfinder_db}
+pointfinder_db={params.pointfinder_db}
+if [ {params.run_pointfinder} == True ]; then
+    python3 bin/resfinder/src/resfinder/run_resfinder.py -o {output.output_dir} -j {output.output_dir}/resfinder.json -s \"{params.species}\" -l {params.l} -t {params.t} --acquired --point -ifa {input.fasta_sample} -db_res "$resfinder_db" -db_point "$pointfinder_db"
 else
-    python3 bin/resfinder/run_resfinder.py -o {output.output_dir} -s \"{params.species}\" -l {params.l} -t {params.t} --acquired -ifa {input.fasta_sample} -db_res {params.resfinder_db} -db_point {params.pointfinder_db}
+    python3 bin/resfinder/src/resfinder/run_resfinder.py -o {output.output_dir} -j {output.output_dir}/resfinder.json -s \"{params.species}\" -l {params.l} -t {params.t} --acquired -ifa {input.fasta_sample} -db_res "$resfinder_db" -db_point "$pointfinder_db"
+fi
+if [ {params.use_cache} == True ]; then
+    python3 bin/result_cache.py store {params.cache} -o {output.output_dir}
 fi
         """
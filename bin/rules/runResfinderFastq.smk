@@ -1,10 +1,20 @@
 rule runResfinderFastq:
-    """Run resfinder and pointfinder"""
+    """Run resfinder and pointfinder on the reads, for the samples that use the reads (see resfinder_input)"""
     input:
-        r1=lambda wildcards: SAMPLES[wildcards.sample]["R1"],
-        r2=lambda wildcards: SAMPLES[wildcards.sample]["R2"],
+        r1=resfinder_reads("R1"),
+        r2=resfinder_reads("R2"),
+        # The resources follow the size of the reads of the sample when the reads are subsampled
+        reads=lambda wildcards: (
+            [SAMPLES[wildcards.sample]["R1"], SAMPLES[wildcards.sample]["R2"]] if SUBSAMPLE_DEPTH else []
+        ),
     output:
         output_dir=directory(OUT + "/results/resfinder/{sample}"),
+    benchmark:
+        OUT + "/log/benchmark/runResfinderFastq/{sample}.tsv"
+    group:
+        SAMPLE_GROUP
+    wildcard_constraints:
+        sample=sample_pattern(RESFINDER_READS_SAMPLES),
     conda:
         "../../envs/resfinder.yaml"
     message:
@@ -12,18 +22,42 @@ rule runResfinderFastq:
     params:
         l=config["resfinder_min_coverage"],
         t=config["resfinder_identity_threshold"],
-        species=config["species"],
-        resfinder_db=config["resfinder_db"],
-        pointfinder_db=config["pointfinder_db"],
-        run_pointfinder=config["run_pointfinder"],
+        species=lambda wildcards: sample_species(wildcards.sample),
+        resfinder_db=database_path(config["resfinder_db"], stage=not config.get("kma_shared_memory", False)),
+        pointfinder_db=database_path(config["pointfinder_db"], stage=not config.get("kma_shared_memory", False)),
+        run_pointfinder=lambda wildcards: wildcards.sample in POINTFINDER_SAMPLES,
+        kma=KMA_PATH,
+        use_cache=bool(RESULT_CACHE),
+        cache_hit=cache_hit_marker("runResfinderFastq"),
+        cache=result_cache_arguments(
+            "resfinder",
+            [config["resfinder_db"], config["pointfinder_db"]],
+            input="reads",
+            min_coverage=config["resfinder_min_coverage"],
+            identity_threshold=config["resfinder_identity_threshold"],
+            species=lambda wildcards: sample_species(wildcards.sample),
+            run_pointfinder=lambda wildcards: wildcards.sample in POINTFINDER_SAMPLES,
+        ),
     resources:
-        mem_gb=int(config["mem_gb"]["resfinder"]),
-    threads: int(config["threads"]["resfinder"])
+        mem_gb=sample_resource(config["resource_model"], "resfinder", "mem_gb", fastq_size_mb),
+        runtime=sample_resource(config["resource_model"], "resfinder", "runtime", fastq_size_mb),
+        **GROUP_RESOURCES,
+    threads: sample_resource(config["resource_model"], "resfinder", "threads", fastq_size_mb)
     shell:
         """
+rm -f {params.cache_hit}
+if [ {params.use_cache} == True ] && python3 bin/result_cache.py fetch {params.cache} -o {output.output_dir}; then
+    touch {params.cache_hit}
+    exit 0
+fi
+resfinder_db={params.resfinder_db}
+pointfinder_db={params.pointfinder_db}
 if [ {params.run_pointfinder} == True ]; then
-    python3 bin/resfinder/src/resfinder/run_resfinder.py -o {output.output_dir} -s \"{params.species}\" -l {params.l} -t {params.t} --acquired --point -ifq {input.r1} {input.r2} -db_res {params.resfinder_db} -db_point {params.pointfinder_db}
+    python3 bin/resfinder/src/resfinder/run_resfinder.py -o {output.output_dir} -j {output.output_dir}/resfinder.json -s \"{params.species}\" -l {params.l} -t {params.t} --acquired --point -ifq {input.r1} {input.r2} -db_res "$resfinder_db" -db_point "$pointfinder_db" -k {params.kma}
 else
-    python3 bin/resfinder/src/resfinder/run_resfinder.py -o {output.output_dir} -s \"{params.species}\" -l {params.l} -t {params.t} --acquired -ifq {input.r1} {input.r2} -db_res {params.resfinder_db} -db_point {params.pointfinder_db}
+    python3 bin/resfinder/src/resfinder/run_resfinder.py -o {output.output_dir} -j {output.output_dir}/resfinder.json -s \"{params.species}\" -l {params.l} -t {params.t} --acquired -ifq {input.r1} {input.r2} -db_res "$resfinder_db" -db_point "$pointfinder_db" -k {params.kma}
+fi
+if [ {params.use_cache} == True ]; then
+    python3 bin/result_cache.py store {params.cache} -o {output.output_dir}
 fi
         """
@@ -1,20 +1,86 @@
 rule runVirulencefinder:
-    """Run VirulenceFinder for each sample"""
+    """Run VirulenceFinder with BLAST on the assembly, for the samples that use BLAST (see virulencefinder_method)"""
     input:
         fasta_sample=lambda wildcards: SAMPLES[wildcards.sample]["assembly"],
     output:
         output_dir=directory(OUT + "/results/virulencefinder/{sample}/"),
+    benchmark:
+        OUT + "/log/benchmark/runVirulencefinder/{sample}.tsv"
+    group:
+        SAMPLE_GROUP
+    wildcard_constraints:
+        sample=sample_pattern(VIRULENCEFINDER_BLAST_SAMPLES),
     conda:
         "../../envs/virulencefinder.yaml"
     message:
         "Processing received fasta sample in virulencefinder"
+    params:
+        virulencefinder_db=database_path(config["virulencefinder_db"]),
+        use_cache=bool(RESULT_CACHE),
+        cache_hit=cache_hit_marker("runVirulencefinder"),
+        cache=result_cache_arguments("virulencefinder", [config["virulencefinder_db"]]),
     resources:
-        mem_gb=int(config["mem_gb"]["virulencefinder"]),
-    threads: int(config["threads"]["virulencefinder"])
+        mem_gb=sample_resource(config["resource_model"], "virulencefinder", "mem_gb", assembly_size_mb),
+        runtime=sample_resource(config["resource_model"], "virulencefinder", "runtime", assembly_size_mb),
+        **GROUP_RESOURCES,
+    threads: sample_resource(config["resource_model"], "virulencefinder", "threads", assembly_size_mb)
     shell:
         #the sample name directory is not being made by virulence finder
         # t =
         # l = 
         """
-        mkdir -p {output.output_dir} && python3 bin/virulencefinder/virulencefinder.py -i {input.fasta_sample} -o {output.output_dir} -p /mnt/db/juno-amr/virulencefinderdb/ -x 
+        rm -f {params.cache_hit}
+        if [ {params.use_cache} == True ] && python3 bin/result_cache.py fetch {params.cache} -o {output.output_dir}; then
+            touch {params.cache_hit}
+            exit 0
+        fi
+        virulencefinder_db={params.virulencefinder_db}
+        mkdir -p {output.output_dir} && python3 bin/virulencefinder/virulencefinder.py -i {input.fasta_sample} -o {output.output_dir} -p "$virulencefinder_db" -x
+        if [ {params.use_cache} == True ]; then
+            python3 bin/result_cache.py store {params.cache} -o {output.output_dir}
+        fi
+        """
+
+
+rule runVirulencefinderKma:
+    """Run VirulenceFinder with KMA on the reads, for the samples that use KMA (see virulencefinder_method).
+    VirulenceFinder uses KMA for fastq input, bin/kma_threads gives kma the threads of the rule."""
+    input:
+        r1=lambda wildcards: SAMPLES[wildcards.sample]["R1"],
+        r2=lambda wildcards: SAMPLES[wildcards.sample]["R2"],
+    output:
+        output_dir=directory(OUT + "/results/virulencefinder/{sample}/"),
+    benchmark:
+        OUT + "/log/benchmark/runVirulencefinderKma/{sample}.tsv"
+    group:
+        SAMPLE_GROUP
+    wildcard_constraints:
+        sample=sample_pattern(VIRULENCEFINDER_KMA_SAMPLES),
+    conda:
+        "../../envs/virulencefinder.yaml"
+    message:
+        "Processing received fastq sample in virulencefinder"
+    params:
+        virulencefinder_db=database_path(config["virulencefinder_db"]),
+        kma=os.path.join(workflow.basedir, "bin", "kma_threads"),
+        use_cache=bool(RESULT_CACHE),
+        cache_hit=cache_hit_marker("runVirulencefinderKma"),
+        cache=result_cache_arguments("virulencefinder", [config["virulencefinder_db"]], method="kma"),
+    resources:
+        mem_gb=sample_resource(config["resource_model"], "virulencefinder_kma", "mem_gb", fastq_size_mb),
+        runtime=sample_resource(config["resource_model"], "virulencefinder_kma", "runtime", fastq_size_mb),
+        **GROUP_RESOURCES,
+    threads: sample_resource(config["resource_model"], "virulencefinder_kma", "threads", fastq_size_mb)
+    shell:
+        """
+        rm -f {params.cache_hit}
+        if [ {params.use_cache} == True ] && python3 bin/result_cache.py fetch {params.cache} -o {output.output_dir}; then
+            touch {params.cache_hit}
+            exit 0
+        fi
+        virulencefinder_db={params.virulencefinder_db}
+        mkdir -p {output.output_dir} && KMA_THREADS={threads} python3 bin/virulencefinder/virulencefinder.py -i {input.r1} {input.r2} -o {output.output_dir} -p "$virulencefinder_db" -mp {params.kma} -x
+        if [ {params.use_cache} == True ]; then
+            python3 bin/result_cache.py store {params.cache} -o {output.output_dir}
+        fi
         """
@@ -0,0 +1,34 @@
+rule subsampleReads:
+    """Subsample the reads to subsample_depth before ResFinder and PointFinder (see bin/subsample_reads.py)"""
+    input:
+        r1=lambda wildcards: SAMPLES[wildcards.sample]["R1"],
+        r2=lambda wildcards: SAMPLES[wildcards.sample]["R2"],
+    output:
+        r1=temp(OUT + "/subsampled_reads/{sample}_R1.fastq.gz"),
+        r2=temp(OUT + "/subsampled_reads/{sample}_R2.fastq.gz"),
+        report=OUT + "/log/subsample_reads/{sample}.json",
+    benchmark:
+        OUT + "/log/benchmark/subsampleReads/{sample}.tsv"
+    group:
+        SAMPLE_GROUP
+    wildcard_constraints:
+        sample=sample_pattern(RESFINDER_READS_SAMPLES),
+    message:
+        "Subsampling the reads of a sample for ResFinder and PointFinder"
+    params:
+        depth=config["subsample_depth"],
+        seed=config.get("subsample_seed", 1),
+        # The length of the assembly is the genome size, the expected size of the species for samples without one
+        assembly=lambda wildcards: shlex.quote(SAMPLES[wildcards.sample].get("assembly") or ""),
+        genome_size_mb=lambda wildcards: config["expected_genome_size_mb"].get(
+            sample_species(wildcards.sample), config["expected_genome_size_mb"]["other"]
+        ),
+    resources:
+        mem_gb=sample_resource(config["resource_model"], "subsample_reads", "mem_gb", fastq_size_mb),
+        runtime=sample_resource(config["resource_model"], "subsample_reads", "runtime", fastq_size_mb),
+        **GROUP_RESOURCES,
+    threads: sample_resource(config["resource_model"], "subsample_reads", "threads", fastq_size_mb)
+    shell:
+        """
+        python3 bin/subsample_reads.py -1 {input.r1} -2 {input.r2} -o1 {output.r1} -o2 {output.r2} --depth {params.depth} --seed {params.seed} --assembly {params.assembly} --genome_size_mb {params.genome_size_mb} --report {output.report}
+        """
@@ -0,0 +1,66 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Reading and writing of the sample sheet and of the manifest of sample directories for the summaries.
+With tens of thousands of samples the yaml sample sheet is slow to parse with the python yaml loader, so JunoAmr
+also writes the sample sheet as json, and yaml sheets are read with the C loader of libyaml when it is available.
+The manifest lists the result directory of each sample per tool in a tsv file (columns tool and directory), so the
+directories do not have to be given on the command line of make_summary.py.
+"""
+
+import csv
+import json
+from pathlib import Path
+
+import yaml
+
+# The C loader is only there when pyyaml is built with libyaml
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+MANIFEST_COLUMNS = ["tool", "directory"]
+
+
+def load_sample_sheet(location):
+    """Samples with their properties from a yaml or json (.json) sample sheet"""
+    with open(location) as sample_sheet_file:
+        if Path(location).suffix == ".json":
+            return json.load(sample_sheet_file)
+        return yaml.load(sample_sheet_file, Loader=YAML_LOADER)
+
+
+def write_sample_sheet(samples, location):
+    """Write the samples as a json sample sheet"""
+    with open(location, "w") as sample_sheet_file:
+        json.dump(samples, sample_sheet_file, default=str)
+
+
+def sample_groups(samples, group_size):
+    """Group of every sample, the samples are put in groups of group_size in sorted order"""
+    return {
+        sample: f"samples{number // group_size + 1:04d}"
+        for number, sample in enumerate(sorted(samples))
+    }
+
+
+def write_manifest(sample_dirs, location):
+    """Write the result directories per tool, e.g. {"resfinder": [...], "virulencefinder": [...]}"""
+    with open(location, "w", newline="") as manifest_file:
+        writer = csv.writer(manifest_file, delimiter="\t", lineterminator="\n")
+        writer.writerow(MANIFEST_COLUMNS)
+        for tool, directories in sample_dirs.items():
+            writer.writerows([tool, str(directory)] for directory in directories)
+
+
+def read_manifest(location):
+    """Result directories per tool from a manifest, in the order of the manifest"""
+    sample_dirs = {}
+    with open(location, newline="") as manifest_file:
+        reader = csv.reader(manifest_file, delimiter="\t")
+        header = next(reader, None)
+        if header != MANIFEST_COLUMNS:
+            raise ValueError(
+                f"The manifest {location} should have the columns {', '.join(MANIFEST_COLUMNS)}, found {header}"
+            )
+        for tool, directory in reader:
+            sample_dirs.setdefault(tool, []).append(directory)
+    return sample_dirs
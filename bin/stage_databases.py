@@ -0,0 +1,154 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Copies a database from the shared db_dir to local scratch of the node once, so the jobs on the node
+read the local copy instead of all reading the same files on the network file system. The copy is made under a lock
+in a temporary directory (rsync when available), checked against a manifest of the files and renamed into place.
+The name of the copy contains a hash of the version of the database (the installed file of bin/downloads.py, or the
+size and modification time of every file), so a new version is staged again and stale copies are removed. juno_amr.py
+computes the versions once per run (database_versions in the config) and the rules pass them with --version, so the
+jobs do not read the metadata of the files of the shared database.
+Prints the path of the local copy, for use in the shell command of a rule.
+Example: resfinder_db=$(python3 bin/stage_databases.py --staging_dir /scratch --version 3f0c... /mnt/db/juno-amr/resfinder_db)
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Directory in the staging directory with the local copies
+STAGING_FOLDER = "juno_amr_databases"
+MANIFEST_FILE = ".juno_amr_staged.json"
+# Installed file written by bin/downloads.py
+INSTALLED_FILE = ".juno_amr_installed.json"
+# Copies of an older version of a database that were not used for this long are removed
+STALE_HOURS = 24
+
+
+def file_list(database):
+    """Relative path and size of every file in the database"""
+    files = []
+    for root, dirnames, filenames in os.walk(database):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            location = Path(root, filename)
+            files.append([str(location.relative_to(database)), location.stat().st_size])
+    return files
+
+
+def database_version(database):
+    """Hash of the version of a database. The installed file of bin/downloads.py is enough when it is there,
+    otherwise the size and modification time of every file are used."""
+    database = Path(database)
+    installed_file = database.joinpath(INSTALLED_FILE)
+    if installed_file.is_file():
+        stat = installed_file.stat()
+        description = [installed_file.read_text(), stat.st_mtime_ns]
+    else:
+        description = []
+        for root, dirnames, filenames in os.walk(database):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                stat = Path(root, filename).stat()
+                description.append([os.path.join(root, filename), stat.st_size, stat.st_mtime_ns])
+    return hashlib.sha256(json.dumps([str(database.resolve()), description]).encode()).hexdigest()[:16]
+
+
+@contextmanager
+def file_lock(location):
+    with open(location, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def copy_database(source, destination):
+    if shutil.which("rsync"):
+        subprocess.run(["rsync", "-a", f"{source}/", f"{destination}/"], check=True)
+    else:
+        shutil.copytree(source, destination, symlinks=True)
+
+
+def verify(staged, manifest):
+    """The local copy has every file of the manifest with the same size"""
+    for relative_path, size in manifest["files"]:
+        location = staged.joinpath(relative_path)
+        if not location.is_file() or location.stat().st_size != size:
+            return False
+    return True
+
+
+def remove_stale_copies(staging_dir, name, current):
+    for copy in staging_dir.glob(f"{name}.*"):
+        if copy == current or not copy.is_dir() or copy.name.endswith(".lock"):
+            continue
+        manifest = copy.joinpath(MANIFEST_FILE)
+        # Copies that are being made (no manifest yet) or were used recently can still be in use by other jobs
+        last_use = manifest.stat().st_mtime if manifest.is_file() else time.time()
+        if time.time() - last_use > STALE_HOURS * 3600:
+            shutil.rmtree(copy, ignore_errors=True)
+
+
+def stage_database(database, staging_dir, version=None):
+    """Path of the local copy of the database, it is made if it is not there or the database changed. The version
+    (see database_version) is computed when it is not given."""
+    database = Path(database)
+    staging_dir = Path(staging_dir, STAGING_FOLDER)
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    staged = staging_dir.joinpath(f"{database.name}.{version or database_version(database)}")
+    manifest_file = staged.joinpath(MANIFEST_FILE)
+    if not manifest_file.is_file():
+        with file_lock(staging_dir.joinpath(f"{database.name}.lock")):
+            # Another job may have staged it while this one waited for the lock
+            if not manifest_file.is_file():
+                manifest = {"source": str(database), "staged": time.time(), "files": file_list(database)}
+                tmp_dir = staging_dir.joinpath(f".{staged.name}.tmp.{os.getpid()}")
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                try:
+                    copy_database(database, tmp_dir)
+                    if not verify(tmp_dir, manifest):
+                        raise RuntimeError(f"Copy of {database} in {tmp_dir} does not match the database")
+                    with open(tmp_dir.joinpath(MANIFEST_FILE), "w") as opened_file:
+                        json.dump(manifest, opened_file)
+                    shutil.rmtree(staged, ignore_errors=True)
+                    os.rename(tmp_dir, staged)
+                finally:
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+            remove_stale_copies(staging_dir, database.name, staged)
+    # The modification time of the manifest is the last use of the copy
+    os.utime(manifest_file)
+    return staged
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    argument_parser.add_argument("database", type=Path)
+    argument_parser.add_argument(
+        "--staging_dir",
+        type=Path,
+        default=os.environ.get("TMPDIR", "/tmp"),
+        help="Local directory for the copies, default is $TMPDIR",
+    )
+    argument_parser.add_argument(
+        "--version",
+        default=None,
+        help="Version of the database as computed by database_version, computed from the database when not given",
+    )
+    args = argument_parser.parse_args()
+    print(stage_database(args.database, args.staging_dir, args.version))
+
+
+if __name__ == "__main__":
+    main()
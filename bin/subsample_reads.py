@@ -0,0 +1,155 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Subsamples the paired reads of a sample to a maximum depth before ResFinder and PointFinder, whose
+runtime grows with the number of reads while about 60x is enough to find the genes. The depth is estimated while
+the reads are streamed: the first reads give the bases per read pair and the compressed bytes per read pair, which
+with the size of the fastq file give the number of read pairs. The genome size is the length of the assembly, or
+the expected genome size of the species. Read pairs are kept with a seeded random generator, so the subsample (and
+the gzip output, written without a name and timestamp) is the same in every run. The reads of samples below the depth
+are copied, compressed when the output ends with .gz like the subsamples, so an output never links to the input.
+Example: python3 bin/subsample_reads.py -1 R1.fastq.gz -2 R2.fastq.gz -o1 sub_R1.fastq.gz -o2 sub_R2.fastq.gz \
+             --depth 60 --assembly sample.fasta
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import os
+import random
+import shutil
+from pathlib import Path
+
+# Read pairs used to estimate the bases and compressed bytes per read pair
+ESTIMATE_PAIRS = 20000
+# Fast compression, the subsample is a temporary file that is read once
+COMPRESS_LEVEL = 1
+
+
+def open_text(location):
+    location = str(location)
+    return gzip.open(location, "rt") if location.endswith(".gz") else open(location)
+
+
+def assembly_length(location):
+    """Number of bases in the contigs of an assembly"""
+    with open_text(location) as fasta:
+        return sum(len(line.strip()) for line in fasta if not line.startswith(">"))
+
+
+def open_fastq(raw_fastq, location):
+    """Binary file object with the lines of a fastq file, raw_fastq is the (compressed) file that is read"""
+    return gzip.open(raw_fastq) if str(location).endswith(".gz") else raw_fastq
+
+
+def open_output(raw_output, location):
+    """Binary file object for the lines of a fastq file, gzip compressed (reproducibly) when location ends with .gz"""
+    if str(location).endswith(".gz"):
+        return gzip.GzipFile(filename="", fileobj=raw_output, mode="wb", compresslevel=COMPRESS_LEVEL, mtime=0)
+    return raw_output
+
+
+def copy_reads(source, destination):
+    """Copies a fastq file, it is compressed or decompressed when only one of the two names ends with .gz"""
+    if str(source).endswith(".gz") == str(destination).endswith(".gz"):
+        shutil.copyfile(source, destination)
+        return
+    with open(source, "rb") as raw_source, open_fastq(raw_source, source) as fastq, open(
+        destination, "wb"
+    ) as raw_destination, open_output(raw_destination, destination) as output_fastq:
+        shutil.copyfileobj(fastq, output_fastq)
+
+
+def fastq_records(fastq):
+    """Records of 4 lines of a fastq file opened in binary mode"""
+    lines = iter(fastq)
+    return zip(lines, lines, lines, lines)
+
+
+def subsample_reads(r1, r2, output_r1, output_r2, depth, genome_size, seed=1):
+    """Writes the read pairs of r1 and r2 subsampled to about depth times genome_size bases to output_r1 and
+    output_r2, returns a report with the estimated depth and the fraction of the read pairs that was kept"""
+    with open(r1, "rb") as raw_r1, open(r2, "rb") as raw_r2, open_fastq(raw_r1, r1) as fastq_r1, open_fastq(
+        raw_r2, r2
+    ) as fastq_r2:
+        pairs = zip(fastq_records(fastq_r1), fastq_records(fastq_r2))
+        first_pairs = list(itertools.islice(pairs, ESTIMATE_PAIRS))
+        bases = sum(len(record_1[1]) + len(record_2[1]) - 2 for record_1, record_2 in first_pairs)
+        if len(first_pairs) < ESTIMATE_PAIRS:
+            estimated_pairs = len(first_pairs)
+        else:
+            # The compressed bytes read so far include a read ahead buffer, which is small against the first pairs
+            estimated_pairs = round(len(first_pairs) * os.path.getsize(r1) / max(raw_r1.tell(), 1))
+        bases_per_pair = bases / max(len(first_pairs), 1)
+        estimated_depth = estimated_pairs * bases_per_pair / genome_size
+        fraction = min(1.0, depth / estimated_depth) if estimated_depth else 1.0
+        report = {
+            "estimated_read_pairs": estimated_pairs,
+            "estimated_depth": round(estimated_depth, 1),
+            "genome_size": genome_size,
+            "target_depth": depth,
+            "fraction": round(fraction, 4),
+            "seed": seed,
+        }
+        if fraction >= 1.0:
+            # Not deep enough to subsample, ResFinder gets a copy of all reads
+            for source, destination in [(r1, output_r1), (r2, output_r2)]:
+                Path(destination).unlink(missing_ok=True)
+                copy_reads(source, destination)
+            report["kept_read_pairs"] = None
+            return report
+
+        generator = random.Random(seed)
+        kept = 0
+        with open(output_r1, "wb") as raw_output_r1, open(output_r2, "wb") as raw_output_r2, open_output(
+            raw_output_r1, output_r1
+        ) as output_fastq_r1, open_output(raw_output_r2, output_r2) as output_fastq_r2:
+            for record_1, record_2 in itertools.chain(first_pairs, pairs):
+                if generator.random() < fraction:
+                    output_fastq_r1.write(b"".join(record_1))
+                    output_fastq_r2.write(b"".join(record_2))
+                    kept += 1
+        report["kept_read_pairs"] = kept
+    return report
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    argument_parser.add_argument("-1", "--r1", type=Path, required=True, help="Fastq file (.gz) with the R1 reads")
+    argument_parser.add_argument("-2", "--r2", type=Path, required=True, help="Fastq file (.gz) with the R2 reads")
+    argument_parser.add_argument("-o1", "--output_r1", type=Path, required=True)
+    argument_parser.add_argument("-o2", "--output_r2", type=Path, required=True)
+    argument_parser.add_argument("--depth", type=float, required=True, help="Maximum depth of the subsample")
+    argument_parser.add_argument("--assembly", type=Path, default=None, help="Assembly that gives the genome size")
+    argument_parser.add_argument(
+        "--genome_size_mb",
+        type=float,
+        default=None,
+        help="Expected genome size in Mb, used when there is no assembly",
+    )
+    argument_parser.add_argument("--seed", type=int, default=1)
+    argument_parser.add_argument("--report", type=Path, default=None, help="Json file for the report")
+    args = argument_parser.parse_args()
+
+    if args.assembly is not None and args.assembly.is_file():
+        genome_size = assembly_length(args.assembly)
+    elif args.genome_size_mb:
+        genome_size = round(args.genome_size_mb * 1e6)
+    else:
+        argument_parser.error("an assembly (--assembly) or the expected genome size (--genome_size_mb) is needed")
+    report = subsample_reads(
+        args.r1, args.r2, args.output_r1, args.output_r2, args.depth, genome_size, args.seed
+    )
+    print(json.dumps(report))
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
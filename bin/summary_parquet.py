@@ -0,0 +1,91 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Writes a Parquet copy of a summary csv file. Text columns are dictionary encoded and the
+numeric columns get real number types, so the summaries of many runs can be loaded quickly.
+"""
+
+import csv
+from pathlib import Path
+
+# Number of rows per record batch, the csv file is converted in batches so memory use stays low
+BATCH_SIZE = 65536
+
+# Numeric columns per summary, all other columns are dictionary encoded text
+FLOAT_COLUMNS = {
+    "genes": ["Identity", "Coverage"],
+    "virulencefinder": ["Identity"],
+    "amrfinderplus": [
+        "% Coverage of reference sequence",
+        "% Identity to reference sequence",
+    ],
+}
+# In the phenotype summary every column except the sample name is the match (0-3) of an antimicrobial
+INTEGER_SUMMARIES = ["phenotype"]
+
+
+def parquet_location(csv_location):
+    return str(Path(csv_location).with_suffix(".parquet"))
+
+
+def column_type(pa, summary, column):
+    if column in FLOAT_COLUMNS.get(summary, []):
+        return pa.float64()
+    if summary in INTEGER_SUMMARIES and column != "Samplename":
+        return pa.int8()
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+def column_array(pa, values, data_type):
+    """Arrow array of the csv values of one column, empty numeric values become null"""
+    if pa.types.is_floating(data_type):
+        return pa.array([float(value) if value else None for value in values], type=data_type)
+    if pa.types.is_integer(data_type):
+        # Columns with an empty value are written as floats by pandas (1.0)
+        return pa.array([int(float(value)) if value else None for value in values], type=data_type)
+    return pa.array(values, type=pa.string()).dictionary_encode()
+
+
+def write_summary_parquet(csv_location, summary):
+    """Convert a summary csv file to Parquet next to it. Comment rows before the header (the informational
+    header of the phenotype summary) are skipped."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "pyarrow is needed to write the summaries as Parquet, it is part of envs/juno_amr.yaml"
+        )
+
+    with open(csv_location, "r", newline="") as csvfile:
+        reader = csv.reader(csvfile)
+        for header in reader:
+            if header and not header[0].startswith("#"):
+                break
+        else:
+            raise ValueError(f"No header found in {csv_location}")
+
+        schema = pa.schema(
+            [(column, column_type(pa, summary, column)) for column in header]
+        )
+        with pq.ParquetWriter(parquet_location(csv_location), schema) as writer:
+            batch = []
+            for row in reader:
+                batch.append(row)
+                if len(batch) == BATCH_SIZE:
+                    writer.write_batch(make_batch(pa, schema, batch))
+                    batch = []
+            if batch:
+                writer.write_batch(make_batch(pa, schema, batch))
+
+
+def make_batch(pa, schema, rows):
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    return pa.record_batch(
+        [
+            column_array(pa, values, field.type)
+            for values, field in zip(columns, schema)
+        ],
+        schema=schema,
+    )
@@ -0,0 +1,82 @@
+"""
+Juno-amr
+Organization: Rijksinstituut voor Volksgezondheid en Milieu (RIVM)
+Department: Infektieziekteonderzoek, Diagnostiek en Laboratorium Surveillance (IDS), Bacteriologie (BPD)
+Documentation: Timing of the phases of make_summary.py (config load, parse, transform, write) with the number
+of files and rows in each phase, written as json to find out where the time of a slow summary step goes.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Number of slowest samples per result file in the report
+SLOWEST_SAMPLES = 10
+
+
+def timed(function, *args):
+    """Returns the time in seconds a function call took and its result"""
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+class SummaryProfile:
+    """Collects the time of each phase of the summary step. Phases with the same name and details (for example
+    the transform of one summary in streaming mode, which happens once per sample) are added together."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.parse_times = {}
+
+    @contextmanager
+    def phase(self, name, **details):
+        """Time the code in the with block, counts can be added to the yielded dict (files, rows)"""
+        counts = {}
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.add(name, time.perf_counter() - start, details, **counts)
+
+    def add(self, name, seconds, details=None, files=0, rows=0):
+        key = (name, tuple(sorted((details or {}).items())))
+        entry = self.phases.setdefault(
+            key, {"phase": name, **(details or {}), "seconds": 0.0, "files": 0, "rows": 0}
+        )
+        entry["seconds"] += seconds
+        entry["files"] += files
+        entry["rows"] += rows
+
+    def add_parse_time(self, result_file, samplename, seconds):
+        """Parse time of one result file of one sample, as measured in the (worker) process that parsed it"""
+        self.parse_times.setdefault(result_file, []).append((seconds, samplename))
+
+    def report(self, **details):
+        parse_times = {}
+        for result_file, times in self.parse_times.items():
+            slowest = sorted(times, reverse=True)[:SLOWEST_SAMPLES]
+            parse_times[result_file] = {
+                "samples": len(times),
+                "seconds": round(sum(seconds for seconds, samplename in times), 4),
+                "slowest_samples": [
+                    {"sample": samplename, "seconds": round(seconds, 4)}
+                    for seconds, samplename in slowest
+                ],
+            }
+        phases = []
+        for entry in self.phases.values():
+            phases.append({**entry, "seconds": round(entry["seconds"], 4)})
+        return {
+            **details,
+            "total_seconds": round(time.perf_counter() - self.start, 4),
+            "phases": phases,
+            "parse_per_sample": parse_times,
+        }
+
+    def write(self, location, **details):
+        Path(location).parent.mkdir(parents=True, exist_ok=True)
+        with open(location, "w") as profile_file:
+            json.dump(self.report(**details), profile_file, indent=2)
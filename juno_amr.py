@@ -9,15 +9,21 @@ Documentation: -
 
 # Dependencies
 import argparse
-import subprocess
 import yaml
+from collections import Counter
 from dataclasses import dataclass, field
 from version import __package_name__, __version__, __description__
 from pathlib import Path
 from juno_library import Pipeline
 
 # own scripts
+import bin.amrfinderplus_batch
 import bin.downloads
+import bin.output_cleanup
+import bin.performance_report
+import bin.resource_model
+import bin.sample_sheet
+import bin.stage_databases
 
 
 def main() -> None:
@@ -65,7 +71,7 @@ class JunoAmr(Pipeline):
             type=str.lower,
             required=True,
             metavar="STR",
-            help=f"Full scientific name of the species sample, use underscores not spaces. If the species that you are looking for is not available choose 'other'. Options:{self.species}",
+            help=f"Full scientific name of the species sample, use underscores not spaces. If the species that you are looking for is not available choose 'other'. Samples with a 'full_species_name' in the metadata file (-m) are analysed as that species, so one run can contain several species. Options:{self.species}",
             choices=self.species,
         )
         self.add_argument(
@@ -113,6 +119,119 @@ class JunoAmr(Pipeline):
             metavar="BOOL",
             help="Type one to run pointfinder, type False to not run pointfinder, default is True.",
         )
+        self.add_argument(
+            "--database_bundle",
+            type=Path,
+            metavar="FILE",
+            default=None,
+            help="Bundle (tar.gz) made with 'python3 bin/downloads.py --export' to install the software and databases from, instead of downloading and indexing them. Components that are already installed in --db_dir are kept.",
+        )
+        self.add_argument(
+            "--database_staging",
+            type=str,
+            metavar="DIR",
+            default=None,
+            help="Copy the databases once per node to this node local directory before the tools use them, or 'tmpdir' for the $TMPDIR of the jobs (on LSF a directory per job, so the databases are copied for every job). A copy is made again when the database changes. Default is to read the databases from --db_dir.",
+        )
+        self.add_argument(
+            "--resfinder_input",
+            type=str.lower,
+            choices=["reads", "assembly", "auto"],
+            default="reads",
+            help="Run ResFinder and PointFinder on the reads, on the assembly (much faster for large read sets) or choose per sample with auto: samples with more than --resfinder_auto_reads_mb MB of fastq use the assembly. Default is reads.",
+        )
+        self.add_argument(
+            "--resfinder_auto_reads_mb",
+            type=float,
+            metavar="NUM",
+            default=1000,
+            help="Size of the fastq files (MB) above which --resfinder_input auto uses the assembly. Default is 1000.",
+        )
+        self.add_argument(
+            "--subsample_depth",
+            type=float,
+            metavar="NUM",
+            default=None,
+            help="Subsample the reads of ResFinder and PointFinder to this depth first, for example 60. The depth is estimated from the reads and the length of the assembly (or the expected genome size of the species). Default is to use all reads.",
+        )
+        self.add_argument(
+            "--subsample_seed",
+            type=int,
+            metavar="INT",
+            default=1,
+            help="Seed of the subsampling of the reads, the same seed gives the same subsample. Default is 1.",
+        )
+        self.add_argument(
+            "--virulencefinder_method",
+            type=str.lower,
+            choices=["blast", "kma"],
+            default="blast",
+            help="Run VirulenceFinder with BLAST on the assembly (default) or with KMA on the reads, which uses the threads of the job. Samples without reads use BLAST.",
+        )
+        self.add_argument(
+            "--amrfinderplus_batch_size",
+            type=int,
+            metavar="INT",
+            default=1,
+            help="Number of assemblies that are analysed by one AMRFinderPlus job, the database is loaded once for all of them. Default is 1 (one job per sample).",
+        )
+        self.add_argument(
+            "--sample_group_size",
+            type=int,
+            metavar="INT",
+            default=1,
+            help="Number of samples whose ResFinder, AMRFinderPlus and VirulenceFinder jobs are submitted to the cluster as one job, they run side by side within --sample_group_threads and --sample_group_mem_gb. Default is 1 (every job is submitted separately).",
+        )
+        self.add_argument(
+            "--sample_group_threads",
+            type=int,
+            metavar="INT",
+            default=None,
+            help="Threads of a cluster job of --sample_group_size samples, the jobs of the samples that do not fit run after each other. Default is the sum of the threads of the jobs.",
+        )
+        self.add_argument(
+            "--sample_group_mem_gb",
+            type=int,
+            metavar="INT",
+            default=None,
+            help="Memory (GB) of a cluster job of --sample_group_size samples, the jobs of the samples that do not fit run after each other. Default is the sum of the memory of the jobs.",
+        )
+        self.add_argument(
+            "--kma_shared_memory",
+            action="store_true",
+            help="Load the KMA indexes of ResFinder and PointFinder into shared memory once, so ResFinder jobs that run side by side on one node share them. Only for runs on a single node, it is ignored with --cluster.",
+        )
+        self.add_argument(
+            "--result_cache",
+            type=Path,
+            metavar="DIR",
+            default=None,
+            help="Directory to cache the results of ResFinder, AMRFinderPlus and VirulenceFinder across runs. Samples with the same input files, software, databases and parameters as an earlier run are taken from the cache instead of analysed again. Default is no cache.",
+        )
+        self.add_argument(
+            "--result_cache_max_gb",
+            type=float,
+            metavar="NUM",
+            default=100,
+            help="Maximum size of the result cache in GB, the least recently used results are removed first. Default is 100.",
+        )
+        self.add_argument(
+            "--presence_matrix",
+            type=Path,
+            metavar="DIR",
+            default=None,
+            help="Directory of a presence matrix of the genes and mutations of the samples of earlier runs, the samples of this run are added to it (it is made when it does not exist). Query it with bin/presence_matrix.py. Every run also writes the matrix of its own samples to summary/presence_matrix.",
+        )
+        self.add_argument(
+            "--summary_parquet",
+            action="store_true",
+            help="Also write every summary as a Parquet file next to the csv file.",
+        )
+        self.add_argument(
+            "--summary_cprofile",
+            action="store_true",
+            help="Profile the summary step with cProfile, the statistics are written to the audit trail.",
+        )
 
     def _parse_args(self) -> argparse.Namespace:
         args = super()._parse_args()
@@ -129,6 +248,27 @@ class JunoAmr(Pipeline):
         self.run_pointfinder: int = args.run_pointfinder
         self.species = args.species
         self.metadata_file: Path = args.metadata_file
+        self.database_bundle: Path | None = args.database_bundle
+        self.database_staging: str | None = args.database_staging
+        self.resfinder_input: str = args.resfinder_input
+        self.resfinder_auto_reads_mb: float = args.resfinder_auto_reads_mb
+        self.subsample_depth: float | None = args.subsample_depth
+        self.subsample_seed: int = args.subsample_seed
+        self.virulencefinder_method: str = args.virulencefinder_method
+        self.amrfinderplus_batch_size: int = max(1, args.amrfinderplus_batch_size)
+        self.sample_group_size: int = max(1, args.sample_group_size)
+        self.sample_group_threads: int | None = args.sample_group_threads
+        self.sample_group_mem_gb: int | None = args.sample_group_mem_gb
+        self.kma_shared_memory: bool = args.kma_shared_memory
+        self.result_cache: Path | None = (
+            args.result_cache.resolve() if args.result_cache else None
+        )
+        self.result_cache_max_gb: float = args.result_cache_max_gb
+        self.presence_matrix: Path | None = (
+            args.presence_matrix.resolve() if args.presence_matrix else None
+        )
+        self.summary_parquet: bool = args.summary_parquet
+        self.summary_cprofile: bool = args.summary_cprofile
         # self.update_dbs: bool = args.update
         return args
 
@@ -144,10 +284,48 @@ class JunoAmr(Pipeline):
                 ]
             )
 
-        # Check species to decide wether or not to run pointfinder
-        if self.species == "other":
-            self.run_pointfinder = False
+        # The KMA indexes are only loaded into the shared memory of the node that runs snakemake, cluster jobs on
+        # other nodes would not find them
+        if self.kma_shared_memory and self.snakemake_args.get("cluster"):
+            print(
+                "\x1b[0;33m --kma_shared_memory is ignored for runs on a cluster, it only works on a single node\n\033[0;0m"
+            )
+            self.kma_shared_memory = False
+
+        # The tool jobs of the samples in a group are one cluster job (see sample_group in the Snakefile). Snakemake
+        # runs the jobs of a group side by side as far as the threads and memory of the group allow.
+        if self.sample_group_size > 1 and self.snakemake_args.get("cluster"):
+            groups = Counter(
+                bin.sample_sheet.sample_groups(
+                    self.sample_dict, self.sample_group_size
+                ).values()
+            )
+            # Jobs of a group that depend on each other are one component: ResFinder with the subsampling of its reads
+            # and VirulenceFinder (blast or KMA) are one each, AMRFinderPlus is one unless it runs in batches, which
+            # are not grouped
+            components_per_sample = 2 if self.amrfinderplus_batch_size > 1 else 3
+            self.snakemake_args["group_components"] = {
+                group: components_per_sample * samples for group, samples in groups.items()
+            }
+            # Local resources limit each group job, not all jobs together
+            resource_scopes = {}
+            group_resources = {}
+            if self.sample_group_threads:
+                # The threads of every grouped job are also its group_threads resource (see group_threads in the
+                # Snakefile), --cores stays the limit of the whole run
+                group_resources["group_threads"] = self.sample_group_threads
+                resource_scopes["group_threads"] = "local"
+            if self.sample_group_mem_gb:
+                group_resources["mem_gb"] = self.sample_group_mem_gb
+                resource_scopes["mem_gb"] = "local"
+            if group_resources:
+                self.snakemake_args["resources"] = {
+                    **(self.snakemake_args.get("resources") or {}),
+                    **group_resources,
+                }
+                self.snakemake_args["overwrite_resource_scopes"] = resource_scopes
 
+        # Whether pointfinder is run is decided per sample, it is not run for samples with species 'other'
         self.user_parameters = {
             "input_dir": str(self.input_dir),
             "out": str(self.output_dir),
@@ -157,6 +335,8 @@ class JunoAmr(Pipeline):
             "resfinder_min_coverage": self.resfinder_min_coverage,
             "resfinder_identity_threshold": self.resfinder_identity_threshold,
             "run_pointfinder": self.run_pointfinder,
+            "resfinder_input": self.resfinder_input,
+            "resfinder_auto_reads_mb": self.resfinder_auto_reads_mb,
             # "update": self.update,
             "run_in_container": self.snakemake_args["use_singularity"],
             "db_dir": str(self.db_dir),
@@ -165,6 +345,23 @@ class JunoAmr(Pipeline):
                 self.db_dir.joinpath("pointfinder_2_4_0/pointfinder_db")
             ),
             "virulencefinder_db": str(self.db_dir.joinpath("virulencefinderdb")),
+            "amrfinderplus_db": str(
+                self.db_dir.joinpath("amrfinderplusdb", "2022-12-19.1")
+            ),
+            "subsample_depth": self.subsample_depth,
+            "subsample_seed": self.subsample_seed,
+            "virulencefinder_method": self.virulencefinder_method,
+            "amrfinderplus_batch_size": self.amrfinderplus_batch_size,
+            "database_staging": self.database_staging,
+            "sample_group_size": self.sample_group_size,
+            "kma_shared_memory": self.kma_shared_memory,
+            "result_cache": str(self.result_cache) if self.result_cache else None,
+            "result_cache_max_gb": self.result_cache_max_gb,
+            "presence_matrix": (
+                str(self.presence_matrix) if self.presence_matrix else None
+            ),
+            "summary_parquet": self.summary_parquet,
+            "summary_cprofile": self.summary_cprofile,
         }
         with open(
             Path(__file__).parent.joinpath("config/pipeline_parameters.yaml")
@@ -178,13 +375,23 @@ class JunoAmr(Pipeline):
             filepath=self.metadata_file,
             expected_colnames=["sample", "full_species_name"],
         )
+        accepted_species = get_species()
         for sample, properties in self.sample_dict.items():
             try:
-                properties["species"] = (
-                    self.juno_metadata[sample]["full_species_name"].strip().lower()
+                species = (
+                    self.juno_metadata[sample]["full_species_name"]
+                    .strip()
+                    .lower()
+                    .replace(" ", "_")
                 )
             except (KeyError, TypeError, AttributeError):
-                properties["species"] = self.genus  # type: ignore
+                species = self.species
+            # Species that are not in the PointFinder database are analysed as 'other', a species
+            # is also accepted when only the genus is in the database (klebsiella_pneumoniae -> klebsiella)
+            if species not in accepted_species:
+                genus = species.split("_")[0]
+                species = genus if genus in accepted_species else "other"
+            properties["species"] = species
         print(self.sample_dict)
 
     def run(self) -> None:
@@ -196,42 +403,87 @@ class JunoAmr(Pipeline):
                 # update_dbs=self.update_dbs,
                 software_resfinder_asked_version="4.6.0",
                 software_virulence_finder_asked_version="2.0.4",
+                bundle=self.database_bundle,
             )
             self.downloads_versions = downloads_juno_amr.downloaded_versions
             with open(
                 self.path_to_audit.joinpath("database_versions.yaml"), "w"
             ) as file_:
                 yaml.dump(self.downloads_versions, file_, default_flow_style=False)
+            # The versions are part of the key of the result cache
+            self.user_parameters["software_versions"] = self.downloads_versions
+            # The Snakefile loads the json copy of the sample sheet, yaml is slow to parse for large runs
+            sample_sheet_json = self.path_to_audit.joinpath("sample_sheet.json")
+            bin.sample_sheet.write_sample_sheet(self.sample_dict, sample_sheet_json)
+            self.user_parameters["sample_sheet_json"] = str(sample_sheet_json)
+            # The benchmarks of the AMRFinderPlus batches are named after the batch, calibrate_resources.py
+            # finds their samples in this file
+            if self.amrfinderplus_batch_size > 1:
+                with open(
+                    self.path_to_audit.joinpath("amrfinderplus_batches.yaml"), "w"
+                ) as file_:
+                    yaml.dump(
+                        bin.amrfinderplus_batch.make_batches(
+                            self.sample_dict, self.amrfinderplus_batch_size
+                        ),
+                        file_,
+                        default_flow_style=False,
+                    )
 
-        if not self.dryrun or self.unlock:
-            subprocess.run(
-                [
-                    "find",
-                    self.output_dir,
-                    "-type",
-                    "f",
-                    "-empty",
-                    "-exec",
-                    "rm",
-                    "{}",
-                    ";",
-                ]
-            )
-            subprocess.run(
-                [
-                    "find",
-                    self.output_dir,
-                    "-type",
-                    "d",
-                    "-empty",
-                    "-exec",
-                    "rm",
-                    "-rf",
-                    "{}",
-                    ";",
+        if self.database_staging:
+            # The jobs stage the databases by these versions, so only this process reads the files of every database
+            self.user_parameters["database_versions"] = {
+                self.user_parameters[name]: bin.stage_databases.database_version(
+                    self.user_parameters[name]
+                )
+                for name in [
+                    "resfinder_db",
+                    "pointfinder_db",
+                    "virulencefinder_db",
+                    "amrfinderplus_db",
                 ]
-            )
+            }
+
+        if not self.dryrun or self.unlock:
+            self.clean_outputs()
         super().run()
+        if not self.dryrun:
+            self.write_performance_report()
+
+    def clean_outputs(self) -> None:
+        """Removes empty files and directories from the outputs of the rules, so snakemake runs them again"""
+        report = bin.output_cleanup.clean_outputs(
+            bin.output_cleanup.rule_output_locations(self.output_dir, self.sample_dict)
+        )
+        print(
+            f"Removed {len(report['removed_files'])} empty files and {len(report['removed_directories'])} "
+            f"empty directories from {report['locations']} output locations in {report['seconds']} s"
+        )
+        with open(self.path_to_audit.joinpath("output_cleanup.yaml"), "w") as file_:
+            yaml.dump(report, file_, default_flow_style=False)
+
+    def write_performance_report(self) -> None:
+        """Aggregates the benchmarks of the rules in the audit trail, next to the database versions"""
+        benchmark_dir = self.output_dir.joinpath("log", "benchmark")
+        if not benchmark_dir.is_dir():
+            return
+        # Benchmarks of a batch rule are named after the batch, not after a sample
+        batches = bin.amrfinderplus_batch.make_batches(
+            self.sample_dict, self.amrfinderplus_batch_size
+        )
+        bin.performance_report.write_performance_report(
+            benchmark_dir,
+            self.path_to_audit.joinpath("performance_report.yaml"),
+            lambda rule, sample: bin.resource_model.requested_threads(
+                self.snakemake_config,
+                rule,
+                [
+                    self.sample_dict[name]
+                    for name in batches.get(sample, [sample])
+                    if name in self.sample_dict
+                ],
+            ),
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The modules in bin import each other as scripts, like the rules and the benchmarks use them
+sys.path.insert(0, str(Path(__file__).parent.parent.joinpath("bin")))
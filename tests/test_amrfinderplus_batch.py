@@ -0,0 +1,67 @@
+import pytest
+
+from amrfinderplus_batch import RESULT_FILE, combine_assemblies, make_batches, split_results
+
+HEADER = "Protein identifier\tContig id\tStart\tStop\tGene symbol\n"
+
+
+@pytest.fixture
+def assemblies(tmp_path):
+    locations = []
+    # The same contig id in two samples, and an assembly without a newline at the end
+    for sample, content in [
+        ("s1", ">contig_1 length=8\nACGTACGT\n>contig_2\nGGCC\n"),
+        ("s2", ">contig_1\nTTTT"),
+        ("s3", ">NODE_1\nAAAA\n"),
+    ]:
+        location = tmp_path.joinpath(f"{sample}.fasta")
+        location.write_text(content)
+        locations.append(location)
+    return locations
+
+
+def test_make_batches():
+    batches = make_batches(["s3", "s1", "s5", "s2", "s4"], 2)
+    assert batches == {"batch0001": ["s1", "s2"], "batch0002": ["s3", "s4"], "batch0003": ["s5"]}
+    assert make_batches({"s2": {}, "s1": {}}, 5) == {"batch0001": ["s1", "s2"]}
+
+
+def test_combine_assemblies(tmp_path, assemblies):
+    combined = tmp_path.joinpath("combined.fasta")
+    combine_assemblies(assemblies, combined)
+    assert combined.read_text() == (
+        ">juno0_contig_1 length=8\nACGTACGT\n>juno0_contig_2\nGGCC\n"
+        ">juno1_contig_1\nTTTT\n"
+        ">juno2_NODE_1\nAAAA\n"
+    )
+
+
+def test_split_results_round_trip(tmp_path, assemblies):
+    combined = tmp_path.joinpath("combined.fasta")
+    combine_assemblies(assemblies, combined)
+    # amrfinder reports the contig ids of the combined fasta file
+    contig_ids = [line[1:].split()[0] for line in combined.read_text().splitlines() if line.startswith(">")]
+    assert contig_ids == ["juno0_contig_1", "juno0_contig_2", "juno1_contig_1", "juno2_NODE_1"]
+    result = tmp_path.joinpath(RESULT_FILE)
+    result.write_text(
+        HEADER
+        + "NA\tjuno0_contig_2\t1\t4\tsul1\n"
+        + "NA\tjuno1_contig_1\t1\t4\tblaTEM-1\n"
+        + "NA\tjuno0_contig_1\t1\t8\ttet(A)\n"
+    )
+    output_dirs = [tmp_path.joinpath("output", sample) for sample in ["s1", "s2", "s3"]]
+    split_results(result, output_dirs)
+
+    assert output_dirs[0].joinpath(RESULT_FILE).read_text() == (
+        HEADER + "NA\tcontig_2\t1\t4\tsul1\n" + "NA\tcontig_1\t1\t8\ttet(A)\n"
+    )
+    assert output_dirs[1].joinpath(RESULT_FILE).read_text() == HEADER + "NA\tcontig_1\t1\t4\tblaTEM-1\n"
+    # A sample without hits gets only the header
+    assert output_dirs[2].joinpath(RESULT_FILE).read_text() == HEADER
+
+
+def test_split_results_of_another_contig(tmp_path):
+    result = tmp_path.joinpath(RESULT_FILE)
+    result.write_text(HEADER + "NA\tcontig_1\t1\t4\tsul1\n")
+    with pytest.raises(ValueError):
+        split_results(result, [tmp_path.joinpath("s1")])
@@ -0,0 +1,98 @@
+import pytest
+import yaml
+
+from calibrate_resources import BATCHES_FILE, calibrate, collect_measurements, fit_line
+from performance_report import CACHE_HIT_SUFFIX
+
+BENCHMARK_HEADER = "s\th:m:s\tmax_rss\tmax_vms\tmax_uss\tmax_pss\tio_in\tio_out\tmean_load\tcpu_time\n"
+RESOURCE_MODEL = {
+    "amrfinderplus": {
+        "threads": {"intercept": 1, "per_mb": 0.4, "min": 1, "max": 4},
+        "mem_gb": {"intercept": 2, "per_mb": 0.5, "min": 2, "max": 16},
+        "runtime": {"intercept": 10, "per_mb": 2, "min": 10, "max": 240},
+    },
+}
+
+
+def write_benchmark(location, seconds, max_rss):
+    location.parent.mkdir(parents=True, exist_ok=True)
+    location.write_text(BENCHMARK_HEADER + f"{seconds}\t0:00:00\t{max_rss}\t0\t0\t0\t1.0\t1.0\t50\t{seconds}\n")
+
+
+@pytest.fixture
+def run(tmp_path):
+    """A run of 12 assemblies, amrfinderplus used 1 GB and 2 minutes plus 0.5 GB and 1 minute per MB"""
+    samples = {}
+    for number in range(12):
+        sample = f"s{number:02d}"
+        size_mb = 1 + number
+        assembly = tmp_path.joinpath("input", f"{sample}.fasta")
+        assembly.parent.mkdir(exist_ok=True)
+        with open(assembly, "wb") as assembly_file:
+            assembly_file.truncate(int(size_mb * 1e6))
+        samples[sample] = {"assembly": str(assembly)}
+        write_benchmark(
+            tmp_path.joinpath("benchmark", "runamrfinderplus", f"{sample}.tsv"),
+            seconds=60 * (2 + size_mb),
+            max_rss=1024 * (1 + 0.5 * size_mb),
+        )
+    sample_sheet = tmp_path.joinpath("audit_trail", "sample_sheet.yaml")
+    sample_sheet.parent.mkdir()
+    sample_sheet.write_text(yaml.safe_dump(samples))
+    return tmp_path.joinpath("benchmark"), sample_sheet
+
+
+def test_fit_line():
+    points = [(size, 1 + 0.5 * size) for size in range(1, 11)]
+    intercept, per_mb = fit_line(points, safety_factor=1.0)
+    assert intercept == pytest.approx(1)
+    assert per_mb == pytest.approx(0.5)
+    intercept, per_mb = fit_line(points, safety_factor=1.2)
+    assert (intercept, per_mb) == pytest.approx((1.2, 0.6))
+    # Resources do not go down with a larger input
+    assert fit_line([(1, 4), (2, 3), (3, 2)], safety_factor=1.0)[1] == 0.0
+
+
+def test_calibrate_from_benchmarks(run):
+    measurements = collect_measurements([run])
+    assert len(measurements["amrfinderplus"]) == 12
+    calibrated = calibrate(RESOURCE_MODEL, measurements, safety_factor=1.0, minimum_samples=10)
+    assert calibrated["amrfinderplus"]["mem_gb"] == pytest.approx({"intercept": 1, "per_mb": 0.5, "min": 2, "max": 16})
+    assert calibrated["amrfinderplus"]["runtime"] == pytest.approx({"intercept": 2, "per_mb": 1, "min": 10, "max": 240})
+    # Threads are not measured, the model is kept
+    assert calibrated["amrfinderplus"]["threads"] == RESOURCE_MODEL["amrfinderplus"]["threads"]
+    assert RESOURCE_MODEL["amrfinderplus"]["mem_gb"]["intercept"] == 2
+
+
+def test_cache_hits_are_left_out(run):
+    benchmark_dir, sample_sheet = run
+    # The job of s00 took its results from the result cache, its benchmark measured the copy of the results
+    write_benchmark(benchmark_dir.joinpath("runamrfinderplus", "s00.tsv"), seconds=1, max_rss=100000)
+    benchmark_dir.joinpath("runamrfinderplus", f"s00{CACHE_HIT_SUFFIX}").touch()
+    measurements = collect_measurements([run])
+    assert len(measurements["amrfinderplus"]) == 11
+    calibrated = calibrate(RESOURCE_MODEL, measurements, safety_factor=1.0, minimum_samples=10)
+    assert calibrated["amrfinderplus"]["mem_gb"]["per_mb"] == pytest.approx(0.5)
+
+
+def test_too_few_benchmarks_are_not_calibrated(run):
+    calibrated = calibrate(RESOURCE_MODEL, collect_measurements([run]), safety_factor=1.0, minimum_samples=20)
+    assert calibrated == RESOURCE_MODEL
+
+
+def test_batches_are_measured_with_their_samples(run):
+    benchmark_dir, sample_sheet = run
+    batches = {"batch0001": ["s00", "s01"], "batch0002": ["s02", "s03"]}
+    sample_sheet.with_name(BATCHES_FILE).write_text(yaml.safe_dump(batches))
+    # Batches of 3 and 7 MB of assemblies
+    write_benchmark(benchmark_dir.joinpath("runamrfinderplusBatch", "batch0001.tsv"), seconds=300, max_rss=2560)
+    write_benchmark(benchmark_dir.joinpath("runamrfinderplusBatch", "batch0002.tsv"), seconds=540, max_rss=4608)
+    sizes = [round(size, 3) for size, values in collect_measurements([run])["amrfinderplus"]]
+    assert len(sizes) == 14
+    assert sizes.count(3) == 2 and sizes.count(7) == 2
+
+
+def test_batches_without_batches_file_are_skipped(run):
+    benchmark_dir, sample_sheet = run
+    write_benchmark(benchmark_dir.joinpath("runamrfinderplusBatch", "batch0001.tsv"), seconds=300, max_rss=2560)
+    assert len(collect_measurements([run])["amrfinderplus"]) == 12
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from downloads import COMPONENTS, INSTALLED_FILE, DownloadsJunoAmr
+
+# A git mirror that does not exist, a test that would download fails instead
+NO_MIRROR = "file:///nonexistent"
+
+
+def install_components(db_dir, bin_dir, version="v1"):
+    """Installed files of every component, as the installs of DownloadsJunoAmr leave them"""
+    for name, component in COMPONENTS.items():
+        directory = (bin_dir if component.kind == "software" else db_dir).joinpath(component.name)
+        directory.mkdir(parents=True)
+        directory.joinpath("data.txt").write_text(f"{name} {version}\n")
+        if component.kind == "database":
+            directory.joinpath("data.comp.b").write_text("index\n")
+        if component.repository is not None:
+            directory.joinpath(INSTALLED_FILE).write_text(json.dumps({"name": component.name, "version": version}))
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    db_dir, bin_dir = tmp_path.joinpath("shared", "db"), tmp_path.joinpath("shared", "bin")
+    install_components(db_dir, bin_dir)
+    location = tmp_path.joinpath("juno_amr_databases.tar.gz")
+    manifest = DownloadsJunoAmr(db_dir, bin_dir=bin_dir, git_mirror=NO_MIRROR).export_bundle(location)
+    assert set(manifest["components"]) == set(COMPONENTS)
+    return location
+
+
+def test_import_bundle(tmp_path, bundle):
+    db_dir, bin_dir = tmp_path.joinpath("node", "db"), tmp_path.joinpath("node", "bin")
+    downloads = DownloadsJunoAmr(db_dir, bin_dir=bin_dir, git_mirror=NO_MIRROR, bundle=bundle)
+    assert downloads.downloaded_versions["resfinder_db"] == "v1"
+    assert db_dir.joinpath("resfinder_db", "data.txt").read_text() == "resfinder_db v1\n"
+    assert db_dir.joinpath("amrfinderplusdb", "data.txt").is_file()
+    assert bin_dir.joinpath("resfinder", INSTALLED_FILE).is_file()
+
+
+def test_import_keeps_installed_components(tmp_path, bundle):
+    db_dir, bin_dir = tmp_path.joinpath("node", "db"), tmp_path.joinpath("node", "bin")
+    install_components(db_dir, bin_dir, version="v2")
+    downloads = DownloadsJunoAmr(db_dir, bin_dir=bin_dir, git_mirror=NO_MIRROR, bundle=bundle)
+    assert downloads.downloaded_versions["resfinder_db"] == "v2"
+    assert db_dir.joinpath("resfinder_db", "data.txt").read_text() == "resfinder_db v2\n"
+
+
+def test_update_installs_the_bundle(tmp_path, bundle):
+    db_dir, bin_dir = tmp_path.joinpath("node", "db"), tmp_path.joinpath("node", "bin")
+    install_components(db_dir, bin_dir, version="v2")
+    db_dir.joinpath("resfinder_db", "stale.txt").write_text("stale\n")
+    downloads = DownloadsJunoAmr(db_dir, update_dbs=True, bin_dir=bin_dir, git_mirror=NO_MIRROR, bundle=bundle)
+    assert downloads.downloaded_versions["resfinder_db"] == "v1"
+    assert db_dir.joinpath("resfinder_db", "data.txt").read_text() == "resfinder_db v1\n"
+    assert not db_dir.joinpath("resfinder_db", "stale.txt").exists()
@@ -0,0 +1,111 @@
+import os
+import subprocess
+
+import pytest
+
+import kma_shm
+from kma_shm import KMA_SHARED, index_marker, kma_databases, setup_shared_memory, teardown_shared_memory
+
+
+@pytest.fixture
+def databases(tmp_path):
+    for index in ["resfinder_db/all", "pointfinder_db/escherichia_coli/escherichia_coli"]:
+        location = tmp_path.joinpath(f"{index}.comp.b")
+        location.parent.mkdir(parents=True, exist_ok=True)
+        location.write_text("index\n")
+    tmp_path.joinpath("resfinder_db", "all.name").write_text("blaTEM-1B\n")
+    return kma_databases([tmp_path.joinpath("resfinder_db"), tmp_path.joinpath("pointfinder_db")])
+
+
+@pytest.fixture
+def kma_calls(tmp_path, monkeypatch):
+    """The kma commands of kma_shm, kma itself is not run"""
+    monkeypatch.setattr(kma_shm, "USERS_DIR", tmp_path.joinpath("shm"))
+    calls = []
+    monkeypatch.setattr(kma_shm.subprocess, "run", lambda command, check: calls.append(command))
+    return calls
+
+
+@pytest.fixture
+def kma(tmp_path, monkeypatch):
+    """A kma on the PATH that writes its arguments to kma_arguments.txt"""
+    bin_dir = tmp_path.joinpath("path")
+    bin_dir.mkdir()
+    bin_dir.joinpath("kma").write_text(f'#!/usr/bin/env bash\necho "$@" > {tmp_path.joinpath("kma_arguments.txt")}\n')
+    bin_dir.joinpath("kma").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return tmp_path.joinpath("kma_arguments.txt")
+
+
+def test_kma_databases(tmp_path, databases):
+    assert databases == [
+        str(tmp_path.joinpath("resfinder_db", "all")),
+        str(tmp_path.joinpath("pointfinder_db", "escherichia_coli", "escherichia_coli")),
+    ]
+
+
+def test_setup_and_teardown(databases, kma_calls):
+    setup_shared_memory(databases, pid=os.getpid())
+    assert kma_calls == [["kma", "shm", "-t_db", database, "-shmLvl", "1"] for database in databases]
+
+    kma_calls.clear()
+    teardown_shared_memory(databases, pid=os.getpid())
+    assert kma_calls == [["kma", "shm", "-t_db", database, "-destroy"] for database in databases]
+    assert not kma_shm.users_dir(databases).exists()
+
+
+def test_loaded_indexes_are_marked(databases, kma_calls):
+    setup_shared_memory(databases, pid=os.getpid())
+    assert all(index_marker(database).exists() for database in databases)
+    # The marker of an index does not depend on how its path is written
+    assert index_marker(databases[0]) == index_marker(databases[0].replace("/resfinder_db/", "/resfinder_db/./"))
+    teardown_shared_memory(databases, pid=os.getpid())
+    assert not any(index_marker(database).exists() for database in databases)
+
+
+def test_indexes_are_loaded_once_per_node(databases, kma_calls):
+    # Another run on the node, the parent of the tests is still running
+    other_pid = os.getppid()
+    setup_shared_memory(databases, pid=other_pid)
+    kma_calls.clear()
+    setup_shared_memory(databases, pid=os.getpid())
+    assert kma_calls == []
+
+    # The indexes stay until the last run that uses them is done
+    teardown_shared_memory(databases, pid=os.getpid())
+    assert kma_calls == []
+    teardown_shared_memory(databases, pid=other_pid)
+    assert len(kma_calls) == len(databases)
+
+
+def test_indexes_of_ended_runs_are_loaded_again(databases, kma_calls):
+    setup_shared_memory(databases, pid=os.getpid())
+    # A run that ended without teardown, no process has its id
+    kma_shm.users_dir(databases).joinpath(str(2**22 + 1)).touch()
+    kma_calls.clear()
+    teardown_shared_memory(databases, pid=os.getpid())
+    assert len(kma_calls) == len(databases)
+
+
+def test_kma_shared_uses_loaded_indexes(databases, kma):
+    # bin/kma_shared looks in /dev/shm, the directories that the test makes there are removed again
+    marker = index_marker(databases[0])
+    made = [directory for directory in [marker.parent.parent, marker.parent] if not directory.exists()]
+    for directory in made:
+        directory.mkdir()
+    marker.touch()
+    try:
+        subprocess.run([KMA_SHARED, "-i", "reads.fastq", "-t_db", databases[0], "-o", "out"], check=True)
+    finally:
+        marker.unlink()
+        for directory in reversed(made):
+            directory.rmdir()
+    assert kma.read_text() == f"-i reads.fastq -t_db {databases[0]} -o out -shm 1\n"
+
+
+def test_kma_shared_without_loaded_index(databases, kma):
+    # For example a copy of the database that is staged on local disk
+    subprocess.run([KMA_SHARED, "-i", "reads.fastq", "-t_db", databases[1], "-o", "out"], check=True)
+    assert kma.read_text() == f"-i reads.fastq -t_db {databases[1]} -o out\n"
+    subprocess.run([KMA_SHARED, "-v"], check=True)
+    assert kma.read_text() == "-v\n"
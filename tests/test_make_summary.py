@@ -0,0 +1,141 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from make_summary import make_summaries
+
+# The synthetic results of the benchmarks
+sys.path.insert(0, str(Path(__file__).parent.parent.joinpath("benchmarks")))
+from synthetic_results import generate_run  # noqa: E402
+
+SAMPLES = 30
+SUMMARY_FILES = {
+    "resfinder": ["summary_amr_genes.csv", "summary_amr_phenotype.csv"],
+    "pointfinder": ["summary_amr_pointfinder_results.csv"],
+    "iles": ["summary_iles.csv"],
+    "virulencefinder": ["summary_virulencefinder.csv"],
+    "amrfinderplus": ["summary_amrfinderplus.csv"],
+}
+SUMMARY_ARGUMENTS = {
+    "resfinder": "resfinder_summary_file_names",
+    "pointfinder": "pointfinder_summary_file_name",
+    "iles": "iles_summary_file_names",
+    "virulencefinder": "virulencefinder_summary_file_names",
+    "amrfinderplus": "amrfinderplus_summary_file_names",
+}
+POINTFINDER_HEADER = "Mutation\tNucleotide change\tAmino acid change\tResistance\tPMID\n"
+
+
+@pytest.fixture(scope="module")
+def sample_dirs(tmp_path_factory):
+    return generate_run(tmp_path_factory.mktemp("run"), SAMPLES)
+
+
+def summarize(output_dir, sample_dirs, summary_type="all", **arguments):
+    """Make the summaries of summary_type in output_dir, returns the content of each summary file"""
+    summary_dir = output_dir.joinpath("summary")
+    summaries = list(SUMMARY_FILES) if summary_type == "all" else [summary_type]
+    for summary in summaries:
+        arguments[SUMMARY_ARGUMENTS[summary]] = [str(summary_dir.joinpath(name)) for name in SUMMARY_FILES[summary]]
+    if summary_type == "all":
+        arguments.update(
+            input=sample_dirs["resfinder"],
+            input_virulencefinder=sample_dirs["virulencefinder"],
+            input_amrfinderplus=sample_dirs["amrfinderplus"],
+        )
+    elif summary_type in ["virulencefinder", "amrfinderplus"]:
+        arguments["input"] = sample_dirs[summary_type]
+    else:
+        arguments["input"] = sample_dirs["resfinder"]
+    arguments.setdefault("species", "escherichia_coli")
+    make_summaries(summary_type=summary_type, output_dir=str(output_dir), no_cache=True, **arguments)
+    return {
+        name: summary_dir.joinpath(name).read_text()
+        for summary in summaries
+        for name in SUMMARY_FILES[summary]
+        if summary_dir.joinpath(name).exists()
+    }
+
+
+def iles_rows(summary):
+    """Rows of an iles summary by samplename"""
+    header, *lines = summary.splitlines()
+    return header.split(","), {line.split(",")[0]: line.split(",") for line in lines}
+
+
+def test_all_gives_the_summaries_of_each_type(tmp_path, sample_dirs):
+    all_summaries = summarize(tmp_path.joinpath("all"), sample_dirs)
+    assert set(all_summaries) == {name for names in SUMMARY_FILES.values() for name in names}
+    for summary in SUMMARY_FILES:
+        summaries = summarize(tmp_path.joinpath(summary), sample_dirs, summary_type=summary)
+        for name, content in summaries.items():
+            assert content == all_summaries[name], name
+
+
+def test_streaming_gives_the_same_summaries(tmp_path, sample_dirs):
+    expected = summarize(tmp_path.joinpath("expected"), sample_dirs)
+    assert summarize(tmp_path.joinpath("streaming"), sample_dirs, streaming=True) == expected
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_threads_give_the_same_summaries(tmp_path, sample_dirs, streaming):
+    expected = summarize(tmp_path.joinpath("expected"), sample_dirs, streaming=streaming)
+    assert summarize(tmp_path.joinpath("threads"), sample_dirs, streaming=streaming, threads=3) == expected
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_iles_panels_per_species(tmp_path, sample_dirs, streaming):
+    species = ["escherichia_coli", "salmonella", "campylobacter", "other"]
+    samplenames = [Path(sample_dir).name for sample_dir in sample_dirs["resfinder"]]
+    sample_species = {samplename: species[number % 4] for number, samplename in enumerate(samplenames)}
+    summaries = summarize(
+        tmp_path.joinpath("mixed"), sample_dirs, summary_type="iles", sample_species=sample_species, streaming=streaming
+    )
+    header, rows = iles_rows(summaries["summary_iles.csv"])
+    # Samples without a panel are left out, the others keep their order
+    assert list(rows) == [samplename for samplename in samplenames if sample_species[samplename] != "other"]
+    assert "cotrimoxazole" in header and "tetracycline" in header
+
+    # Each panel gives the same values as a run of only its species, salmonella is summarised with E. coli
+    panels = {"escherichia_coli": ["escherichia_coli", "salmonella"], "campylobacter": ["campylobacter"]}
+    for panel, panel_species in panels.items():
+        selected = [
+            number for number, samplename in enumerate(samplenames) if sample_species[samplename] in panel_species
+        ]
+        panel_header, panel_rows = iles_rows(
+            summarize(
+                tmp_path.joinpath(panel),
+                {"resfinder": [sample_dirs["resfinder"][number] for number in selected]},
+                summary_type="iles",
+                species=panel,
+            )["summary_iles.csv"]
+        )
+        assert ("cotrimoxazole" in panel_header) == (panel == "escherichia_coli")
+        for samplename, row in panel_rows.items():
+            values = dict(zip(panel_header, row))
+            assert {column: value for column, value in zip(header, rows[samplename]) if value} == {
+                column: value for column, value in values.items() if value
+            }
+
+
+def test_iles_summary_of_samples_without_mutations(tmp_path, sample_dirs):
+    # Copy the run without the mutations of PointFinder
+    samples = {"resfinder": []}
+    for sample_dir in sample_dirs["resfinder"][:5]:
+        location = tmp_path.joinpath("results", Path(sample_dir).name)
+        location.mkdir(parents=True)
+        for result_file in Path(sample_dir).iterdir():
+            location.joinpath(result_file.name).write_bytes(result_file.read_bytes())
+        location.joinpath("PointFinder_results.txt").write_text(POINTFINDER_HEADER)
+        samples["resfinder"].append(str(location))
+
+    for species in ["escherichia_coli", "campylobacter"]:
+        header, rows = iles_rows(
+            summarize(tmp_path.joinpath(species), samples, summary_type="iles", species=species)["summary_iles.csv"]
+        )
+        assert list(rows) == [Path(location).name for location in samples["resfinder"]]
+        # The values come from the phenotypes only, there are no columns of both tools
+        assert not any(column.endswith(("_x", "_y")) for column in header)
+        for row in rows.values():
+            assert all(value for value in row)
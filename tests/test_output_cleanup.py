@@ -0,0 +1,72 @@
+from output_cleanup import clean_outputs, rule_output_locations
+
+
+def test_rule_output_locations(tmp_path):
+    locations = rule_output_locations(tmp_path, ["s1", "s2"])
+    assert len(locations) == 7
+    assert tmp_path.joinpath("results", "resfinder", "s2") in locations
+    assert locations[-1] == tmp_path.joinpath("summary")
+
+
+def test_only_empty_outputs_are_removed(tmp_path):
+    resfinder = tmp_path.joinpath("results", "resfinder", "s1")
+    resfinder.joinpath("pointfinder").mkdir(parents=True)
+    resfinder.joinpath("pheno_table.txt").write_text("ampicillin\n")
+    resfinder.joinpath("ResFinder_results_tab.txt").touch()
+    resfinder.joinpath("pointfinder", "PointFinder_results.txt").touch()
+    # A sample that was interrupted before its tool wrote anything
+    tmp_path.joinpath("results", "virulencefinder", "s1", "tmp").mkdir(parents=True)
+    summary = tmp_path.joinpath("summary")
+    summary.mkdir()
+    summary.joinpath("summary_iles.csv").touch()
+    summary.joinpath("summary_amr_genes.csv").write_text("samplename\n")
+
+    report = clean_outputs(rule_output_locations(tmp_path, ["s1"]), threads=2)
+
+    assert report["locations"] == 4
+    assert report["removed_files"] == sorted(
+        [
+            str(resfinder.joinpath("ResFinder_results_tab.txt")),
+            str(resfinder.joinpath("pointfinder", "PointFinder_results.txt")),
+            str(summary.joinpath("summary_iles.csv")),
+        ]
+    )
+    assert not resfinder.joinpath("pointfinder").exists()
+    assert not tmp_path.joinpath("results", "virulencefinder", "s1").exists()
+    # Results with content and the directories they are in are kept
+    assert resfinder.joinpath("pheno_table.txt").read_text() == "ampicillin\n"
+    assert summary.joinpath("summary_amr_genes.csv").is_file()
+    assert tmp_path.joinpath("results", "virulencefinder").is_dir()
+
+
+def test_files_outside_the_rule_outputs_are_kept(tmp_path):
+    for location in [
+        tmp_path.joinpath("audit_trail", "log.txt"),
+        tmp_path.joinpath("results", "resfinder", "s2", "pheno_table.txt"),
+        tmp_path.joinpath("results", "other_tool", "s1", "result.txt"),
+    ]:
+        location.parent.mkdir(parents=True, exist_ok=True)
+        location.touch()
+    tmp_path.joinpath("log").mkdir()
+
+    report = clean_outputs(rule_output_locations(tmp_path, ["s1"]))
+
+    assert report["removed_files"] == [] and report["removed_directories"] == []
+    assert tmp_path.joinpath("audit_trail", "log.txt").is_file()
+    assert tmp_path.joinpath("results", "resfinder", "s2", "pheno_table.txt").is_file()
+    assert tmp_path.joinpath("results", "other_tool", "s1", "result.txt").is_file()
+    assert tmp_path.joinpath("log").is_dir()
+
+
+def test_symlinks_are_not_followed(tmp_path):
+    target = tmp_path.joinpath("reads")
+    target.mkdir()
+    target.joinpath("empty.fastq").touch()
+    sample = tmp_path.joinpath("output", "results", "amrfinderplus", "s1")
+    sample.mkdir(parents=True)
+    sample.joinpath("reads").symlink_to(target)
+
+    clean_outputs(rule_output_locations(tmp_path.joinpath("output"), ["s1"]))
+
+    assert sample.joinpath("reads").is_symlink()
+    assert target.joinpath("empty.fastq").is_file()
@@ -0,0 +1,74 @@
+import pytest
+import yaml
+
+from performance_report import CACHE_HIT_SUFFIX, percentile, performance_report, write_performance_report
+
+BENCHMARK_HEADER = "s\th:m:s\tmax_rss\tmax_vms\tmax_uss\tmax_pss\tio_in\tio_out\tmean_load\tcpu_time\n"
+
+
+def write_benchmark(location, seconds, max_rss, cpu_time, io_in="1.0"):
+    location.parent.mkdir(parents=True, exist_ok=True)
+    location.write_text(
+        BENCHMARK_HEADER + f"{seconds}\t0:00:00\t{max_rss}\t0\t0\t0\t{io_in}\t2.0\t50\t{cpu_time}\n"
+    )
+
+
+@pytest.fixture
+def benchmark_dir(tmp_path):
+    location = tmp_path.joinpath("log", "benchmark")
+    for number in range(1, 11):
+        location_sample = location.joinpath("runamrfinderplus", f"s{number:02d}.tsv")
+        write_benchmark(location_sample, 10 * number, 100 * number, 10 * number)
+    # A rule that runs once, measured by snakemake with NA for a short process
+    write_benchmark(location.joinpath("makeSummaries.tsv"), 4, 50, 12, io_in="NA")
+    return location
+
+
+def requested_threads(rule, sample):
+    return 4 if rule == "makeSummaries" else 2
+
+
+def test_percentile():
+    assert percentile([3, 1, 2], 0.5) == 2
+    assert percentile(range(1, 101), 0.95) == 95
+    assert percentile([5], 0.9) == 5
+
+
+def test_report_per_rule(benchmark_dir):
+    report = performance_report(benchmark_dir, requested_threads)
+    assert list(report) == ["makeSummaries", "runamrfinderplus"]
+
+    amrfinderplus = report["runamrfinderplus"]
+    assert amrfinderplus["jobs"] == 10
+    assert amrfinderplus["wall_seconds"] == {"p50": 50, "p90": 90, "p95": 100, "max": 100}
+    assert amrfinderplus["max_rss_mb"]["max"] == 1000
+    assert amrfinderplus["cpu_efficiency"]["max"] == 0.5
+    assert amrfinderplus["requested_threads"] == [2]
+    assert [job["sample"] for job in amrfinderplus["slowest_samples"][:3]] == ["s10", "s09", "s08"]
+
+
+def test_cache_hits_are_left_out(benchmark_dir):
+    # A sample whose results came from the result cache
+    write_benchmark(benchmark_dir.joinpath("runamrfinderplus", "s99.tsv"), 1000, 100000, 1)
+    benchmark_dir.joinpath("runamrfinderplus", f"s99{CACHE_HIT_SUFFIX}").touch()
+    report = performance_report(benchmark_dir, requested_threads)
+    assert report["runamrfinderplus"]["jobs"] == 10
+    samples = [job["sample"] for job in report["runamrfinderplus"]["slowest_samples"]]
+    assert "s99" not in samples
+    assert report["runamrfinderplus"]["max_rss_mb"]["max"] == 1000
+
+
+def test_rule_that_runs_once(benchmark_dir):
+    summaries = performance_report(benchmark_dir, requested_threads)["makeSummaries"]
+    assert summaries["jobs"] == 1
+    assert summaries["cpu_efficiency"]["max"] == 0.75
+    # Measurements that are NA are left out, rules that run once have no samples
+    assert "io_in_mb" not in summaries
+    assert summaries["slowest_samples"] == []
+
+
+def test_write_performance_report(tmp_path, benchmark_dir):
+    location = tmp_path.joinpath("audit_trail", "performance_report.yaml")
+    report = write_performance_report(benchmark_dir, location, requested_threads)
+    with open(location) as report_file:
+        assert yaml.safe_load(report_file) == report
@@ -0,0 +1,72 @@
+import pytest
+
+from presence_matrix import PresenceMatrix, update_matrix
+
+PROFILES = {
+    "s1": {"resfinder:blaTEM-1B", "pointfinder:gyrA p.S83L"},
+    "s2": {"resfinder:blaTEM-1B", "pointfinder:gyrA p.S83L", "virulencefinder:iss"},
+    "s3": {"resfinder:blaTEM-1B", "virulencefinder:iss"},
+    "s4": {"amrfinderplus:sul1"},
+}
+
+
+@pytest.fixture
+def matrix_dir(tmp_path):
+    location = tmp_path.joinpath("presence_matrix")
+    update_matrix(location, PROFILES)
+    return location
+
+
+def test_profiles(matrix_dir):
+    matrix = PresenceMatrix(matrix_dir)
+    assert matrix.samples == ["s1", "s2", "s3", "s4"]
+    assert matrix.shape == (4, 4)
+    for sample, features in PROFILES.items():
+        assert set(matrix.profile(sample)) == features
+
+
+def test_adding_a_sample_again_replaces_its_profile(matrix_dir):
+    matrix = update_matrix(matrix_dir, {"s2": {"amrfinderplus:sul1"}, "s5": {"virulencefinder:iss"}})
+    # A sample keeps its row, new samples are added at the end
+    assert matrix.samples == ["s1", "s2", "s3", "s4", "s5"]
+    assert matrix.profile("s2") == ["amrfinderplus:sul1"]
+    assert set(matrix.profile("s1")) == PROFILES["s1"]
+    # The sample is only in the postings of its new features
+    distance, shared = matrix.distances(["pointfinder:gyrA p.S83L"])
+    assert shared.tolist() == [1, 0, 0, 0, 0]
+
+
+def test_nearest_jaccard(matrix_dir):
+    matrix = PresenceMatrix(matrix_dir)
+    nearest = matrix.nearest("s1", k=3)
+    assert [found["sample"] for found in nearest] == ["s2", "s3", "s4"]
+    assert [found["distance"] for found in nearest] == pytest.approx([1 / 3, 2 / 3, 1.0])
+    assert [found["shared"] for found in nearest] == [2, 1, 0]
+    assert matrix.nearest("s1", k=1, include_self=True)[0] == {
+        "sample": "s1",
+        "distance": 0.0,
+        "shared": 2,
+        "features": 2,
+    }
+
+
+def test_nearest_ties_are_ordered_by_sample(matrix_dir):
+    matrix = PresenceMatrix(matrix_dir)
+    # s1 and s3 are both at distance 1 from s2, s4 is further away
+    nearest = matrix.nearest("s2", k=2, metric="hamming")
+    assert [(found["sample"], found["distance"]) for found in nearest] == [("s1", 1), ("s3", 1)]
+    nearest = matrix.nearest("s2", k=1, metric="hamming")
+    assert [found["sample"] for found in nearest] == ["s1"]
+
+
+def test_nearest_to_a_list_of_features(matrix_dir):
+    matrix = PresenceMatrix(matrix_dir)
+    # Features that are not in the matrix count for the size of the query
+    nearest = matrix.nearest(["amrfinderplus:sul1", "amrfinderplus:unknown"], k=2)
+    assert nearest[0]["sample"] == "s4"
+    assert nearest[0]["distance"] == pytest.approx(0.5)
+
+
+def test_unknown_metric(matrix_dir):
+    with pytest.raises(ValueError):
+        PresenceMatrix(matrix_dir).nearest("s1", metric="cosine")
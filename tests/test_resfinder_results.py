@@ -0,0 +1,190 @@
+import json
+
+import pytest
+
+from resfinder_results import (
+    RESFINDER_JSON,
+    ResultTable,
+    find_resfinder_json,
+    read_pheno_table,
+    read_pointfinder_results,
+    read_resfinder_genes,
+    read_resfinder_json,
+)
+
+RESFINDER_GENES = """\
+Resistance gene\tIdentity\tAlignment Length/Gene Length\tCoverage\tPosition in reference\tContig\tPosition in contig\tPhenotype\tAccession no.
+blaTEM-1B\t100.0\t861/861\t100.0\t1..861\tcontig_1\t1..861\tAmpicillin\tAY458016
+"""
+
+PHENO_TABLE = """\
+# ResFinder phenotype results.
+# Sample: S1
+#
+# The phenotype 'No resistance' should be interpreted with
+# caution, as it only means that nothing in the used
+# database indicate resistance, but resistance could exist
+# from 'unknown' or not yet implemented sources.
+#
+# The 'Match' column stores one of the integers 0, 1, 2, 3.
+# If several hits occur to the same antimicrobial, the highest number is stored.
+#
+# Antimicrobial\tClass\tWGS-predicted phenotype\tMatch\tGenetic background
+ampicillin\tbeta-lactam\tResistant\t3\tblaTEM-1B (blaTEM-1B_1_AY458016)
+ciprofloxacin\tquinolone\tResistant\t3\tgyrA (p.S83L)
+trimethoprim\tfolate\tNo resistance\t0\t
+sulfamethoxazole\tfolate\tNo resistance\t0\t
+
+# WARNING: Missing features from phenotype database:
+"""
+
+POINTFINDER_RESULTS = """\
+Mutation\tNucleotide change\tAmino acid change\tResistance\tPMID
+gyrA p.S83L\tTCG -> TTG\tS -> L\tNalidixic acid,Ciprofloxacin\t8891148
+"""
+
+# The same results in the standardised json output of ResFinder
+RESFINDER_RESULTS = {
+    "type": "software_result",
+    "software_name": "ResFinder",
+    "seq_regions": {
+        "blaTEM-1B;;1;;AY458016": {
+            "name": "blaTEM-1B",
+            "ref_id": "blaTEM-1B_1_AY458016",
+            "identity": 100.0,
+            "alignment_length": 861,
+            "ref_seq_length": 861,
+            "coverage": 100.0,
+            "ref_database": ["ResFinder-2.1.0"],
+        }
+    },
+    "seq_variations": {
+        "gyrA;;1;;x;;83": {
+            "ref_id": "gyrA;;1;;x",
+            "seq_var": "p.S83L",
+            "ref_codon": "tcg",
+            "var_codon": "ttg",
+            "ref_aa": "s",
+            "var_aa": "l",
+            "phenotypes": ["nalidixic acid", "ciprofloxacin"],
+            "pmids": ["8891148"],
+        }
+    },
+    "phenotypes": {
+        "ampicillin": {
+            "category": "amr",
+            "amr_resistance": "ampicillin",
+            "amr_classes": ["beta-lactam"],
+            "amr_resistant": True,
+            "grade": 3,
+            "seq_regions": ["blaTEM-1B;;1;;AY458016"],
+        },
+        "ciprofloxacin": {
+            "category": "amr",
+            "amr_resistance": "ciprofloxacin",
+            "amr_classes": ["quinolone"],
+            "amr_resistant": True,
+            "grade": 3,
+            "seq_variations": ["gyrA;;1;;x;;83"],
+        },
+        "trimethoprim": {
+            "category": "amr",
+            "amr_resistance": "trimethoprim",
+            "amr_classes": ["folate"],
+            "amr_resistant": False,
+            "grade": 0,
+        },
+        "sulfamethoxazole": {
+            "category": "amr",
+            "amr_resistance": "sulfamethoxazole",
+            "amr_classes": ["folate"],
+            "amr_resistant": False,
+            "grade": 0,
+        },
+    },
+}
+
+
+@pytest.fixture
+def sample_dir(tmp_path):
+    tmp_path.joinpath("ResFinder_results_tab.txt").write_text(RESFINDER_GENES)
+    tmp_path.joinpath("pheno_table.txt").write_text(PHENO_TABLE)
+    tmp_path.joinpath("PointFinder_results.txt").write_text(POINTFINDER_RESULTS)
+    tmp_path.joinpath(RESFINDER_JSON).write_text(json.dumps(RESFINDER_RESULTS))
+    return tmp_path
+
+
+def test_text_and_json_give_the_same_tables(sample_dir):
+    text_tables = {
+        "ResFinder_results_tab.txt": read_resfinder_genes(sample_dir.joinpath("ResFinder_results_tab.txt")),
+        "pheno_table.txt": read_pheno_table(sample_dir.joinpath("pheno_table.txt")),
+        "PointFinder_results.txt": read_pointfinder_results(sample_dir.joinpath("PointFinder_results.txt")),
+    }
+    json_tables = read_resfinder_json(find_resfinder_json(sample_dir))
+    assert json_tables.keys() == text_tables.keys()
+    for name, text_table in text_tables.items():
+        assert json_tables[name].columns == text_table.columns, name
+        assert json_tables[name].row_values() == text_table.row_values(), name
+
+
+def test_tables_survive_the_sample_cache(sample_dir):
+    # The per-sample cache of make_summary.py stores the tables as json
+    table = read_pheno_table(sample_dir.joinpath("pheno_table.txt"))
+    cached = ResultTable.from_json(json.loads(json.dumps(table.to_json())))
+    assert cached.record_type is table.record_type
+    assert cached.columns == table.columns
+    assert cached.row_values() == table.row_values()
+    assert cached.comments == table.comments
+
+
+def test_pheno_table_ends_at_the_first_empty_line(sample_dir):
+    table = read_pheno_table(sample_dir.joinpath("pheno_table.txt"))
+    assert [row.antimicrobial for row in table.rows] == [
+        "ampicillin",
+        "ciprofloxacin",
+        "trimethoprim",
+        "sulfamethoxazole",
+    ]
+
+
+def test_pheno_table_comments_start_after_the_caution(sample_dir):
+    comments = read_pheno_table(sample_dir.joinpath("pheno_table.txt")).comments
+    assert comments[0] == "#\n"
+    assert comments[1].startswith("# The 'Match' column")
+    assert not any("caution" in line for line in comments)
+
+
+def test_text_tables_are_read_by_column_name(tmp_path):
+    # Columns in another order and an extra column
+    location = tmp_path.joinpath("PointFinder_results.txt")
+    location.write_text(
+        "PMID\tMutation\tExtra\tResistance\tAmino acid change\tNucleotide change\n"
+        "8891148\tgyrA p.S83L\tx\tCiprofloxacin\tS -> L\tTCG -> TTG\n"
+    )
+    table = read_pointfinder_results(location)
+    assert table.row_values() == [["gyrA p.S83L", "TCG -> TTG", "S -> L", "Ciprofloxacin", "8891148"]]
+
+
+def test_missing_column_is_an_error(tmp_path):
+    location = tmp_path.joinpath("ResFinder_results_tab.txt")
+    location.write_text("Resistance gene\tIdentity\tAlignment Length/Gene Length\n")
+    with pytest.raises(ValueError, match="Coverage"):
+        read_resfinder_genes(location)
+
+
+def test_find_resfinder_json_prefers_the_named_file(sample_dir):
+    sample_dir.joinpath("other.json").write_text("{}")
+    assert find_resfinder_json(sample_dir) == sample_dir.joinpath(RESFINDER_JSON)
+
+
+def test_find_resfinder_json_of_older_runs(tmp_path):
+    tmp_path.joinpath("S1.json").write_text("{}")
+    assert find_resfinder_json(tmp_path) == tmp_path.joinpath("S1.json")
+    tmp_path.joinpath("S2.json").write_text("{}")
+    with pytest.raises(ValueError):
+        find_resfinder_json(tmp_path)
+
+
+def test_find_resfinder_json_without_json(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        find_resfinder_json(tmp_path)
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+from resource_model import assembly_size_mb, estimate, fastq_size_mb, requested_threads, sample_resource
+
+RESOURCE_MODEL = {
+    "amrfinderplus": {
+        "threads": {"intercept": 1, "per_mb": 0.4, "min": 1, "max": 4},
+        "mem_gb": {"intercept": 2, "per_mb": 0.5, "min": 2, "max": 16},
+        "runtime": {"intercept": 10, "per_mb": 2, "min": 10, "max": 240},
+    },
+    "resfinder": {
+        "threads": {"intercept": 1, "per_mb": 0, "min": 1, "max": 1},
+        "mem_gb": {"intercept": 4, "per_mb": 0.004, "min": 4, "max": 32},
+        "runtime": {"intercept": 10, "per_mb": 0.03, "min": 10, "max": 720},
+    },
+}
+
+
+class Input(dict):
+    """Input of a job with its files as attributes, like the input of snakemake"""
+
+    __getattr__ = dict.__getitem__
+
+
+def write_file(location, size_mb):
+    with open(location, "wb") as file_:
+        file_.truncate(int(size_mb * 1e6))
+    return str(location)
+
+
+def test_estimate_is_limited():
+    model = RESOURCE_MODEL["amrfinderplus"]["mem_gb"]
+    assert estimate(model, 0) == 2
+    assert estimate(model, 10.5) == 8
+    assert estimate(model, 1000) == 16
+
+
+def test_restarts_get_more_than_the_maximum():
+    model = RESOURCE_MODEL["amrfinderplus"]
+    assert estimate(model["mem_gb"], 1000, attempt=2, resource="mem_gb") == 32
+    assert estimate(model["runtime"], 10, attempt=3, resource="runtime") == 90
+    # Threads stay within the limits, a restart does not get more cores
+    assert estimate(model["threads"], 1000, attempt=2, resource="threads") == 4
+
+
+def test_sample_resource_from_the_input(tmp_path):
+    fasta = write_file(tmp_path.joinpath("s1.fasta"), 5)
+    input = SimpleNamespace(fasta_sample=fasta)
+    threads = sample_resource(RESOURCE_MODEL, "amrfinderplus", "threads", assembly_size_mb)
+    mem_gb = sample_resource(RESOURCE_MODEL, "amrfinderplus", "mem_gb", assembly_size_mb)
+    assert threads({}, input) == 3
+    assert mem_gb({}, input, 1) == 5
+    assert mem_gb({}, input, 2) == 9
+
+
+def test_sample_resource_of_the_reads(tmp_path):
+    reads = [write_file(tmp_path.joinpath(f"s1_{read}.fastq.gz"), 1000) for read in ["R1", "R2"]]
+    mem_gb = sample_resource(RESOURCE_MODEL, "resfinder", "mem_gb", fastq_size_mb)
+    assert mem_gb({}, Input(r1=reads[0], r2=reads[1]), 1) == 12
+    assert mem_gb({}, Input(r1=reads[0], r2=reads[1]), 2) == 24
+
+
+def test_sample_resource_of_subsampled_reads(tmp_path):
+    reads = [write_file(tmp_path.joinpath(f"s1_{read}.fastq.gz"), 1000) for read in ["R1", "R2"]]
+    subsample = [str(tmp_path.joinpath(f"subsample_{read}.fastq.gz")) for read in ["R1", "R2"]]
+    mem_gb = sample_resource(RESOURCE_MODEL, "resfinder", "mem_gb", fastq_size_mb)
+    # The size of a subsample is taken from the reads it is made of
+    assert mem_gb({}, Input(r1=subsample[0], r2=subsample[1], reads=reads), 1) == 12
+    # Reads that do not exist yet have no size
+    assert mem_gb({}, Input(r1=subsample[0], r2=subsample[1]), 1) == 4
+
+
+def test_requested_threads(tmp_path):
+    config = {"resource_model": RESOURCE_MODEL, "threads": {"summary": 8}}
+    samples = [{"assembly": write_file(tmp_path.joinpath(f"{sample}.fasta"), 3)} for sample in ["s1", "s2"]]
+    assert requested_threads(config, "runamrfinderplus", samples[:1]) == 3
+    # A batch gets the threads of the input of all its samples
+    assert requested_threads(config, "runamrfinderplusBatch", samples) == 4
+    assert requested_threads(config, "makeSummaries") == 8
+    assert requested_threads(config, "makePresenceMatrix") == 1
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from result_cache import ENTRY_FILE, ResultCache, cache_key
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    location = tmp_path.joinpath("s1.fasta")
+    location.write_text(">contig_1\nACGT\n")
+    return [location]
+
+
+@pytest.fixture
+def results(tmp_path):
+    output_dir = tmp_path.joinpath("output", "s1")
+    output_dir.joinpath("tmp").mkdir(parents=True)
+    output_dir.joinpath("results_tab.tsv").write_text("gene\n")
+    output_dir.joinpath("tmp", "hits.txt").write_text("hit\n")
+    return output_dir
+
+
+def read_tree(directory):
+    return {
+        str(location.relative_to(directory)): location.read_text()
+        for location in sorted(directory.rglob("*"))
+        if location.is_file()
+    }
+
+
+def test_store_and_fetch(tmp_path, inputs, results):
+    cache = ResultCache(tmp_path.joinpath("cache"))
+    key = cache_key("virulencefinder", inputs)
+    assert not cache.fetch(key, tmp_path.joinpath("fetched"))
+    cache.store(key, results)
+    assert cache.fetch(key, tmp_path.joinpath("fetched"))
+    assert read_tree(tmp_path.joinpath("fetched")) == read_tree(results)
+
+
+def test_key_follows_the_inputs_and_parameters(tmp_path, inputs):
+    key = cache_key("resfinder", inputs, parameters={"min_coverage": "0.6"})
+    assert key == cache_key("resfinder", inputs, parameters={"min_coverage": "0.6"})
+    assert key != cache_key("resfinder", inputs, parameters={"min_coverage": "0.8"})
+    assert key != cache_key("amrfinderplus", inputs, parameters={"min_coverage": "0.6"})
+    inputs[0].write_text(">contig_1\nACGA\n")
+    assert key != cache_key("resfinder", inputs, parameters={"min_coverage": "0.6"})
+
+
+def test_entries_do_not_change_with_the_outputs(tmp_path, inputs, results):
+    cache = ResultCache(tmp_path.joinpath("cache"))
+    key = cache_key("virulencefinder", inputs)
+    cache.store(key, results)
+    entry = cache.entry(key)
+    assert not entry.joinpath("results_tab.tsv").stat().st_mode & 0o222
+    # Changing the output in place, or a fetched copy of it, leaves the entry as it was
+    results.joinpath("results_tab.tsv").write_text("changed\n")
+    fetched = tmp_path.joinpath("fetched")
+    cache.fetch(key, fetched)
+    fetched.joinpath("results_tab.tsv").write_text("changed\n")
+    assert entry.joinpath("results_tab.tsv").read_text() == "gene\n"
+    assert cache.fetch(key, tmp_path.joinpath("fetched_again"))
+    assert tmp_path.joinpath("fetched_again", "results_tab.tsv").read_text() == "gene\n"
+
+
+def test_entry_file_is_not_fetched(tmp_path, inputs, results):
+    cache = ResultCache(tmp_path.joinpath("cache"))
+    key = cache_key("virulencefinder", inputs)
+    cache.store(key, results, {"tool": "virulencefinder"})
+    assert cache.entry(key).joinpath(ENTRY_FILE).is_file()
+    cache.fetch(key, tmp_path.joinpath("fetched"))
+    assert not tmp_path.joinpath("fetched", ENTRY_FILE).exists()
+
+
+def test_evict_removes_the_least_recently_used_entries(tmp_path, results):
+    cache = ResultCache(tmp_path.joinpath("cache"))
+    keys = []
+    for number in range(3):
+        assembly = tmp_path.joinpath(f"s{number}.fasta")
+        assembly.write_text(f">contig_{number}\nACGT\n")
+        key = cache_key("virulencefinder", [assembly])
+        cache.store(key, results)
+        # The last use of an entry is the modification time of its entry file
+        os.utime(cache.entry(key).joinpath(ENTRY_FILE), (number, number))
+        keys.append(key)
+    cache.fetch(keys[0], tmp_path.joinpath("fetched"))
+    entry_size = cache.entries()[0][1]
+
+    assert cache.evict(2 * entry_size) == 1
+    assert not cache.entry(keys[1]).exists()
+    assert cache.entry(keys[0]).exists() and cache.entry(keys[2]).exists()
+    assert not cache.fetch(keys[1], tmp_path.joinpath("evicted"))
+    assert cache.evict(0) == 2
+    assert cache.entries() == []
@@ -0,0 +1,118 @@
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+from make_summary import make_summaries
+from sample_sheet import load_sample_sheet, read_manifest, sample_groups, write_manifest, write_sample_sheet
+
+# The synthetic results of the benchmarks
+sys.path.insert(0, str(Path(__file__).parent.parent.joinpath("benchmarks")))
+from synthetic_results import generate_run  # noqa: E402
+
+SAMPLES = {
+    "s1": {"R1": Path("/data/s1_R1.fastq.gz"), "R2": Path("/data/s1_R2.fastq.gz"), "species": "salmonella"},
+    "s2": {"assembly": "/data/s2.fasta", "species": "campylobacter"},
+}
+SUMMARY_FILES = {
+    "resfinder_summary_file_names": ["summary_amr_genes.csv", "summary_amr_phenotype.csv"],
+    "pointfinder_summary_file_name": ["summary_amr_pointfinder_results.csv"],
+    "iles_summary_file_names": ["summary_iles.csv"],
+    "virulencefinder_summary_file_names": ["summary_virulencefinder.csv"],
+    "amrfinderplus_summary_file_names": ["summary_amrfinderplus.csv"],
+}
+
+
+def test_json_sample_sheet(tmp_path):
+    location = tmp_path.joinpath("sample_sheet.json")
+    write_sample_sheet(SAMPLES, location)
+    samples = load_sample_sheet(location)
+    # Paths are written as text, like in the yaml sample sheet
+    assert samples["s1"]["R1"] == "/data/s1_R1.fastq.gz"
+    assert samples["s2"] == SAMPLES["s2"]
+
+
+def test_yaml_and_json_sample_sheets_are_the_same(tmp_path):
+    samples = {sample: {key: str(value) for key, value in properties.items()} for sample, properties in SAMPLES.items()}
+    tmp_path.joinpath("sample_sheet.yaml").write_text(yaml.safe_dump(samples))
+    write_sample_sheet(samples, tmp_path.joinpath("sample_sheet.json"))
+    assert load_sample_sheet(tmp_path.joinpath("sample_sheet.yaml")) == load_sample_sheet(
+        tmp_path.joinpath("sample_sheet.json")
+    )
+
+
+def test_sample_groups():
+    groups = sample_groups(["s3", "s1", "s5", "s2", "s4"], 2)
+    assert groups == {
+        "s1": "samples0001",
+        "s2": "samples0001",
+        "s3": "samples0002",
+        "s4": "samples0002",
+        "s5": "samples0003",
+    }
+    assert set(sample_groups(SAMPLES, 10).values()) == {"samples0001"}
+
+
+def test_manifest_round_trip(tmp_path):
+    sample_dirs = {
+        "resfinder": ["output/results/resfinder/s2", Path("output/results/resfinder/s1")],
+        "virulencefinder": ["output/results/virulencefinder/s2"],
+    }
+    write_manifest(sample_dirs, tmp_path.joinpath("manifest.tsv"))
+    # The order of the samples is kept
+    assert read_manifest(tmp_path.joinpath("manifest.tsv")) == {
+        "resfinder": ["output/results/resfinder/s2", "output/results/resfinder/s1"],
+        "virulencefinder": ["output/results/virulencefinder/s2"],
+    }
+
+
+def test_manifest_without_header(tmp_path):
+    tmp_path.joinpath("manifest.tsv").write_text("resfinder\toutput/results/resfinder/s1\n")
+    with pytest.raises(ValueError):
+        read_manifest(tmp_path.joinpath("manifest.tsv"))
+
+
+def test_summaries_from_a_manifest(tmp_path):
+    sample_dirs = generate_run(tmp_path.joinpath("run"), 10)
+    write_manifest(sample_dirs, tmp_path.joinpath("manifest.tsv"))
+    inputs = {
+        "input": {
+            "input": sample_dirs["resfinder"],
+            "input_virulencefinder": sample_dirs["virulencefinder"],
+            "input_amrfinderplus": sample_dirs["amrfinderplus"],
+        },
+        "manifest": {"input_manifest": str(tmp_path.joinpath("manifest.tsv"))},
+    }
+    summaries = {}
+    for name, arguments in inputs.items():
+        summary_dir = tmp_path.joinpath(name, "summary")
+        for argument, file_names in SUMMARY_FILES.items():
+            arguments[argument] = [str(summary_dir.joinpath(file_name)) for file_name in file_names]
+        make_summaries(
+            summary_type="all",
+            output_dir=str(tmp_path.joinpath(name)),
+            species="escherichia_coli",
+            no_cache=True,
+            **arguments,
+        )
+        summaries[name] = {location.name: location.read_text() for location in summary_dir.glob("*.csv")}
+    assert len(summaries["manifest"]) == 6
+    assert summaries["manifest"] == summaries["input"]
+
+
+def test_summary_of_one_tool_from_a_manifest(tmp_path):
+    sample_dirs = generate_run(tmp_path.joinpath("run"), 3)
+    write_manifest(sample_dirs, tmp_path.joinpath("manifest.tsv"))
+    location = tmp_path.joinpath("summary_virulencefinder.csv")
+    summary = make_summaries(
+        summary_type="virulencefinder",
+        output_dir=str(tmp_path),
+        species="escherichia_coli",
+        no_cache=True,
+        input_manifest=str(tmp_path.joinpath("manifest.tsv")),
+        virulencefinder_summary_file_names=[str(location)],
+    )
+    assert summary.samplenames == {"virulencefinder": ["sample000000", "sample000001", "sample000002"]}
+    header, *rows = location.read_text().splitlines()
+    assert {row.split(",")[0] for row in rows} <= set(summary.samplenames["virulencefinder"])
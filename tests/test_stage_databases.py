@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from stage_databases import INSTALLED_FILE, MANIFEST_FILE, STAGING_FOLDER, database_version, stage_database
+
+
+@pytest.fixture
+def database(tmp_path):
+    location = tmp_path.joinpath("db", "resfinder_db")
+    location.joinpath("config").mkdir(parents=True)
+    location.joinpath("config", "genes.fsa").write_text(">blaTEM-1B\nACGT\n")
+    location.joinpath(INSTALLED_FILE).write_text('{"version": "v1"}')
+    return location
+
+
+def test_stage_database(tmp_path, database):
+    staged = stage_database(database, tmp_path.joinpath("scratch"))
+    assert staged.parent == tmp_path.joinpath("scratch", STAGING_FOLDER)
+    assert staged.name == f"resfinder_db.{database_version(database)}"
+    assert staged.joinpath("config", "genes.fsa").read_text() == ">blaTEM-1B\nACGT\n"
+    assert staged.joinpath(MANIFEST_FILE).is_file()
+
+
+def test_staged_copy_is_reused(tmp_path, database):
+    staged = stage_database(database, tmp_path.joinpath("scratch"), version="v1")
+    staged.joinpath("config", "genes.fsa").write_text("local\n")
+    assert stage_database(database, tmp_path.joinpath("scratch"), version="v1") == staged
+    assert staged.joinpath("config", "genes.fsa").read_text() == "local\n"
+
+
+def test_version_follows_the_installed_file(database):
+    version = database_version(database)
+    # The files of an installed database are not read
+    database.joinpath("config", "genes.fsa").write_text(">changed\n")
+    assert database_version(database) == version
+    database.joinpath(INSTALLED_FILE).write_text('{"version": "v2"}')
+    assert database_version(database) != version
+
+
+def test_version_of_a_database_without_installed_file(database):
+    database.joinpath(INSTALLED_FILE).unlink()
+    version = database_version(database)
+    database.joinpath("config", "genes.fsa").write_text(">changed\n")
+    assert database_version(database) != version
+
+
+def test_new_version_removes_stale_copies(tmp_path, database):
+    old = stage_database(database, tmp_path.joinpath("scratch"), version="v1")
+    new = stage_database(database, tmp_path.joinpath("scratch"), version="v2")
+    # Copies that were used recently can still be in use by other jobs
+    assert old.is_dir() and new.is_dir()
+    os.utime(old.joinpath(MANIFEST_FILE), (0, 0))
+    # Stale copies are removed when a copy is made
+    new.joinpath(MANIFEST_FILE).unlink()
+    stage_database(database, tmp_path.joinpath("scratch"), version="v2")
+    assert not old.exists()
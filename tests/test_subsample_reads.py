@@ -0,0 +1,81 @@
+import gzip
+import random
+
+import pytest
+
+from subsample_reads import subsample_reads
+
+READ_PAIRS = 400
+READ_LENGTH = 100
+
+
+@pytest.fixture
+def reads(tmp_path):
+    generator = random.Random(0)
+    locations = [tmp_path.joinpath("s1_R1.fastq.gz"), tmp_path.joinpath("s1_R2.fastq.gz")]
+    for direction, location in enumerate(locations, start=1):
+        with gzip.open(location, "wt") as fastq:
+            for number in range(READ_PAIRS):
+                sequence = "".join(generator.choice("ACGT") for _ in range(READ_LENGTH))
+                fastq.write(f"@read{number}/{direction}\n{sequence}\n+\n{'I' * READ_LENGTH}\n")
+    return locations
+
+
+def read_names(location):
+    with gzip.open(location, "rt") as fastq:
+        return [line.split("/")[0] for number, line in enumerate(fastq) if number % 4 == 0]
+
+
+def subsample(reads, output_dir, depth, seed=1):
+    output_dir.mkdir()
+    outputs = [output_dir.joinpath("R1.fastq.gz"), output_dir.joinpath("R2.fastq.gz")]
+    # 2 * READ_LENGTH bases per pair on a genome of 1000 bases gives a depth of 80
+    report = subsample_reads(*reads, *outputs, depth=depth, genome_size=1000, seed=seed)
+    return report, outputs
+
+
+def test_same_seed_gives_the_same_files(tmp_path, reads):
+    report, outputs = subsample(reads, tmp_path.joinpath("first"), depth=20)
+    report_again, outputs_again = subsample(reads, tmp_path.joinpath("second"), depth=20)
+    assert report == report_again
+    for output, output_again in zip(outputs, outputs_again):
+        assert output.read_bytes() == output_again.read_bytes()
+
+
+def test_other_seed_gives_another_subsample(tmp_path, reads):
+    _, outputs = subsample(reads, tmp_path.joinpath("first"), depth=20)
+    _, other_outputs = subsample(reads, tmp_path.joinpath("second"), depth=20, seed=2)
+    assert read_names(outputs[0]) != read_names(other_outputs[0])
+
+
+def test_pairs_stay_together(tmp_path, reads):
+    report, outputs = subsample(reads, tmp_path.joinpath("subsample"), depth=20)
+    assert report["estimated_depth"] == pytest.approx(80)
+    assert report["fraction"] == pytest.approx(0.25)
+    names = read_names(outputs[0])
+    assert names == read_names(outputs[1])
+    assert len(names) == report["kept_read_pairs"]
+    assert 0 < len(names) < READ_PAIRS
+
+
+def test_reads_below_the_depth_are_copied(tmp_path, reads):
+    report, outputs = subsample(reads, tmp_path.joinpath("copied"), depth=100)
+    assert report["fraction"] == 1.0
+    assert report["kept_read_pairs"] is None
+    for read, output in zip(reads, outputs):
+        assert not output.is_symlink()
+        assert output.read_bytes() == read.read_bytes()
+
+
+def test_uncompressed_reads_are_compressed(tmp_path, reads):
+    uncompressed = []
+    for read in reads:
+        location = tmp_path.joinpath(read.name[: -len(".gz")])
+        location.write_bytes(gzip.decompress(read.read_bytes()))
+        uncompressed.append(location)
+    # Copied and subsampled reads are both written as gzip, like the names of the outputs say
+    for depth in [100, 20]:
+        report, outputs = subsample(uncompressed, tmp_path.joinpath(f"depth_{depth}"), depth=depth)
+        kept_read_pairs = READ_PAIRS if report["kept_read_pairs"] is None else report["kept_read_pairs"]
+        assert read_names(outputs[0]) == read_names(outputs[1])
+        assert len(read_names(outputs[0])) == kept_read_pairs